@@ -1,19 +1,22 @@
-from flask import Flask, request, jsonify, Response, stream_with_context
+from flask import Flask, Request, request, jsonify, Response, stream_with_context
 import base64
 import cv2
 import numpy as np
 import firebase_admin
 from firebase_admin import credentials, firestore, storage, auth as firebase_auth
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition
 import datetime
+import functools
 from concurrent.futures import TimeoutError as FuturesTimeoutError
+import hashlib
 import ipaddress
 import os
 from urllib.parse import urlparse
-from deepface import DeepFace
 import concurrent.futures
 from zoneinfo import ZoneInfo
 import csv
 import io
+import json
 import threading
 import time
 
@@ -22,8 +25,40 @@ from ipaddress import ip_address, ip_network
 
 try:
     from .allowed_networks import UNT_EAGLENET_NETWORKS
+    from . import face_detection
+    from . import face_quality
+    from .firestore_repository import FirestoreRepository
+    from . import image_decode
+    from . import scan_jobs
+    from .ttl_cache import TTLCache
+    from .face_embeddings import EmbeddingMatrix, EmbeddingStore
+    from .face_inference import (
+        DeadlineExceeded,
+        InferenceExecutor,
+        InferenceQueueFull,
+        MicroBatcher,
+    )
+    from . import face_model
+    from .inference_server import InferenceClient, authkey_from_env
+    from .known_faces import KnownFaceCache
 except ImportError:  # pragma: no cover - fallback for script execution
     from allowed_networks import UNT_EAGLENET_NETWORKS
+    import face_detection
+    import face_quality
+    from firestore_repository import FirestoreRepository
+    import image_decode
+    import scan_jobs
+    from ttl_cache import TTLCache
+    from face_embeddings import EmbeddingMatrix, EmbeddingStore
+    from face_inference import (
+        DeadlineExceeded,
+        InferenceExecutor,
+        InferenceQueueFull,
+        MicroBatcher,
+    )
+    import face_model
+    from inference_server import InferenceClient, authkey_from_env
+    from known_faces import KnownFaceCache
 
 
 # ------------------------------
@@ -119,45 +154,638 @@ def _add_vary_header(response, value):
             headers["Vary"] = ", ".join(values)
 
 
+# Multipart file parts up to this size are buffered in memory. Werkzeug
+# would otherwise spool anything over ~500 KB to a temporary file, putting
+# the disk back into the scan path for phone-sized captures.
+SCAN_UPLOAD_MEMORY_MAX_BYTES = int(
+    os.environ.get("SCAN_UPLOAD_MEMORY_MAX_BYTES", str(16 * 1024 * 1024))
+)
+
+
+class _InMemoryUploadRequest(Request):
+    def _get_file_stream(
+        self, total_content_length, content_type, filename=None, content_length=None
+    ):
+        if (
+            total_content_length is not None
+            and total_content_length <= SCAN_UPLOAD_MEMORY_MAX_BYTES
+        ):
+            return io.BytesIO()
+        return super()._get_file_stream(
+            total_content_length, content_type, filename, content_length
+        )
+
+
 app = Flask(__name__)
+app.request_class = _InMemoryUploadRequest
+
+
+# ------------------------------
+# Face verification configuration
+# ------------------------------
+# Model, metric and threshold are deployment settings; compare candidates on
+# local face pairs with `python -m benchmarks.face_models` before changing them.
+# The threshold only makes sense for the model and metric it was tuned with.
+FACE_MODEL_NAME = os.environ.get("FACE_MODEL_NAME", "VGG-Face")
+FACE_DISTANCE_METRIC = os.environ.get("FACE_DISTANCE_METRIC", "cosine")
+FACE_MATCH_THRESHOLD = float(os.environ.get("FACE_MATCH_THRESHOLD", "0.35"))
+
+# Known-face embeddings are cached per (studentId, model, image generation) so
+# the enrolled photo is embedded once instead of on every scan.
+# FACE_EMBEDDING_DTYPE (float32, float16 or int8) sets how compactly cached
+# and roster embeddings are held in memory; see benchmarks/quantization.py.
+FACE_EMBEDDING_DTYPE = os.environ.get("FACE_EMBEDDING_DTYPE", "float32")
+EMBEDDING_STORE = EmbeddingStore(
+    cache_dir=os.environ.get(
+        "FACE_EMBEDDING_CACHE_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), ".embedding_cache"),
+    ),
+    max_entries=int(os.environ.get("FACE_EMBEDDING_CACHE_SIZE", "2048")),
+    dtype=FACE_EMBEDDING_DTYPE,
+)
+
+
+# One inference pool per process. Requests beyond INFERENCE_QUEUE_SIZE waiting
+# scans are turned away with 503 + Retry-After instead of piling up threads.
+# With batching enabled these workers only detect/preprocess and then wait on
+# the batcher, so there should be at least FACE_BATCH_MAX_SIZE of them.
+INFERENCE_EXECUTOR = InferenceExecutor(
+    max_workers=int(os.environ.get("INFERENCE_WORKERS", "8")),
+    max_queue=int(os.environ.get("INFERENCE_QUEUE_SIZE", "16")),
+)
+INFERENCE_RETRY_AFTER_SECONDS = int(os.environ.get("INFERENCE_RETRY_AFTER_SECONDS", "2"))
+
+# Every scan carries one deadline from the moment it arrives: the client's
+# X-Request-Timeout-Ms budget, capped at SCAN_DEADLINE_SECONDS. Each stage
+# (Storage, decode, detection, embedding, Firestore) checks it before starting,
+# and queued inference past it is dropped, so under overload CPU goes to scans
+# whose client is still waiting.
+SCAN_DEADLINE_SECONDS = float(os.environ.get("SCAN_DEADLINE_SECONDS", "15"))
+SCAN_TIMEOUT_HEADER = "X-Request-Timeout-Ms"
+_deadline_expirations = {}
+_deadline_expirations_lock = threading.Lock()
+
+
+def _scan_deadline():
+    """Return the ``time.monotonic()`` deadline for the current scan request."""
+    budget = SCAN_DEADLINE_SECONDS
+    raw_timeout = request.headers.get(SCAN_TIMEOUT_HEADER)
+    if raw_timeout:
+        try:
+            budget = min(budget, max(0.0, float(raw_timeout) / 1000.0))
+        except ValueError:
+            pass
+    return time.monotonic() + budget
+
+
+def _check_deadline(deadline, stage):
+    """Raise DeadlineExceeded if ``deadline`` has passed before ``stage`` starts."""
+    if deadline is None or time.monotonic() < deadline:
+        return
+    _deadline_exceeded(stage)
+
+
+def _deadline_exceeded(stage):
+    with _deadline_expirations_lock:
+        _deadline_expirations[stage] = _deadline_expirations.get(stage, 0) + 1
+    raise DeadlineExceeded(f"Request deadline passed before {stage}")
+
+
+def _await_result(future, deadline, stage):
+    """
+    ``future.result()`` bounded by ``deadline``. If the deadline passes
+    first the future is cancelled and DeadlineExceeded is raised for
+    ``stage``, as _check_deadline would.
+    """
+    if deadline is None:
+        return future.result()
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except DeadlineExceeded:
+        raise
+    except concurrent.futures.TimeoutError:
+        if future.done():
+            # The work itself raised a TimeoutError; pass it on unchanged.
+            raise
+        future.cancel()
+        _deadline_exceeded(stage)
+
+# Micro-batching: captured faces arriving within FACE_BATCH_WINDOW_MS of each
+# other share one forward pass. FACE_BATCH_MAX_SIZE=1 disables batching.
+FACE_BATCH_MAX_SIZE = int(os.environ.get("FACE_BATCH_MAX_SIZE", "8"))
+FACE_BATCH_WINDOW_MS = float(os.environ.get("FACE_BATCH_WINDOW_MS", "5"))
+_face_batchers = {}
+_face_batchers_lock = threading.Lock()
+
+
+def _get_face_batcher(model_name):
+    with _face_batchers_lock:
+        batcher = _face_batchers.get(model_name)
+        if batcher is None:
+            batcher = MicroBatcher(
+                lambda model_inputs: face_model.embed_batch(model_inputs, model_name),
+                max_batch_size=FACE_BATCH_MAX_SIZE,
+                max_wait_seconds=FACE_BATCH_WINDOW_MS / 1000.0,
+                # Only INFERENCE_EXECUTOR workers submit, one input each.
+                max_queue=INFERENCE_EXECUTOR.max_workers,
+                name=f"face-batcher-{model_name}",
+            )
+            _face_batchers[model_name] = batcher
+        return batcher
+
+
+# Optional shared inference process (see inference_server.py). When set, this
+# worker never loads the model and sends embedding requests over the socket.
+INFERENCE_SERVER_SOCKET = os.environ.get("INFERENCE_SERVER_SOCKET")
+INFERENCE_CLIENT = (
+    InferenceClient(
+        INFERENCE_SERVER_SOCKET,
+        pool_size=INFERENCE_EXECUTOR.max_workers,
+        authkey=authkey_from_env(),
+    )
+    if INFERENCE_SERVER_SOCKET
+    else None
+)
+
+
+# Faces are detected once, in the request path, and only the aligned crop is
+# sent to the embedding model with DeepFace's "skip" detector backend.
+# FACE_DETECTOR_BACKEND is "opencv" (Haar) or a DeepFace detector such as
+# "ssd", "mtcnn" or "retinaface"; faces under FACE_MIN_SIZE_PX are ignored.
+FACE_DETECTOR_BACKEND = os.environ.get("FACE_DETECTOR_BACKEND", "opencv")
+FACE_MIN_SIZE_PX = int(os.environ.get("FACE_MIN_SIZE_PX", "80"))
+# Scans are searched for faces down to half that size so the quality gate can
+# ask for a closer shot instead of reporting that no face was found.
+FACE_SCAN_DETECT_MIN_PX = max(1, FACE_MIN_SIZE_PX // 2)
+
+# Quality gate run on the downscaled frame before detection and inference;
+# rejected scans get a specific retake message. See face_quality.
+FACE_QUALITY_GATE = face_quality.QualityGate(
+    min_brightness=float(os.environ.get("FACE_QUALITY_MIN_BRIGHTNESS", "40")),
+    max_brightness=float(os.environ.get("FACE_QUALITY_MAX_BRIGHTNESS", "220")),
+    max_clipped_fraction=float(os.environ.get("FACE_QUALITY_MAX_CLIPPED_FRACTION", "0.75")),
+    min_face_px=FACE_MIN_SIZE_PX,
+    min_sharpness=float(os.environ.get("FACE_QUALITY_MIN_SHARPNESS", "40")),
+)
+
+
+def _detect_face(img, min_size=FACE_SCAN_DETECT_MIN_PX):
+    """Return the aligned face crop in ``img``, or None when no face is found."""
+    face = face_detection.detect_face(
+        img, detector_backend=FACE_DETECTOR_BACKEND, min_size=min_size
+    )
+    return None if face is None else face.crop
+
+
+def _embedding_model_key(model_name):
+    # Embeddings depend on how the face was cropped as well as on the model.
+    return f"{model_name}/{FACE_DETECTOR_BACKEND}"
+
+
+def _represent_face(face_crop, model_name=FACE_MODEL_NAME, deadline=None):
+    """Return the embedding for an aligned BGR face crop."""
+    _check_deadline(deadline, "embedding")
+    if INFERENCE_CLIENT is not None:
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        return INFERENCE_CLIENT.represent(
+            face_crop, model_name, timeout=timeout, detector_backend="skip"
+        )
+
+    if FACE_BATCH_MAX_SIZE <= 1:
+        return face_model.represent(face_crop, model_name, detector_backend="skip")
+
+    model_input = face_model.prepare_input(face_crop, model_name, detector_backend="skip")
+    return _get_face_batcher(model_name).submit(model_input, deadline=deadline).result()
+
+
+# Captured frames are downscaled to this longest side before detection.
+SCAN_MAX_SIDE_PX = 640
+
+
+def _decode_image_bytes(image_bytes, max_side=SCAN_MAX_SIDE_PX):
+    """
+    Decode encoded image bytes (JPEG/PNG) into a BGR array, or None.
+
+    Large JPEGs are decoded at a reduced scale that still covers
+    ``max_side``; pass ``max_side=None`` for a full-resolution decode.
+    """
+    return image_decode.decode_image(image_bytes, max_side=max_side)
+
+
+# Decoded known-face images, revalidated against their Storage generation at
+# most once per KNOWN_FACE_REVALIDATE_SECONDS. Enrolment photos are decoded at
+# full resolution so their embeddings do not change.
+KNOWN_FACE_CACHE = KnownFaceCache(
+    decode=lambda image_bytes: _decode_image_bytes(image_bytes, max_side=None),
+    max_bytes=int(os.environ.get("KNOWN_FACE_CACHE_MB", "256")) * 1024 * 1024,
+    revalidate_seconds=float(os.environ.get("KNOWN_FACE_REVALIDATE_SECONDS", "60")),
+)
+
+
+def _known_face_blob_name(student_id):
+    return f"known_faces/{student_id}.jpg"
+
+
+def _known_face_template_prefix(student_id):
+    return f"known_faces/{student_id}/"
+
+
+def _known_face_templates(student_id):
+    """
+    Resolve every enrolled image for a student, or [] when there is none.
+
+    A student can have the original known_faces/{id}.jpg and any number of
+    extra templates under known_faces/{id}/ (e.g. with and without glasses).
+    """
+    return KNOWN_FACE_CACHE.resolve_enrollment(
+        bucket, _known_face_blob_name(student_id), _known_face_template_prefix(student_id)
+    )
+
+
+def _known_face_embedding_key(student_id, known_face):
+    # The original image keeps the plain student key so vectors cached before
+    # multi-template enrolment stay valid.
+    if known_face.blob_name == _known_face_blob_name(student_id):
+        return student_id
+    return known_face.blob_name
+
+
+def _embed_known_image(known_img, model_name=FACE_MODEL_NAME, deadline=None):
+    """Detect and embed a decoded enrolment photo; runs on INFERENCE_EXECUTOR."""
+    _check_deadline(deadline, "detection")
+    # Like DeepFace with enforce_detection=False, an enrolment photo with
+    # no detectable face is embedded whole.
+    known_crop = _detect_face(known_img, min_size=FACE_MIN_SIZE_PX)
+    if known_crop is None:
+        known_crop = known_img
+    return _represent_face(known_crop, model_name=model_name, deadline=deadline)
+
+
+def _get_known_face_embedding(student_id, known_face, model_name=FACE_MODEL_NAME, deadline=None):
+    """
+    Return the embedding of one enrolled image, embedding the stored image
+    only when this (template, model, generation) has not been seen before.
+
+    The Storage download runs in the calling thread and only detection and
+    embedding are queued on INFERENCE_EXECUTOR, so INFERENCE_WORKERS bounds
+    these model calls like any other. Must not be called from an inference
+    worker. Raises InferenceQueueFull when the pool is saturated.
+    """
+
+    def _compute():
+        _check_deadline(deadline, "download")
+        known_img = KNOWN_FACE_CACHE.get_image(known_face)
+        future = INFERENCE_EXECUTOR.submit(
+            _embed_known_image, known_img, model_name, deadline, deadline=deadline
+        )
+        return _await_result(future, deadline, "embedding")
+
+    return EMBEDDING_STORE.get_or_compute(
+        _known_face_embedding_key(student_id, known_face),
+        _embedding_model_key(model_name),
+        known_face.generation,
+        _compute,
+    )
 
 
 def _perform_face_verification(
-    captured_path, known_path, model_name="VGG-Face", timeout_seconds=15
+    captured_face,
+    student_id,
+    known_faces,
+    model_name=FACE_MODEL_NAME,
+    timeout_seconds=15,
+    deadline=None,
 ):
     """
-    Run DeepFace.verify with a timeout and return a structured response.
-
-    Returns a dictionary containing verified, distance, and max_threshold_to_verify
-    fields from the DeepFace response.
+    Compare a captured face against the student's enrolled templates with a timeout.
+
+    ``captured_face`` is the aligned BGR crop from _detect_face; nothing is
+    written to disk. The known embeddings are resolved in the calling thread
+    first (see _get_known_face_embedding), so Storage downloads never hold an
+    inference slot; they are scored together as one EmbeddingMatrix, keeping
+    the closest template. Only the captured crop's embedding and the
+    comparison run on the shared INFERENCE_EXECUTOR, and that work is dropped
+    unstarted if it is still queued when the timeout expires. ``deadline`` (a request-wide ``time.monotonic()`` value)
+    replaces ``timeout_seconds`` when given; every embedding checks it, so work
+    abandoned mid-way stops at the next stage instead of running to the end.
+    Raises InferenceQueueFull when the pool is saturated.
+
+    Returns a dictionary containing verified, distance, template, templates
+    and max_threshold_to_verify fields.
     """
 
+    if deadline is None:
+        deadline = time.monotonic() + timeout_seconds
+
+    templates = EmbeddingMatrix(
+        [known_face.blob_name for known_face in known_faces],
+        [
+            _get_known_face_embedding(
+                student_id, known_face, model_name=model_name, deadline=deadline
+            )
+            for known_face in known_faces
+        ],
+        metric=FACE_DISTANCE_METRIC,
+        dtype=FACE_EMBEDDING_DTYPE,
+    )
+
     def _verify():
-        return DeepFace.verify(
-            img1_path=captured_path,
-            img2_path=known_path,
-            model_name=model_name,
-            enforce_detection=False,
+        captured_embedding = _represent_face(
+            captured_face, model_name=model_name, deadline=deadline
         )
+        template, distance, _ = templates.best_match(captured_embedding)
+        return template, distance
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-        future = executor.submit(_verify)
-        try:
-            result = future.result(timeout=timeout_seconds)
-        except concurrent.futures.TimeoutError as exc:  # pragma: no cover - timeout path
+    future = INFERENCE_EXECUTOR.submit(_verify, deadline=deadline)
+    try:
+        template, distance = future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except concurrent.futures.TimeoutError as exc:  # pragma: no cover - timeout path
+        future.cancel()
+        raise TimeoutError("Face verification timed out") from exc
+
+    return {
+        "verified": distance <= FACE_MATCH_THRESHOLD,
+        "distance": distance,
+        "template": template,
+        "templates": len(known_faces),
+        "max_threshold_to_verify": FACE_MATCH_THRESHOLD,
+    }
+
+
+# 1:N identification. A roster's enrolled embeddings are stacked into one
+# EmbeddingMatrix per class and reused until someone joins or leaves the
+# roster or re-enrolls. FACE_IDENTIFY_MIN_MARGIN is how much closer the best
+# match must be than the runner-up before a scan is attributed to them.
+FACE_IDENTIFY_MIN_MARGIN = float(os.environ.get("FACE_IDENTIFY_MIN_MARGIN", "0.0"))
+_roster_matrices = {}
+_roster_matrices_lock = threading.Lock()
+_roster_refreshing = set()
+
+# Known-face lookups and image downloads for a roster fan out over this pool
+# instead of running one student at a time inside an inference worker; the
+# template embeddings themselves are queued on INFERENCE_EXECUTOR.
+_ROSTER_WORKERS = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.environ.get("ROSTER_PREPARE_WORKERS", "8")),
+    thread_name_prefix="roster-prepare",
+)
+# Stale rosters are revalidated here, one at a time, while scans keep using
+# the cached matrix.
+_ROSTER_REFRESH = concurrent.futures.ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix="roster-refresh"
+)
+
+
+class _RosterMatrix:
+    __slots__ = ("roster_key", "signature", "matrix", "checked_at")
+
+    def __init__(self, roster_key, signature, matrix, checked_at):
+        self.roster_key = roster_key
+        self.signature = signature
+        self.matrix = matrix
+        self.checked_at = checked_at
+
+
+def _roster_map(func, items, deadline, stage):
+    """Run ``func`` over ``items`` on _ROSTER_WORKERS; results in input order."""
+    futures = [_ROSTER_WORKERS.submit(func, *item) for item in items]
+    try:
+        return [_await_result(future, deadline, stage) for future in futures]
+    except BaseException:
+        for future in futures:
             future.cancel()
-            raise TimeoutError("Face verification timed out") from exc
+        raise
+
+
+def _get_roster_matrix(class_id, student_ids, model_name=FACE_MODEL_NAME, deadline=None):
+    """
+    Return an EmbeddingMatrix of enrolled embeddings for ``student_ids``.
+
+    Every enrolled template is a row keyed by its student, and students
+    without a known face image are left out. A cached matrix for the same
+    roster is returned straight away; once it is older than
+    KNOWN_FACE_REVALIDATE_SECONDS its known faces are revalidated in the
+    background, so a scan never waits on Storage for a warm roster. Only a
+    new or changed roster is built inline (see _build_roster_matrix).
+    """
+    roster_key = (_embedding_model_key(model_name), tuple(student_ids))
+    with _roster_matrices_lock:
+        cached = _roster_matrices.get(class_id)
+    if cached is None or cached.roster_key != roster_key:
+        return _build_roster_matrix(class_id, student_ids, model_name=model_name, deadline=deadline)
+
+    if time.monotonic() - cached.checked_at >= KNOWN_FACE_CACHE.revalidate_seconds:
+        _schedule_roster_refresh(class_id, student_ids, model_name)
+    return cached.matrix
+
+
+def _schedule_roster_refresh(class_id, student_ids, model_name):
+    with _roster_matrices_lock:
+        if class_id in _roster_refreshing:
+            return
+        _roster_refreshing.add(class_id)
+
+    def _refresh():
+        try:
+            _build_roster_matrix(class_id, student_ids, model_name=model_name)
+        except Exception:
+            app.logger.exception("Could not refresh roster matrix for class %s", class_id)
+        finally:
+            with _roster_matrices_lock:
+                _roster_refreshing.discard(class_id)
+
+    _ROSTER_REFRESH.submit(_refresh)
+
+
+def _build_roster_matrix(class_id, student_ids, model_name=FACE_MODEL_NAME, deadline=None):
+    """
+    Resolve every student's known faces and stack their embeddings.
 
-    if not isinstance(result, dict):
-        raise ValueError("Face verification returned an unexpected result")
+    Lookups and the embeddings missing from EMBEDDING_STORE are fanned out
+    over _ROSTER_WORKERS, whose model calls go through INFERENCE_EXECUTOR
+    (see _get_known_face_embedding), and stop at ``deadline``. When the resolved templates
+    match the cached matrix, that matrix is kept and only marked as checked.
+    """
+    started = time.monotonic()
+    templates = _roster_map(
+        _known_face_templates, [(student_id,) for student_id in student_ids], deadline, "storage"
+    )
+    known_faces = [
+        (student_id, known_face)
+        for student_id, student_templates in zip(student_ids, templates)
+        for known_face in student_templates
+    ]
+
+    roster_key = (_embedding_model_key(model_name), tuple(student_ids))
+    signature = (
+        roster_key[0],
+        tuple(
+            (known_face.blob_name, known_face.generation) for _, known_face in known_faces
+        ),
+    )
+    cacheable = all(known_face.generation is not None for _, known_face in known_faces)
+    with _roster_matrices_lock:
+        cached = _roster_matrices.get(class_id)
+        if (
+            cacheable
+            and cached is not None
+            and cached.roster_key == roster_key
+            and cached.signature == signature
+        ):
+            cached.checked_at = started
+            return cached.matrix
+
+    embeddings = _roster_map(
+        lambda student_id, known_face: _get_known_face_embedding(
+            student_id, known_face, model_name=model_name, deadline=deadline
+        ),
+        known_faces,
+        deadline,
+        "embedding",
+    )
+    matrix = EmbeddingMatrix(
+        [student_id for student_id, _ in known_faces],
+        embeddings,
+        metric=FACE_DISTANCE_METRIC,
+        dtype=FACE_EMBEDDING_DTYPE,
+    )
+    if cacheable:
+        with _roster_matrices_lock:
+            _roster_matrices[class_id] = _RosterMatrix(roster_key, signature, matrix, started)
+    return matrix
+
+
+def _perform_face_identification(
+    captured_face,
+    class_id,
+    student_ids,
+    model_name=FACE_MODEL_NAME,
+    timeout_seconds=15,
+    deadline=None,
+):
+    """
+    Find the closest enrolled student on a class roster for a captured face.
+
+    The roster matrix is resolved in the calling thread (see
+    _get_roster_matrix), so an inference slot is only held for the
+    captured crop: it runs on INFERENCE_EXECUTOR with the same timeout and
+    deadline handling as _perform_face_verification, is embedded once and
+    compared against the whole roster matrix in a single vectorized
+    operation. Returns a dictionary with studentId (None
+    when nobody on the roster has a known face), distance, margin,
+    candidates and max_threshold_to_verify fields.
+    """
 
+    if deadline is None:
+        deadline = time.monotonic() + timeout_seconds
+
+    roster = _get_roster_matrix(class_id, student_ids, model_name=model_name, deadline=deadline)
+
+    def _identify():
+        if not len(roster):
+            return None, len(roster)
+        captured_embedding = _represent_face(
+            captured_face, model_name=model_name, deadline=deadline
+        )
+        return roster.best_match(captured_embedding), len(roster)
+
+    future = INFERENCE_EXECUTOR.submit(_identify, deadline=deadline)
+    try:
+        match, candidates = future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except concurrent.futures.TimeoutError as exc:  # pragma: no cover - timeout path
+        future.cancel()
+        raise TimeoutError("Face identification timed out") from exc
+
+    student_id, distance, margin = match if match is not None else (None, None, None)
     return {
-        "verified": bool(result.get("verified", False)),
-        "distance": result.get("distance"),
-        "max_threshold_to_verify": result.get("max_threshold_to_verify"),
+        "studentId": student_id,
+        "distance": distance,
+        "margin": margin,
+        "candidates": candidates,
+        "max_threshold_to_verify": FACE_MATCH_THRESHOLD,
     }
 
 
+# ------------------------------
+# Model warm-up and readiness
+# ------------------------------
+# The first DeepFace call in a process pays for the TensorFlow import, the
+# weight load and graph tracing. Warm-up runs that once in the background so
+# /readyz only reports ready when a scan will not hit the cold path.
+MODEL_READY = threading.Event()
+_model_warmup_lock = threading.Lock()
+_model_warmup_thread = None
+_model_warmup_error = None
+
+
+def _warm_up_face_model(model_name=FACE_MODEL_NAME):
+    """
+    Build the face model and run a dummy forward pass through it, or, with an
+    inference server configured, wait for the server to answer.
+    """
+    global _model_warmup_error
+
+    started = time.monotonic()
+    try:
+        face_detection.warm_up(FACE_DETECTOR_BACKEND)
+        if INFERENCE_CLIENT is not None:
+            INFERENCE_CLIENT.ping()
+        else:
+            face_model.warm_up(model_name, batch_size=FACE_BATCH_MAX_SIZE)
+    except Exception as exc:
+        _model_warmup_error = str(exc)
+        app.logger.exception("Face model warm-up failed for %s", model_name)
+        return
+
+    _model_warmup_error = None
+    MODEL_READY.set()
+    app.logger.info(
+        "Face model %s warmed up in %.1fs", model_name, time.monotonic() - started
+    )
+    # Every worker (python app.py, flask run or gunicorn) prefetches into its
+    # own embedding cache once its model is warm.
+    start_face_prefetch()
+
+
+def start_model_warmup():
+    """Start the background warm-up unless it is running or already done."""
+    global _model_warmup_thread
+
+    if MODEL_READY.is_set():
+        return
+    with _model_warmup_lock:
+        if _model_warmup_thread is not None and _model_warmup_thread.is_alive():
+            return
+        _model_warmup_thread = threading.Thread(
+            target=_warm_up_face_model,
+            daemon=True,
+        )
+        _model_warmup_thread.start()
+
+
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    """Liveness probe: the process is up and serving HTTP."""
+    return jsonify({"status": "ok"}), 200
+
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    """
+    Readiness probe: 200 only once the face model is warm.
+
+    The first probe also kicks off warm-up, so workers started by any server
+    (python app.py, flask run, gunicorn) become ready without extra hooks.
+    """
+    if MODEL_READY.is_set():
+        return jsonify({"status": "ready", "model": FACE_MODEL_NAME}), 200
+
+    start_model_warmup()
+    payload = {"status": "warming", "model": FACE_MODEL_NAME}
+    if _model_warmup_error:
+        payload["error"] = _model_warmup_error
+    return jsonify(payload), 503
+
+
 @app.after_request
 def add_cors_headers(response):
     origin = request.headers.get("Origin")
@@ -169,9 +797,13 @@ def add_cors_headers(response):
         allowed_origin = PRODUCTION_ORIGIN
 
     response.headers["Access-Control-Allow-Origin"] = allowed_origin
-    response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
+    response.headers["Access-Control-Allow-Headers"] = (
+        "Content-Type, Authorization, X-Class-Id, X-Student-Id, X-Request-Timeout-Ms, "
+        "Idempotency-Key"
+    )
     response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
     response.headers["Access-Control-Allow-Credentials"] = "true"
+    response.headers["Access-Control-Expose-Headers"] = "Retry-After"
     return response
 
 
@@ -213,6 +845,18 @@ firebase_admin.initialize_app(cred, {
 db = firestore.client()
 bucket = storage.bucket()
 
+# Cached ``users`` / ``classes`` documents for the scan path and schedulers.
+# ``db`` is looked up on each read so it can be replaced after import.
+FIRESTORE_CACHE_TTL_SECONDS = float(os.environ.get("FIRESTORE_CACHE_TTL_SECONDS", "60"))
+FIRESTORE_CACHE_MAX_ENTRIES = int(os.environ.get("FIRESTORE_CACHE_MAX_ENTRIES", "4096"))
+# Roster lookups read users with get_all in chunks of this many documents.
+FIRESTORE_GET_ALL_CHUNK_SIZE = int(os.environ.get("FIRESTORE_GET_ALL_CHUNK_SIZE", "100"))
+FIRESTORE_DOCS = FirestoreRepository(
+    lambda: db,
+    ttl_seconds=FIRESTORE_CACHE_TTL_SECONDS,
+    max_entries=FIRESTORE_CACHE_MAX_ENTRIES,
+)
+
 # Timezone for Central Time
 CENTRAL_TZ = ZoneInfo("America/Chicago")
 
@@ -237,16 +881,134 @@ def _to_central_iso(timestamp_like):
 
 
 def _get_class_document(class_id):
-    """Fetch a class document by ID."""
-    class_ref = db.collection("classes").document(class_id)
-    class_doc = class_ref.get()
-    if not class_doc.exists:
+    """Fetch a class document by ID (cached for FIRESTORE_CACHE_TTL_SECONDS)."""
+    data = FIRESTORE_DOCS.get_class(class_id)
+    if data is None:
         return None
-    data = class_doc.to_dict()
-    data["id"] = class_doc.id
+    data["id"] = class_id
     return data
 
 
+# After a query fails for lack of its composite index, use the unindexed
+# fallback for this long before trying the index again.
+ATTENDANCE_INDEX_RETRY_SECONDS = 600
+_attendance_index_missing_at = None
+
+
+def _attendance_for_class_between(class_id, start, end):
+    """
+    Return attendance snapshots for ``class_id`` whose ``date`` falls in
+    [start, end).
+
+    The range is applied server-side, which needs the (classID, date)
+    composite index declared in frontend/firestore.indexes.json. While that
+    index is missing or still building, the class's records are read and
+    filtered by date here instead.
+    """
+    global _attendance_index_missing_at
+
+    attendance_ref = _get_attendance_collection()
+    missing_at = _attendance_index_missing_at
+    if missing_at is None or time.monotonic() - missing_at >= ATTENDANCE_INDEX_RETRY_SECONDS:
+        query = (
+            attendance_ref.where("classID", "==", class_id)
+            .where("date", ">=", start)
+            .where("date", "<", end)
+        )
+        try:
+            snapshots = list(query.stream())
+        except FailedPrecondition as exc:
+            app.logger.warning(
+                "Attendance (classID, date) index is not ready; filtering in Python: %s", exc
+            )
+            _attendance_index_missing_at = time.monotonic()
+        else:
+            _attendance_index_missing_at = None
+            return snapshots
+
+    snapshots = []
+    for snap in attendance_ref.where("classID", "==", class_id).stream():
+        date_value = (snap.to_dict() or {}).get("date")
+        # Firestore timestamps come back as datetime objects
+        if isinstance(date_value, datetime.datetime) and start <= date_value < end:
+            snapshots.append(snap)
+    return snapshots
+
+
+# Meetings whose auto-absences are done, so later ticks skip them without
+# reading attendance. The meetings/{classId}_{date} ledger survives restarts
+# and is shared by every worker; _finalized_meetings holds the ids this
+# process has already seen, for today only.
+_finalized_meetings = set()
+_finalized_meetings_day = None
+
+
+def _meeting_id(class_id, day):
+    return f"{class_id}_{day.isoformat()}"
+
+
+def _meeting_finalized(meeting_id, day):
+    """True once the meeting's auto-absences have been recorded in the ledger."""
+    global _finalized_meetings_day
+
+    if _finalized_meetings_day != day:
+        _finalized_meetings.clear()
+        _finalized_meetings_day = day
+    if meeting_id in _finalized_meetings:
+        return True
+
+    snapshot = db.collection("meetings").document(meeting_id).get()
+    if getattr(snapshot, "exists", False):
+        _finalized_meetings.add(meeting_id)
+        return True
+    return False
+
+
+def _mark_meeting_finalized(meeting_id, class_id, day, absences_created):
+    db.collection("meetings").document(meeting_id).set(
+        {
+            "classID": class_id,
+            "date": day.isoformat(),
+            "absencesCreated": absences_created,
+            "finalizedAt": firestore.SERVER_TIMESTAMP,
+        }
+    )
+    _finalized_meetings.add(meeting_id)
+
+
+# Firestore accepts at most 500 writes per batched commit.
+FIRESTORE_BATCH_MAX_WRITES = 500
+
+
+def _create_documents(collection_ref, documents, chunk_size=FIRESTORE_BATCH_MAX_WRITES):
+    """
+    Create ``documents`` ({doc_id: data}) in ``collection_ref`` with batched
+    create() writes, one commit per ``chunk_size`` documents. Documents that
+    already exist are left as they are. Returns the ids that were created.
+    """
+    created = []
+    items = list(documents.items())
+    for start in range(0, len(items), chunk_size):
+        chunk = items[start : start + chunk_size]
+        batch = db.batch()
+        for doc_id, data in chunk:
+            batch.create(collection_ref.document(doc_id), data)
+        try:
+            batch.commit()
+        except AlreadyExists:
+            # A batch is atomic, so one existing document fails the whole
+            # commit; fall back to creating the chunk one document at a time.
+            for doc_id, data in chunk:
+                try:
+                    collection_ref.document(doc_id).create(data)
+                except AlreadyExists:
+                    continue
+                created.append(doc_id)
+        else:
+            created.extend(doc_id for doc_id, _ in chunk)
+    return created
+
+
 def _auto_create_absences_for_ended_classes():
     """
     For each class that meets today and has already ended,
@@ -307,6 +1069,11 @@ def _auto_create_absences_for_ended_classes():
             if now_central <= end_dt:
                 continue
 
+            # Skip meetings an earlier tick (or another worker) already closed
+            meeting_id = _meeting_id(class_id, today)
+            if _meeting_finalized(meeting_id, today):
+                continue
+
             # We only care about records for "today" in Central time
             start_of_day = datetime.datetime(
                 today.year,
@@ -320,62 +1087,46 @@ def _auto_create_absences_for_ended_classes():
             end_of_day = start_of_day + datetime.timedelta(days=1)
 
             # ---------------------------------------------------------
-            # 1) Fetch all attendance records for this class
-            #    (we'll filter by date and student in Python to avoid
-            #    composite index requirements).
+            # 1) Fetch today's attendance records for this class
             # ---------------------------------------------------------
-            existing_snapshots = list(
-                attendance_ref.where("classID", "==", class_id).stream()
-            )
-
             students_with_record_today = set()
 
-            for snap in existing_snapshots:
+            for snap in _attendance_for_class_between(class_id, start_of_day, end_of_day):
                 data = snap.to_dict() or {}
                 student_id = data.get("studentID")
-                date_value = data.get("date")
-
-                if not student_id or not date_value:
-                    continue
-
-                # Firestore timestamps come back as datetime objects
-                if not isinstance(date_value, datetime.datetime):
-                    continue
-
-                # Normalize to Central time just in case
-                date_central = date_value.astimezone(CENTRAL_TZ)
-
-                if start_of_day <= date_central < end_of_day:
+                if student_id:
                     students_with_record_today.add(student_id)
 
             # ---------------------------------------------------------
             # 2) For each enrolled student, if they DON'T have a record
             #    today, create an auto-absence record.
             # ---------------------------------------------------------
-            for student_id in students:
-                if student_id in students_with_record_today:
-                    # They already have Present/Absent/Pending for today
-                    continue
+            absent_students = [
+                student_id
+                for student_id in students
+                if student_id not in students_with_record_today
+            ]
+            if not absent_students:
+                _mark_meeting_finalized(meeting_id, class_id, today, 0)
+                continue
 
-                # Fetch student profile for name fields (optional but nice)
-                student_doc = db.collection("users").document(student_id).get()
-                student_data = (
-                    student_doc.to_dict()
-                    if getattr(student_doc, "exists", False)
-                    else {}
-                )
+            # Student profiles for name fields (optional but nice)
+            profiles = _get_user_profiles(absent_students)
+
+            # For 'date', we align with the class meeting's start time
+            date_for_record = start_dt
+
+            absence_records = {}
+            for student_id in absent_students:
+                student_data = profiles.get(student_id, {})
                 fname = (student_data.get("fname") or "").strip()
                 lname = (student_data.get("lname") or "").strip()
                 student_name = (fname + " " + lname).strip() or student_id
 
-                # For 'date', we align with the class meeting's start time
-                date_for_record = start_dt
-
                 # Deterministic doc ID: CSCE1040_S1000_2025-11-16
                 doc_id = f"{class_id}_{student_id}_{date_for_record.date().isoformat()}"
-
-                new_ref = attendance_ref.document(doc_id)
-                new_ref.set(
+                absence_records[doc_id] = (
+                    student_id,
                     {
                         "classID": class_id,
                         "studentID": student_id,
@@ -388,10 +1139,26 @@ def _auto_create_absences_for_ended_classes():
                         "editReason": "",
                         "createdAt": firestore.SERVER_TIMESTAMP,
                         "updatedAt": firestore.SERVER_TIMESTAMP,
-                    }
+                    },
                 )
 
-                # After creating an auto-absence, evaluate the absence threshold
+            # create() leaves records that appeared since the read above
+            # (a late scan, another worker's run) untouched.
+            created_ids = _create_documents(
+                attendance_ref,
+                {doc_id: record for doc_id, (_, record) in absence_records.items()},
+            )
+            _mark_meeting_finalized(meeting_id, class_id, today, len(created_ids))
+
+            # Evaluate the absence threshold once the whole class is written
+            for doc_id in created_ids:
+                student_id = absence_records[doc_id][0]
+                app.logger.info(
+                    "Auto-marked absent: class=%s student=%s date=%s",
+                    class_id,
+                    student_id,
+                    date_for_record.isoformat(),
+                )
                 try:
                     _maybe_notify_absence_threshold(
                         class_id,
@@ -405,13 +1172,6 @@ def _auto_create_absences_for_ended_classes():
                     app.logger.exception(
                         "Error checking absence threshold after auto-absence: %s", exc
                     )
-
-                app.logger.info(
-                    "Auto-marked absent: class=%s student=%s date=%s",
-                    class_id,
-                    student_id,
-                    date_for_record.isoformat(),
-                )
     except Exception as exc:
         app.logger.exception(
             "Error auto-creating absences for ended classes: %s", exc
@@ -420,31 +1180,22 @@ def _auto_create_absences_for_ended_classes():
 
 def _get_teacher_profile(teacher_id=None, teacher_email=None):
     """Fetch minimal teacher profile for display."""
-    users_collection = db.collection("users")
-
     if teacher_id:
         try:
-            doc_ref = users_collection.document(teacher_id)
-            snapshot = doc_ref.get()
+            profile = FIRESTORE_DOCS.get_user(teacher_id)
         except Exception:
-            snapshot = None
-        else:
-            if snapshot and getattr(snapshot, "exists", False):
-                profile = snapshot.to_dict() or {}
-                doc_id = getattr(snapshot, "id", None) or getattr(doc_ref, "id", None) or teacher_id
-                return doc_id, profile
+            profile = None
+        if profile is not None:
+            return teacher_id, profile
 
     if teacher_email:
         try:
-            query = users_collection.where("email", "==", teacher_email).limit(1)
-            snapshot = next(query.stream(), None)
+            doc_id = FIRESTORE_DOCS.uid_for_email(teacher_email)
+            profile = FIRESTORE_DOCS.get_user(doc_id)
         except Exception:
-            snapshot = None
-        else:
-            if snapshot and getattr(snapshot, "exists", False):
-                profile = snapshot.to_dict() or {}
-                doc_id = getattr(snapshot, "id", None) or getattr(snapshot, "id", None)
-                return doc_id, profile
+            profile = None
+        if profile is not None:
+            return doc_id, profile
 
     return None, None
 
@@ -522,33 +1273,57 @@ def _parse_schedule_string(schedule_str):
         return []
 
 
+# Fields the roster helpers need from each student's user document.
+ROSTER_PROFILE_FIELDS = ("email", "fname", "lname")
+
+
 def _get_user_doc(user_id):
     """
-    Fetch a user document by its document ID (e.g., 'S1000', 'T2000').
-    Returns (snapshot, data_dict) or (None, {}).
+    Fetch a user document by its document ID (e.g., 'S1000', 'T2000'),
+    cached for FIRESTORE_CACHE_TTL_SECONDS.
+    Returns (user_id, data_dict) or (None, {}).
     """
     if not user_id:
         return None, {}
     try:
-        doc_ref = db.collection("users").document(user_id)
-        snap = doc_ref.get()
-        if getattr(snap, "exists", False):
-            return snap, snap.to_dict() or {}
+        data = FIRESTORE_DOCS.get_user(user_id)
+        if data is not None:
+            return user_id, data
     except Exception as exc:
         app.logger.warning("Failed to fetch user %s: %s", user_id, exc)
     return None, {}
 
 
-def _collect_student_targets_for_class(class_data):
+def _get_user_profiles(user_ids, field_paths=ROSTER_PROFILE_FIELDS):
+    """
+    Fetch roster user documents in batched reads (FIRESTORE_GET_ALL_CHUNK_SIZE
+    per round trip). Returns {user_id: profile}; users that do not exist or
+    could not be read are left out.
+    """
+    try:
+        return FIRESTORE_DOCS.get_users(
+            user_ids,
+            field_paths=field_paths,
+            chunk_size=FIRESTORE_GET_ALL_CHUNK_SIZE,
+        )
+    except Exception as exc:
+        app.logger.warning("Failed to fetch user profiles: %s", exc)
+        return {}
+
+
+def _collect_student_targets_for_class(class_data, profiles=None):
     """
     Given a class document dict, return a list of target identifiers
-    (emails) for enrolled students.
+    (emails) for enrolled students. ``profiles`` is a studentId -> profile
+    map from _get_user_profiles, fetched here when not given.
     """
     students = class_data.get("students") or []
+    if profiles is None:
+        profiles = _get_user_profiles(students)
     targets = []
 
     for student_id in students:
-        _, user_data = _get_user_doc(student_id)
+        user_data = profiles.get(student_id, {})
         email = (user_data.get("email") or "").strip().lower()
         if email:
             targets.append(email)
@@ -691,14 +1466,13 @@ def _maybe_notify_absence_threshold(class_id, record):
             return
 
         # Load class & teacher info
-        class_snap = db.collection("classes").document(class_id).get()
-        if not getattr(class_snap, "exists", False):
+        class_data = _get_class_document(class_id)
+        if class_data is None:
             app.logger.warning(
                 "Class doc %s not found for absence threshold check", class_id
             )
             return
 
-        class_data = class_snap.to_dict() or {}
         class_name = class_data.get("name") or class_id
 
         teacher_targets = _get_teacher_targets_for_class(class_data)
@@ -741,6 +1515,7 @@ def _maybe_notify_absence_threshold(class_id, record):
         # Update student's absenceNotifications map so we don't notify again at 5
         field_path = f"absenceNotifications.{class_id}"
         db.collection("users").document(student_id).update({field_path: absence_count})
+        FIRESTORE_DOCS.invalidate_user(student_id)
     except Exception as exc:
         app.logger.exception(
             "Error evaluating absence threshold notification for %s/%s: %s",
@@ -752,32 +1527,46 @@ def _maybe_notify_absence_threshold(class_id, record):
 
 
 
-def _iter_today_class_meetings():
+def _today_class_meetings():
     """
-    Yield (class_id, class_data, start_dt) for each class that meets today.
+    Return [(class_id, class_data, start_dt), ...] for each class that meets today.
+
+    The classes stream is read to the end before anything else happens, so
+    callers never keep it open while they work. A failed read raises.
     """
     now = datetime.datetime.now(CENTRAL_TZ)
     today_weekday = now.weekday()
-    classes_ref = db.collection("classes")
+    snapshots = list(db.collection("classes").stream())
 
-    try:
-        for snap in classes_ref.stream():
-            class_id = snap.id
-            class_data = snap.to_dict() or {}
-            schedule_str = class_data.get("schedule")
-            if not schedule_str:
+    meetings_today = []
+    for snap in snapshots:
+        class_id = snap.id
+        class_data = snap.to_dict() or {}
+        schedule_str = class_data.get("schedule")
+        if not schedule_str:
+            continue
+
+        meetings = _parse_schedule_string(schedule_str)
+        for meeting in meetings:
+            if meeting["weekday"] != today_weekday:
                 continue
+            start_dt = datetime.datetime.combine(
+                now.date(), meeting["start_time"], tzinfo=CENTRAL_TZ
+            )
+            meetings_today.append((class_id, class_data, start_dt))
+    return meetings_today
 
-            meetings = _parse_schedule_string(schedule_str)
-            for meeting in meetings:
-                if meeting["weekday"] != today_weekday:
-                    continue
-                start_dt = datetime.datetime.combine(
-                    now.date(), meeting["start_time"], tzinfo=CENTRAL_TZ
-                )
-                yield class_id, class_data, start_dt
+
+def _iter_today_class_meetings():
+    """
+    Yield (class_id, class_data, start_dt) for each class that meets today.
+    """
+    try:
+        meetings = _today_class_meetings()
     except Exception as exc:
         app.logger.exception("Error iterating class meetings: %s", exc)
+        return
+    yield from meetings
 
 
 def _check_and_send_class_time_notifications():
@@ -791,6 +1580,11 @@ def _check_and_send_class_time_notifications():
     for class_id, class_data, start_dt in _iter_today_class_meetings():
         minutes_to_start = (start_dt - now).total_seconds() / 60.0
         date_key = start_dt.strftime("%Y%m%d")
+        upcoming = 9.0 <= minutes_to_start <= 11.0
+        starting = -1.0 <= minutes_to_start <= 1.0
+        # Only read the roster's profiles for a meeting that is due a notification
+        if not (upcoming or starting):
+            continue
 
         # Build student targets
         student_targets = _collect_student_targets_for_class(class_data)
@@ -801,7 +1595,7 @@ def _check_and_send_class_time_notifications():
         room = class_data.get("room") or ""
 
         # 1) About 10 minutes before class
-        if 9.0 <= minutes_to_start <= 11.0:
+        if upcoming:
             notif_id = f"class_{class_id}_{date_key}_pre"
             payload = {
                 "type": "class_upcoming_student",
@@ -821,7 +1615,7 @@ def _check_and_send_class_time_notifications():
             _create_notification_if_missing(notif_id, payload)
 
         # 2) At class start time
-        if -1.0 <= minutes_to_start <= 1.0:
+        if starting:
             notif_id = f"class_{class_id}_{date_key}_start"
             payload = {
                 "type": "class_start_student",
@@ -910,10 +1704,8 @@ def _resolve_student_name(student_id):
         return None
 
     try:
-        user_ref = db.collection("users").document(student_id)
-        user_snapshot = user_ref.get()
-        if user_snapshot.exists:
-            user_data = user_snapshot.to_dict() or {}
+        user_data = FIRESTORE_DOCS.get_user(student_id)
+        if user_data is not None:
             return user_data.get("name") or user_data.get("fullName") or user_data.get("displayName")
     except Exception:
         pass
@@ -1428,254 +2220,679 @@ def export_attendance():
     )
 
 
-def _process_face_recognition_request():
-    temp_captured_path = "temp_captured_face.jpg"
-    temp_known_path = "temp_known_face.jpg"
+# Content types accepted as a raw image request body.
+_RAW_IMAGE_MIMETYPES = {"application/octet-stream", "image/jpeg", "image/png", "image/webp"}
+
+
+def _read_scan_payload():
+    """
+    Return (image_bytes, class_id, student_id) for a face scan request.
+
+    Accepts three encodings:
+      - JSON with a base64 (or data URL) ``image`` plus classId/studentId;
+      - multipart/form-data with an ``image`` file part and classId/studentId
+        form fields;
+      - a raw image body (application/octet-stream or image/*) with metadata
+        in X-Class-Id/X-Student-Id headers or classId/studentId query args.
+
+    The binary forms skip the base64 round-trip: the body is read once and
+    decoded straight from that buffer. Multipart file parts are buffered in
+    memory (see _InMemoryUploadRequest) rather than spooled to disk. Missing values are returned as None;
+    invalid base64 raises ValueError.
+    """
+    mimetype = (getattr(request, "mimetype", None) or "").lower()
+
+    if mimetype == "multipart/form-data":
+        upload = request.files.get("image")
+        image_bytes = upload.read() if upload is not None else None
+        return image_bytes or None, request.form.get("classId"), request.form.get("studentId")
+
+    if mimetype in _RAW_IMAGE_MIMETYPES:
+        args = getattr(request, "args", None) or {}
+        class_id = request.headers.get("X-Class-Id") or args.get("classId")
+        student_id = request.headers.get("X-Student-Id") or args.get("studentId")
+        return request.get_data(cache=False) or None, class_id, student_id
+
+    data = request.get_json() or {}
+    image_b64 = data.get("image")
+    image_bytes = None
+    if image_b64:
+        # Strip a "data:image/jpeg;base64," prefix if present.
+        prefix_end = image_b64.find(",", 0, 64)
+        if prefix_end >= 0:
+            image_b64 = image_b64[prefix_end + 1:]
+        try:
+            image_bytes = base64.b64decode(image_b64)
+        except Exception as exc:
+            raise ValueError("Invalid image data.") from exc
+    return image_bytes, data.get("classId"), data.get("studentId")
+
+
+# Finished scan responses, kept for SCAN_RESULT_TTL_SECONDS so a client that
+# resubmits the same frame (flaky Wi-Fi, double taps) gets the first answer
+# instead of re-running the pipeline. A submission is identified by its
+# Idempotency-Key header or, failing that, a hash of the image bytes.
+SCAN_RESULT_TTL_SECONDS = float(os.environ.get("SCAN_RESULT_TTL_SECONDS", "180"))
+SCAN_RESULTS = TTLCache(
+    SCAN_RESULT_TTL_SECONDS,
+    max_entries=int(os.environ.get("SCAN_RESULT_CACHE_SIZE", "4096")),
+)
+
+
+def _stored_scan_response(response):
+    """Turn a handler's response tuple into (payload, status, headers)."""
+    body, status, *rest = response
+    payload = body.get_json() if hasattr(body, "get_json") else body
+    return payload, status, dict(rest[0]) if rest else {}
+
+
+def _scan_response_is_final(stored):
+    # Busy, timed-out and failed scans may succeed when retried.
+    return stored[1] < 500
+
+
+def _run_scan_once(scope, image_data, deadline, run, idempotency_key=None):
+    """
+    Run ``run()`` once per scan submission and return its response tuple.
+
+    A resubmission for the same ``scope`` (endpoint, class and student) within
+    SCAN_RESULT_TTL_SECONDS is answered from SCAN_RESULTS with an
+    ``Idempotent-Replayed: true`` header; one that arrives while the first is
+    still running waits for its result instead of starting a second pipeline.
+    ``idempotency_key`` is the client's Idempotency-Key header, if any.
+    """
+    if idempotency_key:
+        submission = f"key:{idempotency_key}"
+    else:
+        submission = f"sha256:{hashlib.sha256(image_data).hexdigest()}"
+
+    fresh = []
+    started = []
+
+    def _run():
+        started.append(True)
+        response = run()
+        fresh.append(response)
+        return _stored_scan_response(response)
 
     try:
-        data = request.get_json() or {}
-        image_b64 = data.get("image")
-        class_id = data.get("classId")
-        student_id = data.get("studentId")
+        payload, status, headers = SCAN_RESULTS.get_or_compute(
+            scope + (submission,),
+            _run,
+            cache_if=_scan_response_is_final,
+            timeout=max(0.0, deadline - time.monotonic()),
+        )
+    except DeadlineExceeded:
+        raise
+    except concurrent.futures.TimeoutError:
+        if started:
+            # Raised by this request's own pipeline, not by waiting.
+            raise
+        # Gave up waiting for the duplicate submission's pipeline.
+        _deadline_exceeded("duplicate scan")
 
-        if not image_b64 or not class_id or not student_id:
-            return jsonify({"status": "error", "message": "Missing image, classId, or studentId"}), 400
+    if fresh:
+        return fresh[0]
+    return jsonify(payload), status, {**headers, "Idempotent-Replayed": "true"}
 
-        # Download known face image from storage
-        blob = bucket.blob(f"known_faces/{student_id}.jpg")
-        if not blob.exists():
-            return jsonify(
-                {"status": "error", "message": "No known face image found for this student."}
-            ), 404
-        blob.download_to_filename(temp_known_path)
 
-        # Decode base64 image ("data:image/jpeg;base64,..." or raw base64)
-        if "," in image_b64:
-            image_b64 = image_b64.split(",", 1)[1]
+def _deadline_exceeded_response(exc):
+    return jsonify({"status": "error", "message": f"Scan timed out: {exc}."}), 504
 
-        try:
-            image_data = base64.b64decode(image_b64)
-        except Exception:
-            return jsonify({"status": "error", "message": "Invalid image data."}), 400
 
-        np_arr = np.frombuffer(image_data, np.uint8)
-        captured_img = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-        if captured_img is None:
-            return jsonify(
-                {"status": "error", "message": "Captured image could not be decoded."}
-            ), 400
-
-        if not hasattr(captured_img, "shape"):
-            class _SimpleImage:
-                shape = (100, 100, 3)
-
-            captured_img = _SimpleImage()
-
-        # Downscale + simple face detection
-        max_dim = 640
-        h, w = captured_img.shape[:2]
-        scale = max(h, w) / max_dim
-        if scale > 1:
-            new_w, new_h = int(w / scale), int(h / scale)
-            processed_img = cv2.resize(captured_img, (new_w, new_h))
-        else:
-            processed_img = captured_img
+def _inference_busy_response():
+    return (
+        jsonify(
+            {
+                "status": "busy",
+                "message": "Face recognition is busy. Please try again in a moment.",
+            }
+        ),
+        503,
+        {"Retry-After": str(INFERENCE_RETRY_AFTER_SECONDS)},
+    )
 
-        try:
-            if hasattr(cv2, "cvtColor") and hasattr(cv2, "CascadeClassifier"):
-                gray = cv2.cvtColor(processed_img, cv2.COLOR_BGR2GRAY)
-                face_cascade = cv2.CascadeClassifier(
-                    cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-                )
-                faces = face_cascade.detectMultiScale(
-                    gray,
-                    scaleFactor=1.1,
-                    minNeighbors=5,
-                    minSize=(80, 80),
-                )
-            else:
-                faces = [[0]]
-        except Exception:
-            faces = [[0]]
 
-        if len(faces) == 0:
-            return jsonify(
+def _extract_scan_face(image_data, deadline=None):
+    """
+    Decode a captured frame, downscale it and detect the face once.
+
+    The frame and the face crop go through FACE_QUALITY_GATE first, so dark,
+    blurry or distant captures are turned away before any inference runs.
+    Returns (captured_face, None) with the aligned face crop, or
+    (None, error_response) when the frame is unusable. Raises
+    DeadlineExceeded if ``deadline`` passes before decoding or detection.
+    """
+    _check_deadline(deadline, "decode")
+    captured_img = _decode_image_bytes(image_data)
+    if captured_img is None:
+        return None, (
+            jsonify({"status": "error", "message": "Captured image could not be decoded."}),
+            400,
+        )
+
+    if not hasattr(captured_img, "shape"):
+        class _SimpleImage:
+            shape = (100, 100, 3)
+
+        captured_img = _SimpleImage()
+
+    # Downscale, then detect the face once; only the aligned crop is
+    # embedded.
+    h, w = captured_img.shape[:2]
+    scale = max(h, w) / SCAN_MAX_SIDE_PX
+    if scale > 1:
+        new_w, new_h = int(w / scale), int(h / scale)
+        processed_img = cv2.resize(captured_img, (new_w, new_h))
+    else:
+        processed_img = captured_img
+
+    started = time.perf_counter()
+    issue = _scan_quality_issue(processed_img)
+    if issue is not None:
+        FACE_QUALITY_GATE.record(issue, time.perf_counter() - started)
+        return None, _quality_failure_response(issue)
+
+    _check_deadline(deadline, "detection")
+    try:
+        captured_face = _detect_face(processed_img)
+    except Exception:
+        # A broken detector should not block attendance; verify the
+        # whole frame as DeepFace did when it found no face.
+        app.logger.exception("Face detection failed; verifying the full frame")
+        FACE_QUALITY_GATE.record(None, time.perf_counter() - started)
+        return processed_img, None
+
+    if captured_face is None:
+        FACE_QUALITY_GATE.record("no_face", time.perf_counter() - started)
+        return None, (
+            jsonify(
                 {
                     "status": "fail",
                     "message": "No face detected. Make sure your face is clearly visible to the camera.",
                 }
-            ), 400
+            ),
+            400,
+        )
 
-        cv2.imwrite(temp_captured_path, processed_img)
+    issue = _scan_quality_issue(captured_face, face=True)
+    FACE_QUALITY_GATE.record(issue, time.perf_counter() - started)
+    if issue is not None:
+        return None, _quality_failure_response(issue)
 
-        # ---------- Facial recognition with VGG-Face ----------
-        try:
-            verify_result = _perform_face_verification(
-                temp_captured_path, temp_known_path, timeout_seconds=15
-            )
-        except (TimeoutError, concurrent.futures.TimeoutError):
-            return jsonify({"status": "error", "message": "Face verification timed out."}), 504
-        except Exception as exc:
-            app.logger.exception("Face verification failed")
-            return jsonify(
+    return captured_face, None
+
+
+def _scan_quality_issue(img, face=False):
+    """Run the frame (or face crop) quality checks; a broken check never blocks the scan."""
+    try:
+        if face:
+            return FACE_QUALITY_GATE.face_issue(img)
+        return FACE_QUALITY_GATE.frame_issue(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+    except Exception:
+        app.logger.exception("Scan quality check failed; skipping it")
+        return None
+
+
+def _quality_failure_response(issue):
+    return (
+        jsonify(
+            {
+                "status": "fail",
+                "reason": issue,
+                "message": face_quality.QUALITY_MESSAGES[issue],
+            }
+        ),
+        400,
+    )
+
+
+# Independent Firestore reads made while screening a scan run side by side.
+_FIRESTORE_READS = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.environ.get("FIRESTORE_READ_WORKERS", "8")),
+    thread_name_prefix="firestore-read",
+)
+
+
+def _attendance_doc_id(class_id, student_id, now_central):
+    return f"{class_id}_{student_id}_{now_central.strftime('%Y-%m-%d')}"
+
+
+def _existing_attendance_response(existing_record, doc_id, student_id, response_extra=None):
+    """Response for a scan when today's attendance record already exists."""
+    if existing_record.get("status") == "pending":
+        existing_recheck_due = existing_record.get("pendingRecheckAt")
+        if isinstance(existing_recheck_due, datetime.datetime):
+            existing_recheck_due_iso = existing_recheck_due.isoformat()
+        else:
+            existing_recheck_due_iso = None
+
+        return (
+            jsonify(
                 {
-                    "status": "error",
-                    "message": f"Face verification failed: {exc}",
+                    "status": "pending",
+                    "message": "Attendance scan is pending verification. Please leave the webpage open until it is resolved.",
+                    "recognized_student": student_id,
+                    "pending": True,
+                    "proposed_attendance_status": existing_record.get(
+                        "proposedStatus"
+                    ),
+                    "recheck_due_at": existing_recheck_due_iso,
+                    "recordId": doc_id,
+                    **(response_extra or {}),
                 }
-            ), 502
-
-        distance = verify_result.get("distance")
-        if distance is None:
-            return jsonify(
-                {"status": "fail", "message": "Face verification failed (no distance)."}
-            ), 400
-
-        # Threshold for VGG-Face – tune this if needed
-        INTERNAL_THRESHOLD = verify_result.get("max_threshold_to_verify") or 0.35
-        if distance > INTERNAL_THRESHOLD or not verify_result.get("verified", False):
-            return jsonify(
-                {"status": "fail", "message": "Face not recognized"}
-            ), 404
-
-        now_central = datetime.datetime.now(CENTRAL_TZ)
-        today_str = now_central.strftime("%Y-%m-%d")
-        doc_id = f"{class_id}_{student_id}_{today_str}"
-
-        attendance_doc_ref = db.collection("attendance").document(doc_id)
-        attendance_doc = attendance_doc_ref.get()
+            ),
+            202,
+        )
+
+    return (
+        jsonify(
+            {
+                "status": "already_marked",
+                "message": "Attendance already recorded today.",
+                **(response_extra or {}),
+            }
+        ),
+        200,
+    )
+
+
+def _scan_window_status(class_data, now_central):
+    """
+    Return (proposed_status, None) for a scan at ``now_central``, or
+    (None, error_response) when the class has no valid schedule or the scan
+    falls outside its attendance window.
+    """
+    schedule_str = class_data.get("schedule", "").strip()
+    if not schedule_str:
+        return None, (
+            jsonify({"status": "error", "message": "No schedule defined for this class"}),
+            400,
+        )
+
+    start_time, end_time = parse_schedule(schedule_str)
+    if not start_time or not end_time:
+        return None, (jsonify({"status": "error", "message": "Invalid schedule format"}), 400)
+
+    start_dt = datetime.datetime(
+        now_central.year,
+        now_central.month,
+        now_central.day,
+        start_time.hour,
+        start_time.minute,
+        0,
+        0,
+        tzinfo=CENTRAL_TZ,
+    )
+    end_dt = datetime.datetime(
+        now_central.year,
+        now_central.month,
+        now_central.day,
+        end_time.hour,
+        end_time.minute,
+        0,
+        0,
+        tzinfo=CENTRAL_TZ,
+    )
+
+    status, error_msg = get_attendance_status(now_central, start_dt, end_dt)
+    if error_msg:
+        return None, (jsonify({"status": "fail", "message": error_msg}), 400)
+    return status, None
+
+
+def _screen_scan(class_id, student_id=None, class_data=None, deadline=None):
+    """
+    Run a scan's cheap rejections before any Storage or model work.
+
+    Today's attendance record (when ``student_id`` is known) and the class
+    document (unless ``class_data`` is given) are read concurrently, and
+    DeadlineExceeded is raised if either read outlasts ``deadline``. Returns
+    (screen, None) where ``screen`` is passed to _record_scan_attendance as
+    ``screened``, or (None, response) for a scan that is already recorded,
+    for an unknown class, or outside the class's schedule window.
+    """
+    now_central = datetime.datetime.now(CENTRAL_TZ)
+    _check_deadline(deadline, "firestore")
+
+    attendance_future = class_future = None
+    if student_id is not None:
+        doc_id = _attendance_doc_id(class_id, student_id, now_central)
+        attendance_future = _FIRESTORE_READS.submit(
+            db.collection("attendance").document(doc_id).get
+        )
+    if class_data is None:
+        class_future = _FIRESTORE_READS.submit(_get_class_document, class_id)
 
+    if attendance_future is not None:
+        try:
+            attendance_doc = _await_result(attendance_future, deadline, "firestore")
+        except BaseException:
+            if class_future is not None:
+                class_future.cancel()
+            raise
         if attendance_doc.exists:
-            existing_record = attendance_doc.to_dict() or {}
-            if existing_record.get("status") == "pending":
-                existing_recheck_due = existing_record.get("pendingRecheckAt")
-                if isinstance(existing_recheck_due, datetime.datetime):
-                    existing_recheck_due_iso = existing_recheck_due.isoformat()
-                else:
-                    existing_recheck_due_iso = None
-
-                return (
-                    jsonify(
-                        {
-                            "status": "pending",
-                            "message": "Attendance scan is pending verification. Please leave the webpage open until it is resolved.",
-                            "recognized_student": student_id,
-                            "pending": True,
-                            "proposed_attendance_status": existing_record.get(
-                                "proposedStatus"
-                            ),
-                            "recheck_due_at": existing_recheck_due_iso,
-                            "recordId": doc_id,
-                        }
-                    ),
-                    202,
-                )
+            if class_future is not None:
+                class_future.cancel()
+            return None, _existing_attendance_response(
+                attendance_doc.to_dict() or {}, doc_id, student_id
+            )
 
-            return (
-                jsonify(
-                    {
-                        "status": "already_marked",
-                        "message": "Attendance already recorded today.",
-                    }
-                ),
-                200,
+    if class_future is not None:
+        class_data = _await_result(class_future, deadline, "firestore")
+        if class_data is None:
+            return None, (jsonify({"status": "error", "message": "Class not found"}), 404)
+
+    status, error_response = _scan_window_status(class_data, now_central)
+    if error_response is not None:
+        return None, error_response
+    return {
+        "now": now_central,
+        "class_data": class_data,
+        "status": status,
+        "attendance_checked": attendance_future is not None,
+    }, None
+
+
+def _scan_network_evidence():
+    """Client network details stored with an attendance record."""
+    return {
+        "remoteAddr": request.remote_addr,
+        "xForwardedFor": request.headers.get("X-Forwarded-For"),
+        "xRealIp": request.headers.get("X-Real-IP"),
+        "userAgent": request.headers.get("User-Agent"),
+        "forwardedProto": request.headers.get("X-Forwarded-Proto"),
+        "requestId": request.headers.get("X-Request-Id"),
+    }
+
+
+def _record_scan_attendance(
+    class_id,
+    student_id,
+    distance,
+    threshold,
+    class_data=None,
+    verification_extra=None,
+    response_extra=None,
+    deadline=None,
+    network_evidence=None,
+    screened=None,
+):
+    """
+    Write the pending attendance record for a recognized scan.
+
+    Shared by the 1:1 verify and the 1:N identify endpoints. Returns the
+    Flask response tuple; ``class_data`` skips re-reading the class document
+    when the caller already has it, and ``response_extra`` is merged into
+    successful responses. ``screened`` is the result of _screen_scan: the
+    checks it already made (existing record, schedule window) are not
+    repeated. Raises DeadlineExceeded if ``deadline`` passes before a
+    Firestore call. ``network_evidence`` defaults to the current request's;
+    scan jobs capture it before leaving the request thread.
+    """
+    screen = screened or {}
+    now_central = screen.get("now") or datetime.datetime.now(CENTRAL_TZ)
+    doc_id = _attendance_doc_id(class_id, student_id, now_central)
+    attendance_doc_ref = db.collection("attendance").document(doc_id)
+
+    if not screen.get("attendance_checked"):
+        _check_deadline(deadline, "firestore")
+        attendance_doc = attendance_doc_ref.get()
+        if attendance_doc.exists:
+            return _existing_attendance_response(
+                attendance_doc.to_dict() or {}, doc_id, student_id, response_extra
             )
 
-        class_doc = db.collection("classes").document(class_id).get()
-        if not class_doc.exists:
-            return jsonify({"status": "error", "message": "Class not found"}), 404
+    status = screen.get("status")
+    if status is None:
+        if class_data is None:
+            _check_deadline(deadline, "firestore")
+            class_data = _get_class_document(class_id)
+            if class_data is None:
+                return jsonify({"status": "error", "message": "Class not found"}), 404
 
-        class_data = class_doc.to_dict() or {}
-        schedule_str = class_data.get("schedule", "").strip()
-        if not schedule_str:
-            return jsonify(
-                {"status": "error", "message": "No schedule defined for this class"}
-            ), 400
-
-        start_time, end_time = parse_schedule(schedule_str)
-        if not start_time or not end_time:
-            return jsonify(
-                {"status": "error", "message": "Invalid schedule format"}
-            ), 400
-
-        start_dt = datetime.datetime(
-            now_central.year,
-            now_central.month,
-            now_central.day,
-            start_time.hour,
-            start_time.minute,
-            0,
-            0,
-            tzinfo=CENTRAL_TZ,
-        )
-        end_dt = datetime.datetime(
-            now_central.year,
-            now_central.month,
-            now_central.day,
-            end_time.hour,
-            end_time.minute,
-            0,
-            0,
-            tzinfo=CENTRAL_TZ,
+        status, error_response = _scan_window_status(class_data, now_central)
+        if error_response is not None:
+            return error_response
+
+    if network_evidence is None:
+        network_evidence = _scan_network_evidence()
+
+    pending_recheck_at = now_central + datetime.timedelta(
+        minutes=PENDING_RECHECK_MINUTES
+    )
+
+    attendance_record = {
+        "studentID": student_id,
+        "classID": class_id,
+        "date": now_central,
+        "status": "pending",
+        "isPending": True,
+        "proposedStatus": status,
+        "createdAt": firestore.SERVER_TIMESTAMP,
+        "updatedAt": firestore.SERVER_TIMESTAMP,
+        "pendingRecheckAt": pending_recheck_at,
+        "networkEvidence": network_evidence,
+        "verification": {
+            "distance": float(distance),
+            "threshold": threshold,
+            "model": FACE_MODEL_NAME,
+            **(verification_extra or {}),
+        },
+    }
+    _check_deadline(deadline, "firestore")
+    attendance_doc_ref.set(attendance_record)
+
+    response_payload = {
+        "status": "pending",
+        "recognized_student": student_id,
+        "pending": True,
+        "proposed_attendance_status": status,
+        "recheck_due_at": pending_recheck_at.isoformat(),
+        "recordId": doc_id,
+        **(response_extra or {}),
+    }
+
+    return jsonify(response_payload), 202
+
+
+def _process_face_recognition_request():
+    deadline = _scan_deadline()
+    try:
+        try:
+            image_data, class_id, student_id = _read_scan_payload()
+        except ValueError:
+            return jsonify({"status": "error", "message": "Invalid image data."}), 400
+
+        if not image_data or not class_id or not student_id:
+            return jsonify({"status": "error", "message": "Missing image, classId, or studentId"}), 400
+
+        return _run_scan_once(
+            ("verify", class_id, student_id),
+            image_data,
+            deadline,
+            lambda: _verify_scan(image_data, class_id, student_id, deadline),
+            idempotency_key=request.headers.get("Idempotency-Key"),
         )
 
-        status, error_msg = get_attendance_status(now_central, start_dt, end_dt)
-        if error_msg:
-            return jsonify({"status": "fail", "message": error_msg}), 400
-
-        network_evidence = {
-            "remoteAddr": request.remote_addr,
-            "xForwardedFor": request.headers.get("X-Forwarded-For"),
-            "xRealIp": request.headers.get("X-Real-IP"),
-            "userAgent": request.headers.get("User-Agent"),
-            "forwardedProto": request.headers.get("X-Forwarded-Proto"),
-            "requestId": request.headers.get("X-Request-Id"),
-        }
+    except DeadlineExceeded as exc:
+        return _deadline_exceeded_response(exc)
+    except Exception as e:
+        app.logger.exception("Unhandled error in _process_face_recognition_request")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+def _verify_scan(image_data, class_id, student_id, deadline, network_evidence=None):
+    """1:1 pipeline behind /api/face-recognition; returns the response tuple."""
+    # Reject scans that are already recorded or outside the class window
+    # before touching Storage or the model.
+    screened, error_response = _screen_scan(class_id, student_id, deadline=deadline)
+    if error_response is not None:
+        return error_response
+
+    # Resolve the known face's current generation (cached for a short
+    # window), which versions the cached embedding. The image itself is
+    # only downloaded when neither the embedding nor the image is cached.
+    _check_deadline(deadline, "storage")
+    known_faces = _known_face_templates(student_id)
+    if not known_faces:
+        return jsonify(
+            {"status": "error", "message": "No known face image found for this student."}
+        ), 404
+
+    captured_face, error_response = _extract_scan_face(image_data, deadline=deadline)
+    if error_response is not None:
+        return error_response
 
-        pending_recheck_at = now_central + datetime.timedelta(
-            minutes=PENDING_RECHECK_MINUTES
+    # ---------- Facial recognition with FACE_MODEL_NAME ----------
+    try:
+        verify_result = _perform_face_verification(
+            captured_face,
+            student_id,
+            known_faces,
+            deadline=deadline,
         )
+    except InferenceQueueFull:
+        return _inference_busy_response()
+    except (TimeoutError, concurrent.futures.TimeoutError):
+        return jsonify({"status": "error", "message": "Face verification timed out."}), 504
+    except Exception as exc:
+        app.logger.exception("Face verification failed")
+        return jsonify(
+            {
+                "status": "error",
+                "message": f"Face verification failed: {exc}",
+            }
+        ), 502
 
-        attendance_record = {
-            "studentID": student_id,
-            "classID": class_id,
-            "date": now_central,
-            "status": "pending",
-            "isPending": True,
-            "proposedStatus": status,
-            "createdAt": firestore.SERVER_TIMESTAMP,
-            "updatedAt": firestore.SERVER_TIMESTAMP,
-            "pendingRecheckAt": pending_recheck_at,
-            "networkEvidence": network_evidence,
-            "verification": {
-                "distance": float(distance),
-                "threshold": INTERNAL_THRESHOLD,
-                "model": "VGG-Face",
-            },
-        }
-        attendance_doc_ref.set(attendance_record)
-
-        response_payload = {
-            "status": "pending",
-            "recognized_student": student_id,
-            "pending": True,
-            "proposed_attendance_status": status,
-            "recheck_due_at": pending_recheck_at.isoformat(),
-            "recordId": doc_id,
-        }
+    distance = verify_result.get("distance")
+    if distance is None:
+        return jsonify(
+            {"status": "fail", "message": "Face verification failed (no distance)."}
+        ), 400
 
-        return jsonify(response_payload), 202
+    INTERNAL_THRESHOLD = verify_result.get("max_threshold_to_verify") or FACE_MATCH_THRESHOLD
+    if distance > INTERNAL_THRESHOLD or not verify_result.get("verified", False):
+        return jsonify(
+            {"status": "fail", "message": "Face not recognized"}
+        ), 404
+
+    return _record_scan_attendance(
+        class_id,
+        student_id,
+        distance,
+        INTERNAL_THRESHOLD,
+        verification_extra={
+            key: verify_result[key]
+            for key in ("template", "templates")
+            if key in verify_result
+        },
+        class_data=screened["class_data"],
+        deadline=deadline,
+        network_evidence=network_evidence,
+        screened=screened,
+    )
+
+
+def _process_face_identification_request():
+    deadline = _scan_deadline()
+    try:
+        try:
+            image_data, class_id, _ = _read_scan_payload()
+        except ValueError:
+            return jsonify({"status": "error", "message": "Invalid image data."}), 400
 
+        if not image_data or not class_id:
+            return jsonify({"status": "error", "message": "Missing image or classId"}), 400
+
+        return _run_scan_once(
+            ("identify", class_id),
+            image_data,
+            deadline,
+            lambda: _identify_scan(image_data, class_id, deadline),
+            idempotency_key=request.headers.get("Idempotency-Key"),
+        )
+
+    except DeadlineExceeded as exc:
+        return _deadline_exceeded_response(exc)
     except Exception as e:
-        app.logger.exception("Unhandled error in _process_face_recognition_request")
+        app.logger.exception("Unhandled error in _process_face_identification_request")
         return jsonify({"status": "error", "message": str(e)}), 500
 
-    finally:
-        for p in (temp_captured_path, temp_known_path):
-            try:
-                if os.path.exists(p):
-                    os.remove(p)
-            except Exception:
-                pass
+
+def _identify_scan(image_data, class_id, deadline, network_evidence=None):
+    """1:N pipeline behind /api/face-recognition/identify; returns the response tuple."""
+    _check_deadline(deadline, "firestore")
+    class_data = _get_class_document(class_id)
+    if class_data is None:
+        return jsonify({"status": "error", "message": "Class not found"}), 404
+
+    student_ids = class_data.get("students") or []
+    if not student_ids:
+        return jsonify(
+            {"status": "error", "message": "No students are enrolled in this class."}
+        ), 404
+
+    # The student is not known until after inference, so only the class
+    # window can be checked up front; the attendance record is read later.
+    screened, error_response = _screen_scan(class_id, class_data=class_data, deadline=deadline)
+    if error_response is not None:
+        return error_response
+
+    captured_face, error_response = _extract_scan_face(image_data, deadline=deadline)
+    if error_response is not None:
+        return error_response
+
+    try:
+        identify_result = _perform_face_identification(
+            captured_face,
+            class_id,
+            student_ids,
+            deadline=deadline,
+        )
+    except InferenceQueueFull:
+        return _inference_busy_response()
+    except (TimeoutError, concurrent.futures.TimeoutError):
+        return jsonify({"status": "error", "message": "Face identification timed out."}), 504
+    except Exception as exc:
+        app.logger.exception("Face identification failed")
+        return jsonify(
+            {
+                "status": "error",
+                "message": f"Face identification failed: {exc}",
+            }
+        ), 502
+
+    student_id = identify_result.get("studentId")
+    distance = identify_result.get("distance")
+    margin = identify_result.get("margin")
+    threshold = identify_result.get("max_threshold_to_verify") or FACE_MATCH_THRESHOLD
+    if (
+        student_id is None
+        or distance is None
+        or distance > threshold
+        or (margin is not None and margin < FACE_IDENTIFY_MIN_MARGIN)
+    ):
+        return jsonify(
+            {"status": "fail", "message": "Face not recognized"}
+        ), 404
+
+    return _record_scan_attendance(
+        class_id,
+        student_id,
+        distance,
+        threshold,
+        class_data=class_data,
+        verification_extra={
+            "mode": "identify",
+            "margin": margin,
+            "candidates": identify_result.get("candidates"),
+        },
+        response_extra={"distance": float(distance), "margin": margin},
+        deadline=deadline,
+        network_evidence=network_evidence,
+        screened=screened,
+    )
 
 
 @app.route("/api/face-recognition", methods=["POST", "OPTIONS"])
@@ -1717,6 +2934,284 @@ def face_recognition():
     return _process_face_recognition_request()
 
 
+@app.route("/api/face-recognition/identify", methods=["POST", "OPTIONS"])
+def face_identification():
+    """
+    Kiosk check-in: identify who is in the frame from the class roster.
+
+    Takes classId and an image (same encodings as /api/face-recognition, no
+    studentId) and records attendance for the best match on the roster.
+    Subject to the same client IP allowlist as /api/face-recognition.
+    """
+    if request.method == "OPTIONS":
+        # CORS preflight
+        return "", 200
+
+    client_ip = get_client_ip(request)
+    host_header = request.headers.get("Host", "") or getattr(request, "host", "")
+
+    if not is_ip_allowed(client_ip):
+        app.logger.warning(
+            "Rejected face identification request from unauthorized IP %s (Host=%s)",
+            client_ip,
+            host_header,
+        )
+        return jsonify(
+            {
+                "status": "forbidden",
+                "message": "Access denied: client IP is not authorized to use this service.",
+            }
+        ), 403
+
+    return _process_face_identification_request()
+
+
+# ------------------------------
+# Asynchronous scan jobs
+# ------------------------------
+# POST /api/face-recognition/jobs answers 202 with a job id as soon as the
+# frame has been read. The pipeline then runs on SCAN_JOB_EXECUTOR and the
+# result is collected with GET /api/face-recognition/jobs/<id> or its /events
+# stream, so HTTP threads are not held for the length of inference. A job runs
+# in the worker process that accepted it; its state is mirrored to Firestore
+# scanJobs/{id} so polls and streams served by another worker can follow it.
+SCAN_JOB_EXECUTOR = InferenceExecutor(
+    max_workers=int(os.environ.get("SCAN_JOB_WORKERS", "8")),
+    max_queue=int(os.environ.get("SCAN_JOB_QUEUE_SIZE", "64")),
+    name="scan-jobs",
+)
+SCAN_JOBS = scan_jobs.ScanJobStore(
+    ttl_seconds=float(os.environ.get("SCAN_JOB_TTL_SECONDS", "300")),
+    client=lambda: db,
+)
+# An /events stream sends a comment line this often while it waits, and
+# closes after SCAN_JOB_EVENTS_MAX_SECONDS (the client can then poll). Each
+# open stream holds a request thread, and a job cannot outlive its scan
+# deadline, so the stream is bounded by that deadline plus a little slack.
+SCAN_JOB_HEARTBEAT_SECONDS = 10
+SCAN_JOB_EVENTS_MAX_SECONDS = float(
+    os.environ.get("SCAN_JOB_EVENTS_MAX_SECONDS", str(SCAN_DEADLINE_SECONDS + 5))
+)
+
+
+def _forbidden_scan_client(action):
+    """Return a 403 response if the client IP is not allowlisted, else None."""
+    client_ip = get_client_ip(request)
+    if is_ip_allowed(client_ip):
+        return None
+    app.logger.warning(
+        "Rejected %s request from unauthorized IP %s (Host=%s)",
+        action,
+        client_ip,
+        request.headers.get("Host", "") or getattr(request, "host", ""),
+    )
+    return jsonify(
+        {
+            "status": "forbidden",
+            "message": "Access denied: client IP is not authorized to use this service.",
+        }
+    ), 403
+
+
+def _run_scan_job(job_id, scope, image_data, deadline, run, idempotency_key):
+    SCAN_JOBS.mark_running(job_id)
+    with app.app_context():
+        try:
+            response = _run_scan_once(
+                scope, image_data, deadline, run, idempotency_key=idempotency_key
+            )
+        except DeadlineExceeded as exc:
+            response = _deadline_exceeded_response(exc)
+        except Exception as exc:
+            app.logger.exception("Scan job %s failed", job_id)
+            response = jsonify({"status": "error", "message": str(exc)}), 500
+        payload, status, _ = _stored_scan_response(response)
+    SCAN_JOBS.finish(job_id, payload, status)
+
+
+def _finish_dropped_scan_job(job_id, future):
+    # SCAN_JOB_EXECUTOR drops jobs whose deadline passed while still queued;
+    # a queued job's future can also be cancelled before it starts.
+    if future.cancelled():
+        SCAN_JOBS.finish(
+            job_id,
+            {"status": "error", "message": "Scan job was cancelled. Please try again."},
+            503,
+        )
+        return
+    exc = future.exception()
+    if isinstance(exc, DeadlineExceeded):
+        SCAN_JOBS.finish(
+            job_id,
+            {"status": "error", "message": "Scan timed out before it could start."},
+            504,
+        )
+    elif exc is not None:
+        # _run_scan_job turns pipeline errors into responses, so this is a
+        # failure of the job wrapper itself.
+        app.logger.error("Scan job %s failed: %s", job_id, exc)
+        SCAN_JOBS.finish(job_id, {"status": "error", "message": str(exc)}, 500)
+
+
+def _scan_job_body(job):
+    return {**(job["payload"] or {}), "jobId": job["jobId"]}
+
+
+def _submit_scan_job():
+    deadline = _scan_deadline()
+    identify = (getattr(request, "args", None) or {}).get("mode") == "identify"
+    try:
+        image_data, class_id, student_id = _read_scan_payload()
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid image data."}), 400
+
+    # Everything the pipeline needs from the request is captured here; the
+    # job runs after this request has been answered.
+    network_evidence = _scan_network_evidence()
+    if identify:
+        if not image_data or not class_id:
+            return jsonify({"status": "error", "message": "Missing image or classId"}), 400
+        scope = ("identify", class_id)
+        run = functools.partial(_identify_scan, image_data, class_id, deadline, network_evidence)
+    else:
+        if not image_data or not class_id or not student_id:
+            return jsonify({"status": "error", "message": "Missing image, classId, or studentId"}), 400
+        scope = ("verify", class_id, student_id)
+        run = functools.partial(
+            _verify_scan, image_data, class_id, student_id, deadline, network_evidence
+        )
+
+    job_id = SCAN_JOBS.create()
+    try:
+        future = SCAN_JOB_EXECUTOR.submit(
+            _run_scan_job,
+            job_id,
+            scope,
+            image_data,
+            deadline,
+            run,
+            request.headers.get("Idempotency-Key"),
+            deadline=deadline,
+        )
+    except InferenceQueueFull:
+        SCAN_JOBS.discard(job_id)
+        return _inference_busy_response()
+    future.add_done_callback(lambda done: _finish_dropped_scan_job(job_id, done))
+
+    status_url = f"/api/face-recognition/jobs/{job_id}"
+    return (
+        jsonify(
+            {
+                "status": "queued",
+                "jobId": job_id,
+                "statusUrl": status_url,
+                "eventsUrl": f"{status_url}/events",
+            }
+        ),
+        202,
+        {"Location": status_url},
+    )
+
+
+@app.route("/api/face-recognition/jobs", methods=["POST", "OPTIONS"])
+def face_recognition_jobs():
+    """
+    Submit a scan as a background job.
+
+    Takes the same payloads as /api/face-recognition, or with
+    ``?mode=identify`` those of /api/face-recognition/identify, and answers
+    202 with the job id, its statusUrl and its eventsUrl. Subject to the
+    same client IP allowlist.
+    """
+    if request.method == "OPTIONS":
+        # CORS preflight
+        return "", 200
+
+    forbidden = _forbidden_scan_client("face recognition job")
+    if forbidden is not None:
+        return forbidden
+    return _submit_scan_job()
+
+
+@app.route("/api/face-recognition/jobs/<job_id>", methods=["GET", "OPTIONS"])
+def face_recognition_job(job_id):
+    """
+    Poll a scan job.
+
+    While the job is queued or running this answers 202 with ``status``
+    "queued" or "running"; afterwards it answers with the body and HTTP
+    status the synchronous endpoint would have returned, plus ``jobId``.
+    """
+    if request.method == "OPTIONS":
+        # CORS preflight
+        return "", 200
+
+    forbidden = _forbidden_scan_client("face recognition job")
+    if forbidden is not None:
+        return forbidden
+
+    job = SCAN_JOBS.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Scan job not found or expired."}), 404
+    if job["state"] != scan_jobs.DONE:
+        return jsonify({"status": job["state"], "jobId": job_id}), 202, {"Retry-After": "1"}
+    return jsonify(_scan_job_body(job)), job["status"]
+
+
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _scan_job_events(job_id, job):
+    """Yield the SSE stream for ``job`` (a SCAN_JOBS snapshot) until it finishes."""
+    current = job
+    give_up_at = time.monotonic() + SCAN_JOB_EVENTS_MAX_SECONDS
+    while current["state"] != scan_jobs.DONE:
+        yield _sse_event("state", {"jobId": job_id, "state": current["state"]})
+        while True:
+            remaining = give_up_at - time.monotonic()
+            if remaining <= 0:
+                return
+            latest = SCAN_JOBS.wait(
+                job_id, current["state"], min(SCAN_JOB_HEARTBEAT_SECONDS, remaining)
+            )
+            if latest is None:
+                return
+            if latest["state"] != current["state"]:
+                current = latest
+                break
+            yield ": keep-alive\n\n"
+    yield _sse_event("result", {"status": current["status"], "body": _scan_job_body(current)})
+
+
+@app.route("/api/face-recognition/jobs/<job_id>/events", methods=["GET", "OPTIONS"])
+def face_recognition_job_events(job_id):
+    """
+    Server-sent events for a scan job.
+
+    Sends a ``state`` event ({"jobId", "state"}) for each state the job is
+    seen in, then a ``result`` event ({"status": <HTTP status>, "body":
+    <response body>}) and ends. Comment lines keep idle connections open.
+    """
+    if request.method == "OPTIONS":
+        # CORS preflight
+        return "", 200
+
+    forbidden = _forbidden_scan_client("face recognition job")
+    if forbidden is not None:
+        return forbidden
+
+    job = SCAN_JOBS.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Scan job not found or expired."}), 404
+
+    return Response(
+        stream_with_context(_scan_job_events(job_id, job)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 def _auto_absence_scheduler_loop():
     """
     Background thread that periodically checks for classes that have ended
@@ -1733,6 +3228,180 @@ def _auto_absence_scheduler_loop():
         time.sleep(60)
 
 
+# ------------------------------
+# Roster embedding prefetch
+# ------------------------------
+# FACE_PREFETCH_LEAD_MINUTES before each class meeting, every enrolled
+# student's known face is resolved, downloaded and embedded, and the vectors
+# are pinned in EMBEDDING_STORE until FACE_PREFETCH_PIN_MINUTES after the
+# start, so the scan burst at class start never waits on Storage or on
+# known-face inference. Set FACE_PREFETCH_LEAD_MINUTES=0 to disable.
+# Students are prefetched FACE_PREFETCH_WORKERS at a time, and a meeting's
+# prefetch stops after FACE_PREFETCH_TIMEOUT_SECONDS. The loop starts in every
+# worker process once its model is warm, since each worker has its own cache.
+FACE_PREFETCH_LEAD_MINUTES = float(os.environ.get("FACE_PREFETCH_LEAD_MINUTES", "15"))
+FACE_PREFETCH_PIN_MINUTES = float(os.environ.get("FACE_PREFETCH_PIN_MINUTES", "30"))
+FACE_PREFETCH_TIMEOUT_SECONDS = float(os.environ.get("FACE_PREFETCH_TIMEOUT_SECONDS", "120"))
+_PREFETCH_WORKERS = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.environ.get("FACE_PREFETCH_WORKERS", "4")),
+    thread_name_prefix="face-prefetch",
+)
+_prefetched_meetings = set()
+_face_prefetch_lock = threading.Lock()
+_face_prefetch_thread = None
+
+
+def _prefetch_student_embeddings(student_id, class_id, model_name, model_key, pin_until, deadline):
+    """Embed and pin one student's templates; returns "embedded", "missing" or "failed"."""
+    try:
+        templates = _known_face_templates(student_id)
+        if not templates:
+            return "missing"
+        for known_face in templates:
+            _get_known_face_embedding(
+                student_id, known_face, model_name=model_name, deadline=deadline
+            )
+            EMBEDDING_STORE.pin(
+                _known_face_embedding_key(student_id, known_face), model_key, pin_until
+            )
+        return "embedded"
+    except Exception:
+        app.logger.exception(
+            "Prefetch failed for student %s in class %s", student_id, class_id
+        )
+        return "failed"
+
+
+def _prefetch_class_embeddings(class_id, class_data, start_dt, model_name=FACE_MODEL_NAME):
+    """
+    Warm and pin the known-face embeddings for one class meeting.
+
+    Students are prefetched in parallel on _PREFETCH_WORKERS until
+    FACE_PREFETCH_TIMEOUT_SECONDS have passed. Returns a summary dict
+    (students, embedded, missing, failed, timedOut, seconds), which is also
+    logged.
+    """
+    student_ids = class_data.get("students") or []
+    started = time.monotonic()
+    seconds_to_start = (start_dt - datetime.datetime.now(CENTRAL_TZ)).total_seconds()
+    pin_until = started + max(seconds_to_start, 0.0) + FACE_PREFETCH_PIN_MINUTES * 60.0
+    model_key = _embedding_model_key(model_name)
+
+    deadline = started + FACE_PREFETCH_TIMEOUT_SECONDS
+
+    futures = [
+        _PREFETCH_WORKERS.submit(
+            _prefetch_student_embeddings,
+            student_id,
+            class_id,
+            model_name,
+            model_key,
+            pin_until,
+            deadline,
+        )
+        for student_id in student_ids
+    ]
+    done, not_done = concurrent.futures.wait(
+        futures, timeout=max(0.0, deadline - time.monotonic())
+    )
+    for future in not_done:
+        # Students still running stop at their next deadline check.
+        future.cancel()
+    outcomes = [future.result() for future in done if not future.cancelled()]
+    embedded = outcomes.count("embedded")
+    missing = outcomes.count("missing")
+    failed = outcomes.count("failed")
+    timed_out = len(not_done)
+
+    if embedded:
+        # Everything is cached now, so this only stacks (or revalidates) the
+        # matrix for /api/face-recognition/identify.
+        try:
+            _build_roster_matrix(
+                class_id, student_ids, model_name=model_name, deadline=deadline
+            )
+        except Exception:
+            app.logger.exception("Could not build roster matrix for class %s", class_id)
+
+    summary = {
+        "students": len(student_ids),
+        "embedded": embedded,
+        "missing": missing,
+        "failed": failed,
+        "timedOut": timed_out,
+        "seconds": time.monotonic() - started,
+    }
+    app.logger.info(
+        "Prefetched class %s (starts %s): %d/%d embeddings cached "
+        "(%d without a known face, %d failed, %d timed out) in %.1fs",
+        class_id,
+        start_dt.isoformat(),
+        embedded,
+        len(student_ids),
+        missing,
+        failed,
+        timed_out,
+        summary["seconds"],
+    )
+    return summary
+
+
+def _prefetch_upcoming_class_embeddings():
+    """
+    Prefetch every meeting starting within the lead window, once each.
+
+    Today's meetings are listed before any prefetch starts; if the classes
+    cannot be read the error propagates and the next tick tries again.
+    """
+    now = datetime.datetime.now(CENTRAL_TZ)
+    # Meetings that already started are never prefetched again.
+    for key in [key for key in _prefetched_meetings if key[1] < now]:
+        _prefetched_meetings.discard(key)
+
+    for class_id, class_data, start_dt in _today_class_meetings():
+        minutes_to_start = (start_dt - now).total_seconds() / 60.0
+        if not 0.0 <= minutes_to_start <= FACE_PREFETCH_LEAD_MINUTES:
+            continue
+        meeting_key = (class_id, start_dt)
+        if meeting_key in _prefetched_meetings:
+            continue
+        _prefetched_meetings.add(meeting_key)
+        _prefetch_class_embeddings(class_id, class_data, start_dt)
+
+
+def _face_prefetch_scheduler_loop():
+    """
+    Background thread that prefetches roster embeddings ahead of each class.
+    """
+    app.logger.info("Starting face embedding prefetch loop")
+    while True:
+        # Embedding before warm-up finishes would only add to the cold start.
+        if MODEL_READY.is_set():
+            try:
+                _prefetch_upcoming_class_embeddings()
+            except Exception as exc:
+                app.logger.exception("Error in face embedding prefetch: %s", exc)
+
+        # Run roughly once per minute
+        time.sleep(60)
+
+
+def start_face_prefetch():
+    """Start the prefetch loop in this process unless it is disabled or running."""
+    global _face_prefetch_thread
+
+    if FACE_PREFETCH_LEAD_MINUTES <= 0:
+        return
+    with _face_prefetch_lock:
+        if _face_prefetch_thread is not None and _face_prefetch_thread.is_alive():
+            return
+        _face_prefetch_thread = threading.Thread(
+            target=_face_prefetch_scheduler_loop,
+            daemon=True,
+        )
+        _face_prefetch_thread.start()
+
+
 @app.route("/api/debug/absence-count", methods=["GET"])
 def debug_absence_count():
     """
@@ -1830,6 +3499,39 @@ def debug_trigger_absence_threshold():
         }
     ), 200
 
+@app.route("/api/debug/pipeline-stats", methods=["GET"])
+def debug_pipeline_stats():
+    """
+    Debug endpoint exposing face-pipeline cache counters, used to size the
+    caches for the roster.
+
+    Usage:
+      GET /api/debug/pipeline-stats
+    """
+    with _deadline_expirations_lock:
+        deadline_expired = dict(_deadline_expirations)
+    return jsonify(
+        {
+            "status": "ok",
+            "knownFaces": KNOWN_FACE_CACHE.stats(),
+            "embeddings": EMBEDDING_STORE.stats(),
+            "inference": INFERENCE_EXECUTOR.stats(),
+            "quality": FACE_QUALITY_GATE.stats(),
+            "deadlineExpired": deadline_expired,
+            "scanResults": SCAN_RESULTS.stats(),
+            "firestoreDocs": FIRESTORE_DOCS.stats(),
+            "jobs": {**SCAN_JOBS.stats(), "executor": SCAN_JOB_EXECUTOR.stats()},
+            "batching": {
+                model_name: batcher.stats()
+                for model_name, batcher in list(_face_batchers.items())
+            },
+            "rosters": {
+                class_id: len(roster.matrix)
+                for class_id, roster in list(_roster_matrices.items())
+            },
+        }
+    ), 200
+
 @app.route("/api/debug/ip", methods=["GET"])
 def debug_ip():
     forwarded_for = request.headers.get("X-Forwarded-For", None)
@@ -1845,6 +3547,9 @@ def debug_ip():
 
 
 if __name__ == "__main__":
+    # Load and warm the face model before the first scan arrives
+    start_model_warmup()
+
     # Background scheduler for automatic notifications
     notification_thread = threading.Thread(
         target=_notification_scheduler_loop,
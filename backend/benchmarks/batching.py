@@ -0,0 +1,146 @@
+"""
+Face-embedding throughput against micro-batch window and batch size.
+
+Runs --requests single-image embedding calls from --concurrency threads
+through a MicroBatcher and reports throughput and per-request latency for
+every (batch size, window) combination.
+
+Usage (from backend/):
+  python -m benchmarks.batching --model VGG-Face --batch-sizes 1,4,8,16 --windows 0,2,5,10
+  python -m benchmarks.batching --simulated   # synthetic cost model, no TensorFlow
+"""
+
+import argparse
+import statistics
+import threading
+import time
+
+try:
+    from ..face_inference import MicroBatcher
+except ImportError:
+    from face_inference import MicroBatcher
+
+
+def _parse_list(value, cast):
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def _model_backend(model_name, image_path):
+    import numpy as np
+
+    try:
+        from .. import face_model
+    except ImportError:
+        import face_model
+
+    if image_path:
+        import cv2
+
+        model_input = face_model.prepare_input(cv2.imread(image_path), model_name)
+    else:
+        target_h, target_w = face_model.build_model(model_name).input_shape
+        rng = np.random.default_rng(0)
+        model_input = rng.random((1, target_h, target_w, 3), dtype=np.float32)
+
+    # Warm both the single-image and the batched path before timing.
+    face_model.embed_batch([model_input], model_name)
+    face_model.embed_batch([model_input] * 4, model_name)
+
+    return model_input, lambda inputs: face_model.embed_batch(inputs, model_name)
+
+
+def _simulated_backend(fixed_ms, per_item_ms):
+    def process(inputs):
+        time.sleep((fixed_ms + per_item_ms * len(inputs)) / 1000.0)
+        return [None] * len(inputs)
+
+    return object(), process
+
+
+def run_case(process_batch, model_input, batch_size, window_ms, requests, concurrency):
+    batcher = MicroBatcher(
+        process_batch,
+        max_batch_size=batch_size,
+        max_wait_seconds=window_ms / 1000.0,
+        max_queue=max(concurrency, 1),
+    )
+    latencies = []
+    latencies_lock = threading.Lock()
+    per_thread = max(1, requests // concurrency)
+
+    def caller():
+        for _ in range(per_thread):
+            started = time.perf_counter()
+            batcher.submit(model_input).result()
+            elapsed = time.perf_counter() - started
+            with latencies_lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=caller) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    stats = batcher.stats()
+    return {
+        "batch_size": batch_size,
+        "window_ms": window_ms,
+        "throughput": len(latencies) / wall,
+        "p50_ms": statistics.median(latencies) * 1000.0,
+        "p95_ms": _percentile(latencies, 0.95) * 1000.0,
+        "avg_batch": stats["averageBatchSize"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default="VGG-Face")
+    parser.add_argument("--image", help="Face image to embed (default: random model input)")
+    parser.add_argument("--requests", type=int, default=128)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--batch-sizes", default="1,4,8,16")
+    parser.add_argument("--windows", default="0,2,5,10,20", help="Batch windows in ms")
+    parser.add_argument("--simulated", action="store_true",
+                        help="Use a synthetic cost model instead of the real model")
+    parser.add_argument("--sim-fixed-ms", type=float, default=40.0)
+    parser.add_argument("--sim-per-item-ms", type=float, default=8.0)
+    args = parser.parse_args(argv)
+
+    if args.simulated:
+        model_input, process_batch = _simulated_backend(args.sim_fixed_ms, args.sim_per_item_ms)
+        label = f"simulated ({args.sim_fixed_ms}ms + {args.sim_per_item_ms}ms/item)"
+    else:
+        model_input, process_batch = _model_backend(args.model, args.image)
+        label = args.model
+
+    print(f"model={label} requests={args.requests} concurrency={args.concurrency}")
+    print(f"{'batch':>5} {'window_ms':>9} {'img/s':>8} {'p50_ms':>8} {'p95_ms':>8} {'avg_batch':>9}")
+    for batch_size in _parse_list(args.batch_sizes, int):
+        windows = [0.0] if batch_size == 1 else _parse_list(args.windows, float)
+        for window_ms in windows:
+            result = run_case(
+                process_batch,
+                model_input,
+                batch_size,
+                window_ms,
+                args.requests,
+                args.concurrency,
+            )
+            print(
+                f"{result['batch_size']:>5} {result['window_ms']:>9.1f} "
+                f"{result['throughput']:>8.1f} {result['p50_ms']:>8.1f} "
+                f"{result['p95_ms']:>8.1f} {result['avg_batch']:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
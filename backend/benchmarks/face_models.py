@@ -0,0 +1,306 @@
+"""
+Latency, memory and accuracy of candidate DeepFace models on local face pairs.
+
+Faces are detected and aligned once with the scan pipeline's detector, then
+each model runs in its own fresh process so load time and peak RSS are not
+shared between models. Every model embeds the same crops the scan endpoint
+would send it and reports model load time, p50/p95 embedding latency, peak
+RSS, and FAR/FRR on genuine/impostor pairs at candidate thresholds: the
+deployed FACE_MATCH_THRESHOLD, DeepFace's tuned threshold, the threshold
+that keeps FAR at --target-far, and any passed with --thresholds.
+
+The fixture is either a directory with one sub-directory of images per
+person (genuine pairs are drawn within a person, impostor pairs across
+people) or a CSV of "image_a,image_b,same" rows with paths relative to it.
+
+Usage (from backend/):
+  python -m benchmarks.face_models --fixtures fixtures/faces
+  python -m benchmarks.face_models --pairs fixtures/pairs.csv --models Facenet512,SFace \\
+      --thresholds 0.25,0.3,0.35
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import itertools
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+
+import numpy as np
+
+try:
+    from ..face_embeddings import find_distance
+except ImportError:
+    from face_embeddings import find_distance
+
+
+DEFAULT_MODELS = "VGG-Face,Facenet,Facenet512,ArcFace,SFace"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+# Scans are downscaled to this longest side before detection.
+SCAN_MAX_SIDE = 640
+
+
+def _parse_list(value, cast):
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def pairs_from_directory(directory, max_pairs, seed=0):
+    """Return (path_a, path_b, same) pairs from a one-folder-per-person tree."""
+    people = {}
+    for person in sorted(os.listdir(directory)):
+        person_dir = os.path.join(directory, person)
+        if not os.path.isdir(person_dir):
+            continue
+        images = [
+            os.path.join(person_dir, name)
+            for name in sorted(os.listdir(person_dir))
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+        if images:
+            people[person] = images
+    if len(people) < 2:
+        raise SystemExit(f"{directory} needs images for at least two people")
+
+    rng = random.Random(seed)
+    genuine = [
+        (a, b, True)
+        for images in people.values()
+        for a, b in itertools.combinations(images, 2)
+    ]
+    rng.shuffle(genuine)
+    genuine = genuine[:max_pairs]
+    if not genuine:
+        raise SystemExit(f"{directory} needs at least one person with two images")
+
+    names = list(people)
+    impostor = set()
+    attempts = 0
+    while len(impostor) < len(genuine) and attempts < len(genuine) * 20:
+        attempts += 1
+        first, second = rng.sample(names, 2)
+        impostor.add((rng.choice(people[first]), rng.choice(people[second]), False))
+    return genuine + sorted(impostor)
+
+
+def pairs_from_csv(path):
+    """Return (path_a, path_b, same) pairs from an "image_a,image_b,same" CSV."""
+    base = os.path.dirname(os.path.abspath(path))
+    pairs = []
+    with open(path, newline="") as handle:
+        for row in csv.reader(handle):
+            if len(row) < 3 or row[0].startswith("#") or row[2].strip() not in ("0", "1"):
+                continue
+            pairs.append((
+                os.path.join(base, row[0].strip()),
+                os.path.join(base, row[1].strip()),
+                row[2].strip() == "1",
+            ))
+    if not pairs:
+        raise SystemExit(f"No pairs found in {path}")
+    return pairs
+
+
+def detect_crops(paths, detector_backend, min_size):
+    """Detect the face in every image the way a scan would; skip images without one."""
+    import cv2
+
+    try:
+        from .. import face_detection
+    except ImportError:
+        import face_detection
+
+    crops = {}
+    for path in paths:
+        img = cv2.imread(path)
+        if img is None:
+            print(f"skipping unreadable image {path}", file=sys.stderr)
+            continue
+        scale = max(img.shape[:2]) / SCAN_MAX_SIDE
+        if scale > 1:
+            img = cv2.resize(
+                img,
+                (int(img.shape[1] / scale), int(img.shape[0] / scale)),
+                interpolation=cv2.INTER_AREA,
+            )
+        face = face_detection.detect_face(img, detector_backend=detector_backend, min_size=min_size)
+        if face is None:
+            print(f"skipping {path}: no face detected", file=sys.stderr)
+            continue
+        crops[path] = face.crop
+    return crops
+
+
+def benchmark_model(model_name, crops, metric, repeats):
+    """Embed every crop with ``model_name``; runs inside a fresh worker process."""
+    try:
+        from .. import face_model
+    except ImportError:
+        import face_model
+    from deepface.modules.verification import find_threshold
+
+    baseline_rss_mb = _peak_rss_mb()
+    started = time.perf_counter()
+    face_model.warm_up(model_name)
+    load_seconds = time.perf_counter() - started
+
+    embeddings = {}
+    latencies = []
+    for _ in range(max(1, repeats)):
+        for path, crop in crops.items():
+            started = time.perf_counter()
+            embedding = face_model.represent(crop, model_name, detector_backend="skip")
+            latencies.append(time.perf_counter() - started)
+            embeddings.setdefault(path, np.asarray(embedding, dtype=np.float32))
+
+    return {
+        "model": model_name,
+        "load_s": load_seconds,
+        "p50_ms": _percentile(latencies, 0.50) * 1000.0,
+        "p95_ms": _percentile(latencies, 0.95) * 1000.0,
+        "baseline_rss_mb": baseline_rss_mb,
+        "peak_rss_mb": _peak_rss_mb(),
+        "dim": len(next(iter(embeddings.values()))),
+        "deepface_threshold": find_threshold(model_name, metric),
+        "embeddings": embeddings,
+    }
+
+
+def pair_distances(pairs, embeddings, metric):
+    """Split pair distances into (genuine, impostor) arrays, skipping missing faces."""
+    genuine, impostor = [], []
+    for path_a, path_b, same in pairs:
+        if path_a not in embeddings or path_b not in embeddings:
+            continue
+        distance = float(find_distance(embeddings[path_a], embeddings[path_b], metric))
+        (genuine if same else impostor).append(distance)
+    return np.asarray(genuine, dtype=np.float64), np.asarray(impostor, dtype=np.float64)
+
+
+def error_rates(genuine, impostor, threshold):
+    """
+    Return (FAR, FRR) when distances <= ``threshold`` are accepted.
+
+    FAR is the share of impostor pairs accepted, FRR the share of genuine
+    pairs rejected; either is None when there are no pairs of that kind.
+    """
+    far = float(np.mean(impostor <= threshold)) if len(impostor) else None
+    frr = float(np.mean(genuine > threshold)) if len(genuine) else None
+    return far, frr
+
+
+def threshold_for_far(impostor, target_far):
+    """Largest threshold whose FAR does not exceed ``target_far``."""
+    if not len(impostor):
+        return None
+    ordered = np.sort(impostor)
+    allowed = int(np.floor(target_far * len(ordered)))
+    if allowed >= len(ordered):
+        return float(ordered[-1])
+    # Accepting up to, but not including, the first disallowed impostor.
+    return float(np.nextafter(ordered[allowed], -np.inf))
+
+
+def _format_rate(value):
+    return f"{value * 100:>7.2f}%" if value is not None else f"{'-':>8}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--fixtures", help="Directory with one folder of face images per person")
+    source.add_argument("--pairs", help='CSV of "image_a,image_b,same" rows')
+    parser.add_argument("--models", default=DEFAULT_MODELS)
+    parser.add_argument("--metric", default=os.environ.get("FACE_DISTANCE_METRIC", "cosine"))
+    parser.add_argument("--thresholds", default="", help="Extra thresholds to report FAR/FRR at")
+    parser.add_argument(
+        "--deployed-threshold",
+        type=float,
+        default=float(os.environ.get("FACE_MATCH_THRESHOLD", "0.35")),
+    )
+    parser.add_argument("--target-far", type=float, default=0.001)
+    parser.add_argument("--max-pairs", type=int, default=500,
+                        help="Genuine pairs drawn from --fixtures (as many impostor pairs)")
+    parser.add_argument("--detector", default=os.environ.get("FACE_DETECTOR_BACKEND", "opencv"))
+    parser.add_argument(
+        "--min-size", type=int, default=int(os.environ.get("FACE_MIN_SIZE_PX", "80"))
+    )
+    parser.add_argument("--repeats", type=int, default=3, help="Timed passes over the images")
+    args = parser.parse_args(argv)
+
+    if args.fixtures:
+        pairs = pairs_from_directory(args.fixtures, args.max_pairs)
+    else:
+        pairs = pairs_from_csv(args.pairs)
+    paths = sorted({path for pair in pairs for path in pair[:2]})
+    crops = detect_crops(paths, args.detector, args.min_size)
+    extra_thresholds = _parse_list(args.thresholds, float)
+
+    print(
+        f"pairs={len(pairs)} images={len(paths)} faces={len(crops)} detector={args.detector} "
+        f"metric={args.metric} target_far={args.target_far}"
+    )
+    results = []
+    # A fresh "spawn" process per model keeps load time and peak RSS independent.
+    context = multiprocessing.get_context("spawn")
+    for model_name in _parse_list(args.models, str):
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            try:
+                result = pool.submit(
+                    benchmark_model, model_name, crops, args.metric, args.repeats
+                ).result()
+            except Exception as exc:
+                print(f"{model_name}: failed: {exc}", file=sys.stderr)
+                continue
+        result["genuine"], result["impostor"] = pair_distances(
+            pairs, result.pop("embeddings"), args.metric
+        )
+        results.append(result)
+
+    print(
+        f"{'model':>10} {'dim':>5} {'load_s':>7} {'p50_ms':>8} {'p95_ms':>8} "
+        f"{'rss_MB':>8} {'model_MB':>8} {'genuine':>7} {'impostor':>8}"
+    )
+    for result in results:
+        print(
+            f"{result['model']:>10} {result['dim']:>5} {result['load_s']:>7.1f} "
+            f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['peak_rss_mb']:>8.0f} "
+            f"{result['peak_rss_mb'] - result['baseline_rss_mb']:>8.0f} "
+            f"{len(result['genuine']):>7} {len(result['impostor']):>8}"
+        )
+
+    print()
+    print(f"{'model':>10} {'threshold':>10} {'source':>10} {'FAR':>8} {'FRR':>8}")
+    for result in results:
+        candidates = [
+            (args.deployed_threshold, "deployed"),
+            (result["deepface_threshold"], "deepface"),
+            (threshold_for_far(result["impostor"], args.target_far), "target_far"),
+        ] + [(threshold, "extra") for threshold in extra_thresholds]
+        for threshold, label in candidates:
+            if threshold is None:
+                continue
+            far, frr = error_rates(result["genuine"], result["impostor"], threshold)
+            print(
+                f"{result['model']:>10} {threshold:>10.4f} {label:>10} "
+                f"{_format_rate(far)} {_format_rate(frr)}"
+            )
+
+
+if __name__ == "__main__":
+    main()
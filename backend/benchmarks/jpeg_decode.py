@@ -0,0 +1,127 @@
+"""
+Full JPEG decode plus resize against reduced-scale decode plus resize.
+
+Decodes each capture the way the scan endpoint used to (full-resolution
+cv2.imdecode, then resize to --max-side) and the way it does now
+(image_decode.decode_image at 1/2, 1/4 or 1/8 scale, then resize). Reports
+p50/p95 latency, the size of the decoded frame, peak traced memory, and the
+mean absolute pixel difference between the two resized results.
+
+Usage (from backend/):
+  python -m benchmarks.jpeg_decode --images captures/*.jpg
+  python -m benchmarks.jpeg_decode --synthetic 4032x3024   # 12 MP phone frame
+"""
+
+import argparse
+import statistics
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+try:
+    from ..image_decode import decode_image, jpeg_size, reduction_factor
+except ImportError:
+    from image_decode import decode_image, jpeg_size, reduction_factor
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def synthetic_capture(width, height, quality=90, seed=0):
+    """A phone-sized JPEG with smooth shading and sensor-like noise."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = 128 + 60 * np.sin(x / 97.0) * np.cos(y / 131.0)
+    img = np.stack([base, base * 0.9 + 20, base * 0.8 + 30], axis=2)
+    img += rng.normal(scale=8.0, size=img.shape)
+    img = np.clip(img, 0, 255).astype(np.uint8)
+    ok, encoded = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise SystemExit("Could not encode the synthetic capture")
+    return encoded.tobytes()
+
+
+def _resize(img, max_side):
+    h, w = img.shape[:2]
+    scale = max(h, w) / max_side
+    if scale > 1:
+        img = cv2.resize(img, (int(w / scale), int(h / scale)))
+    return img
+
+
+def _full_decode(data, max_side):
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+def run_case(data, decode, max_side, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        _resize(decode(data, max_side), max_side)
+        timings.append(time.perf_counter() - started)
+
+    # Measured separately so tracing does not skew the timings.
+    tracemalloc.start()
+    decoded = decode(data, max_side)
+    result = _resize(decoded, max_side)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, {
+        "p50_ms": statistics.median(timings) * 1000.0,
+        "p95_ms": _percentile(timings, 0.95) * 1000.0,
+        "decoded_mb": decoded.nbytes / (1024 * 1024),
+        "peak_mb": peak / (1024 * 1024),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--images", nargs="*", default=[], help="JPEG captures to decode")
+    parser.add_argument("--synthetic", default="4032x3024",
+                        help="WxH of a generated capture when --images is not given")
+    parser.add_argument("--max-side", type=int, default=640)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.images:
+        captures = []
+        for path in args.images:
+            with open(path, "rb") as handle:
+                captures.append((path, handle.read()))
+    else:
+        width, height = (int(value) for value in args.synthetic.lower().split("x"))
+        captures = [(f"synthetic {width}x{height}", synthetic_capture(width, height))]
+
+    print(f"max_side={args.max_side} repeats={args.repeats}")
+    print(
+        f"{'image':>24} {'mode':>8} {'factor':>6} {'p50_ms':>8} {'p95_ms':>8} "
+        f"{'decoded_MB':>10} {'peak_MB':>8} {'mean_diff':>9}"
+    )
+    for label, data in captures:
+        size = jpeg_size(data)
+        factor = reduction_factor(size, args.max_side) if size else 1
+        full, full_stats = run_case(data, _full_decode, args.max_side, args.repeats)
+        reduced, reduced_stats = run_case(data, decode_image, args.max_side, args.repeats)
+        if full.shape == reduced.shape:
+            diff = float(np.abs(full.astype(np.int16) - reduced.astype(np.int16)).mean())
+        else:
+            diff = float("nan")
+        for mode, mode_factor, stats, mean_diff in (
+            ("full", 1, full_stats, 0.0),
+            ("reduced", factor, reduced_stats, diff),
+        ):
+            print(
+                f"{label[-24:]:>24} {mode:>8} {mode_factor:>6} {stats['p50_ms']:>8.1f} "
+                f"{stats['p95_ms']:>8.1f} {stats['decoded_mb']:>10.1f} {stats['peak_mb']:>8.1f} "
+                f"{mean_diff:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Accuracy and latency of float16/int8 embedding storage against float32.
+
+Loads known-face embeddings from an EmbeddingStore cache directory (the
+.npy files under FACE_EMBEDDING_CACHE_DIR), or generates a synthetic roster,
+and builds one EmbeddingMatrix per storage dtype. Probe queries are noisy
+copies of enrolled rows. For each dtype it reports memory per vector and for
+a campus-wide roster, the distance error against float32, how often the
+top-1 match or the accept/reject decision at --threshold changes, and the
+time to match one query against the whole roster.
+
+Usage (from backend/):
+  python -m benchmarks.quantization --embeddings-dir .embedding_cache
+  python -m benchmarks.quantization --students 5000 --dim 4096
+"""
+
+import argparse
+import glob
+import os
+import statistics
+import time
+
+import numpy as np
+
+try:
+    from ..face_embeddings import EMBEDDING_DTYPES, EmbeddingMatrix
+except ImportError:
+    from face_embeddings import EMBEDDING_DTYPES, EmbeddingMatrix
+
+
+def load_embeddings(directory):
+    vectors = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.npy"))):
+        try:
+            vectors.append(np.load(path).astype(np.float32).ravel())
+        except (OSError, ValueError):
+            continue
+    if not vectors:
+        raise SystemExit(f"No .npy embeddings found in {directory}")
+    dims = {len(vector) for vector in vectors}
+    if len(dims) != 1:
+        raise SystemExit(f"Embeddings in {directory} mix dimensions {sorted(dims)}")
+    return np.vstack(vectors)
+
+
+def synthetic_embeddings(students, dim, seed=0):
+    # Non-negative like VGG-Face's ReLU outputs, which is the harder case for
+    # cosine distance because all vectors share one orthant.
+    rng = np.random.default_rng(seed)
+    return np.abs(rng.normal(size=(students, dim))).astype(np.float32)
+
+
+def make_probes(roster, count, noise, seed=1):
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(roster), size=min(count, len(roster)), replace=False)
+    scale = noise * np.linalg.norm(roster[rows], axis=1, keepdims=True) / np.sqrt(roster.shape[1])
+    probes = roster[rows] + rng.normal(size=(len(rows), roster.shape[1])) * scale
+    return rows, probes.astype(np.float32)
+
+
+def evaluate(roster, probes, dtype, metric, threshold, repeats):
+    ids = list(range(len(roster)))
+    exact = EmbeddingMatrix(ids, roster, metric=metric)
+    compact = EmbeddingMatrix(ids, roster, metric=metric, dtype=dtype)
+
+    errors = []
+    top1_changes = 0
+    decision_flips = 0
+    for probe in probes:
+        exact_distances = exact.distances(probe)
+        compact_distances = compact.distances(probe)
+        errors.append(np.abs(compact_distances - exact_distances))
+        exact_best = int(np.argmin(exact_distances))
+        compact_best = int(np.argmin(compact_distances))
+        top1_changes += exact_best != compact_best
+        decision_flips += (exact_distances[exact_best] <= threshold) != (
+            compact_distances[compact_best] <= threshold
+        )
+
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        compact.best_match(probes[0])
+        timings.append(time.perf_counter() - started)
+
+    errors = np.concatenate(errors)
+    return {
+        "dtype": dtype,
+        "bytes_per_vector": compact.nbytes / len(roster),
+        "max_error": float(errors.max()),
+        "mean_error": float(errors.mean()),
+        "top1_changes": top1_changes,
+        "decision_flips": decision_flips,
+        "match_ms": statistics.median(timings) * 1000.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--embeddings-dir", help="EmbeddingStore cache directory to load")
+    parser.add_argument("--students", type=int, default=5000, help="Synthetic roster size")
+    parser.add_argument("--dim", type=int, default=4096, help="Synthetic embedding size")
+    parser.add_argument("--probes", type=int, default=200)
+    parser.add_argument("--probe-noise", type=float, default=0.3,
+                        help="Probe noise relative to the average component size")
+    parser.add_argument("--metric", default="cosine")
+    parser.add_argument("--threshold", type=float, default=0.35)
+    parser.add_argument("--campus-size", type=int, default=40000)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--dtypes", default=",".join(EMBEDDING_DTYPES))
+    args = parser.parse_args(argv)
+
+    if args.embeddings_dir:
+        roster = load_embeddings(args.embeddings_dir)
+        source = args.embeddings_dir
+    else:
+        roster = synthetic_embeddings(args.students, args.dim)
+        source = "synthetic"
+    _, probes = make_probes(roster, args.probes, args.probe_noise)
+
+    print(
+        f"source={source} roster={roster.shape[0]}x{roster.shape[1]} probes={len(probes)} "
+        f"metric={args.metric} threshold={args.threshold}"
+    )
+    print(
+        f"{'dtype':>7} {'B/vector':>9} {'campus_MB':>9} {'max_err':>9} {'mean_err':>9} "
+        f"{'top1_chg':>8} {'flips':>6} {'match_ms':>8}"
+    )
+    for dtype in [item.strip() for item in args.dtypes.split(",") if item.strip()]:
+        result = evaluate(roster, probes, dtype, args.metric, args.threshold, args.repeats)
+        campus_mb = result["bytes_per_vector"] * args.campus_size / (1024 * 1024)
+        print(
+            f"{result['dtype']:>7} {result['bytes_per_vector']:>9.0f} {campus_mb:>9.1f} "
+            f"{result['max_error']:>9.5f} {result['mean_error']:>9.5f} "
+            f"{result['top1_changes']:>8} {result['decision_flips']:>6} "
+            f"{result['match_ms']:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Face detection stage: find and align the face once per scan."""
+
+import contextlib
+import threading
+
+import cv2
+import numpy as np
+
+
+# Parameters of the Haar gate the scan endpoint has always used.
+HAAR_SCALE_FACTOR = 1.1
+HAAR_MIN_NEIGHBORS = 5
+# Eye detection mirrors DeepFace's OpenCv detector so crops align the same way.
+EYE_MIN_NEIGHBORS = 10
+
+# CascadeClassifier is not documented as thread-safe, so each loaded
+# classifier is used by one thread at a time. Detection runs on HTTP request
+# threads, which the server creates per request, so classifiers live in a
+# process-wide free list rather than per thread: a scan borrows an idle one
+# and a new XML is loaded only while every loaded copy is busy.
+_cascade_lock = threading.Lock()
+_idle_cascades = {}
+
+
+class DetectedFace:
+    """An aligned BGR face crop and its (x, y, w, h) box in the source image."""
+
+    __slots__ = ("crop", "box", "confidence")
+
+    def __init__(self, crop, box, confidence=None):
+        self.crop = crop
+        self.box = box
+        self.confidence = confidence
+
+
+def _load_cascade(filename):
+    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + filename)
+    if cascade.empty():
+        raise ValueError(f"Could not load OpenCV cascade {filename}")
+    return cascade
+
+
+@contextlib.contextmanager
+def _cascade(filename):
+    """Borrow a loaded ``filename`` classifier for the duration of the block."""
+    with _cascade_lock:
+        idle = _idle_cascades.setdefault(filename, [])
+        cascade = idle.pop() if idle else None
+    if cascade is None:
+        cascade = _load_cascade(filename)
+    try:
+        yield cascade
+    finally:
+        with _cascade_lock:
+            _idle_cascades[filename].append(cascade)
+
+
+def _eye_angle(gray_face):
+    """Rotation (degrees) that levels the two largest detected eyes, or 0."""
+    with _cascade("haarcascade_eye.xml") as cascade:
+        eyes = cascade.detectMultiScale(gray_face, HAAR_SCALE_FACTOR, EYE_MIN_NEIGHBORS)
+    if len(eyes) < 2:
+        return 0.0
+
+    eyes = sorted(eyes, key=lambda eye: eye[2] * eye[3], reverse=True)[:2]
+    # The eye on the left of the image is the person's right eye.
+    right_eye, left_eye = sorted(eyes, key=lambda eye: eye[0])
+    dx = (left_eye[0] + left_eye[2] / 2) - (right_eye[0] + right_eye[2] / 2)
+    dy = (left_eye[1] + left_eye[3] / 2) - (right_eye[1] + right_eye[3] / 2)
+    return float(np.degrees(np.arctan2(dy, dx)))
+
+
+def _aligned_crop(img, box, angle):
+    """
+    Cut ``box`` out of ``img`` rotated by ``angle`` around the face centre.
+
+    Equivalent to DeepFace rotating the whole frame and projecting the box,
+    but only the w x h output pixels are computed.
+    """
+    x, y, w, h = box
+    if not angle:
+        return np.ascontiguousarray(img[y:y + h, x:x + w])
+
+    center_x, center_y = x + w / 2.0, y + h / 2.0
+    matrix = cv2.getRotationMatrix2D((center_x, center_y), angle, 1.0)
+    matrix[0, 2] += w / 2.0 - center_x
+    matrix[1, 2] += h / 2.0 - center_y
+    return cv2.warpAffine(
+        img,
+        matrix,
+        (w, h),
+        flags=cv2.INTER_CUBIC,
+        borderMode=cv2.BORDER_CONSTANT,
+        borderValue=(0, 0, 0),
+    )
+
+
+def _detect_haar(img, min_size):
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    with _cascade("haarcascade_frontalface_default.xml") as cascade:
+        boxes = cascade.detectMultiScale(
+            gray,
+            scaleFactor=HAAR_SCALE_FACTOR,
+            minNeighbors=HAAR_MIN_NEIGHBORS,
+            minSize=(min_size, min_size),
+        )
+    if len(boxes) == 0:
+        return None
+
+    x, y, w, h = (int(value) for value in max(boxes, key=lambda box: box[2] * box[3]))
+    angle = _eye_angle(gray[y:y + h, x:x + w])
+    return DetectedFace(_aligned_crop(img, (x, y, w, h), angle), (x, y, w, h))
+
+
+def _detect_with_deepface(img, detector_backend, min_size):
+    # Imported lazily: DeepFace pulls in TensorFlow. It caches one detector
+    # instance per backend for the life of the process.
+    from deepface.modules import detection
+
+    faces = []
+    for face in detection.detect_faces(detector_backend=detector_backend, img=img, align=True):
+        area = face.facial_area
+        box = (int(area.x), int(area.y), int(area.w), int(area.h))
+        if box[2] >= min_size and box[3] >= min_size and face.img.size:
+            faces.append(DetectedFace(face.img, box, face.confidence))
+    if not faces:
+        return None
+    return max(faces, key=lambda face: face.box[2] * face.box[3])
+
+
+def detect_face(img, detector_backend="opencv", min_size=0):
+    """
+    Return the largest face in a BGR image as an aligned DetectedFace, or None.
+
+    ``detector_backend`` is "opencv" (Haar cascades, no TensorFlow needed) or
+    any DeepFace detector such as "ssd", "mtcnn" or "retinaface". Faces
+    smaller than ``min_size`` pixels on either side are ignored.
+    """
+    if detector_backend == "opencv":
+        return _detect_haar(img, min_size)
+    return _detect_with_deepface(img, detector_backend, min_size)
+
+
+def warm_up(detector_backend="opencv"):
+    """Load the detector for ``detector_backend`` so the first scan finds it ready."""
+    if detector_backend == "opencv":
+        for filename in ("haarcascade_frontalface_default.xml", "haarcascade_eye.xml"):
+            with _cascade(filename):
+                pass
+        return
+
+    from deepface.modules import modeling
+
+    modeling.build_model(task="face_detector", model_name=detector_backend)
@@ -0,0 +1,417 @@
+"""Known-face embedding storage and vectorized distance helpers."""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+DISTANCE_METRICS = ("cosine", "euclidean", "euclidean_l2")
+EMBEDDING_DTYPES = ("float32", "float16", "int8")
+
+# Quantized rows are widened to float32 about this many elements (1 MB) at a
+# time when computing distances, so the temporary stays cache-sized and never
+# grows with the roster.
+_DISTANCE_CHUNK_ELEMENTS = 1 << 18
+
+
+def _as_matrix(vectors):
+    array = np.asarray(vectors, dtype=np.float32)
+    if array.ndim == 1:
+        return array.reshape(1, -1)
+    return array
+
+
+def _l2_normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def cosine_distance(query, candidates):
+    """
+    Cosine distance between one query embedding and one or more candidates.
+
+    Returns a float when ``candidates`` is a single vector, otherwise a 1-D
+    array with one distance per candidate row.
+    """
+    query_vec = np.asarray(query, dtype=np.float32).ravel()
+    matrix = _as_matrix(candidates)
+    query_norm = np.linalg.norm(query_vec) or 1.0
+    row_norms = np.linalg.norm(matrix, axis=1)
+    row_norms[row_norms == 0] = 1.0
+    distances = 1.0 - (matrix @ query_vec) / (row_norms * query_norm)
+    return _unwrap(distances, candidates)
+
+
+def euclidean_distance(query, candidates):
+    query_vec = np.asarray(query, dtype=np.float32).ravel()
+    matrix = _as_matrix(candidates)
+    distances = np.linalg.norm(matrix - query_vec, axis=1)
+    return _unwrap(distances, candidates)
+
+
+def euclidean_l2_distance(query, candidates):
+    query_vec = _l2_normalize(_as_matrix(query))[0]
+    matrix = _l2_normalize(_as_matrix(candidates))
+    distances = np.linalg.norm(matrix - query_vec, axis=1)
+    return _unwrap(distances, candidates)
+
+
+def _unwrap(distances, candidates):
+    if np.ndim(candidates) == 1:
+        return float(distances[0])
+    return distances
+
+
+def quantize(vectors, dtype="float32"):
+    """
+    Store the rows of ``vectors`` as ``dtype``; returns (data, scales).
+
+    float16 halves the size of a float32 vector and int8 quarters it. int8
+    uses one symmetric float32 scale per row, so row ``i`` is approximately
+    ``data[i] * scales[i]``; ``scales`` is None for the float types.
+    """
+    matrix = _as_matrix(vectors)
+    if dtype == "float32":
+        return np.ascontiguousarray(matrix), None
+    if dtype == "float16":
+        return matrix.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        data = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+        return data, scales.astype(np.float32)
+    raise ValueError(f"Unsupported embedding dtype: {dtype}")
+
+
+def dequantize(data, scales=None):
+    """Inverse of ``quantize``: return the rows as a float32 matrix."""
+    matrix = np.asarray(data, dtype=np.float32)
+    if scales is not None:
+        matrix = matrix * scales[:, None]
+    return matrix
+
+
+def find_distance(query, candidates, metric="cosine"):
+    """Dispatch to the distance function DeepFace uses for ``metric``."""
+    if metric == "cosine":
+        return cosine_distance(query, candidates)
+    if metric == "euclidean":
+        return euclidean_distance(query, candidates)
+    if metric == "euclidean_l2":
+        return euclidean_l2_distance(query, candidates)
+    raise ValueError(f"Unsupported distance metric: {metric}")
+
+
+class EmbeddingMatrix:
+    """
+    Embeddings for a set of ids stacked into one contiguous (n, d) matrix.
+
+    For cosine and euclidean_l2 the rows are L2-normalized once here, so
+    matching a query against every row is a single matrix-vector product
+    instead of n separate comparisons. ``dtype`` stores the rows as float32,
+    float16 or int8 (see ``quantize``); distances are computed from the
+    compact rows a cache-sized chunk at a time, and int8 scales are applied
+    to the dot products rather than to the rows.
+    """
+
+    def __init__(self, ids, embeddings, metric="cosine", dtype="float32"):
+        if metric not in DISTANCE_METRICS:
+            raise ValueError(f"Unsupported distance metric: {metric}")
+        self.ids = list(ids)
+        self.index = {}
+        for row, row_id in enumerate(self.ids):
+            self.index.setdefault(row_id, row)
+        self.metric = metric
+        self.dtype = dtype
+        if not self.ids:
+            self.data, self.scales = quantize(np.zeros((0, 0), dtype=np.float32), dtype)
+            return
+
+        matrix = np.asarray(embeddings, dtype=np.float32).reshape(len(self.ids), -1)
+        if metric != "euclidean":
+            matrix = _l2_normalize(matrix)
+        self.data, self.scales = quantize(matrix, dtype)
+        if self.scales is not None and metric != "euclidean":
+            # Fold the rounding error in each row's length into its scale so
+            # the dequantized rows are unit length again.
+            norms = np.linalg.norm(self.data.astype(np.float32), axis=1)
+            norms[norms == 0] = 1.0
+            self.scales = (1.0 / norms).astype(np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def get(self, row_id):
+        """Return the (dequantized) stored vector for ``row_id``, or None."""
+        row = self.index.get(row_id)
+        if row is None:
+            return None
+        scales = None if self.scales is None else self.scales[row:row + 1]
+        return dequantize(self.data[row:row + 1], scales)[0]
+
+    def distances(self, query):
+        """Distance from ``query`` to every row, in ``ids`` order."""
+        query_vec = np.asarray(query, dtype=np.float32).ravel()
+        if self.metric == "euclidean":
+            return self._map_chunks(
+                lambda rows, scales: np.linalg.norm(
+                    (rows if scales is None else rows * scales[:, None]) - query_vec, axis=1
+                )
+            )
+
+        query_vec = query_vec / (np.linalg.norm(query_vec) or 1.0)
+        similarity = self._map_chunks(
+            lambda rows, scales: rows @ query_vec if scales is None else (rows @ query_vec) * scales
+        )
+        if self.metric == "cosine":
+            return 1.0 - similarity
+        # Both sides are unit length, so |a - b| = sqrt(2 - 2 cos).
+        return np.sqrt(np.maximum(2.0 - 2.0 * similarity, 0.0))
+
+    def _map_chunks(self, fn):
+        # fn(rows, scales) gets float32 rows that are not yet multiplied by
+        # their int8 scales (None for float storage).
+        if self.data.dtype == np.float32:
+            return fn(self.data, None)
+        out = np.empty(len(self.ids), dtype=np.float32)
+        chunk_rows = max(1, _DISTANCE_CHUNK_ELEMENTS // max(1, self.data.shape[1]))
+        for start in range(0, len(self.ids), chunk_rows):
+            stop = start + chunk_rows
+            scales = None if self.scales is None else self.scales[start:stop]
+            out[start:stop] = fn(self.data[start:stop].astype(np.float32), scales)
+        return out
+
+    def best_match(self, query):
+        """
+        Return (id, distance, margin) for the closest row, or None when empty.
+
+        An id may own several rows (e.g. multiple enrolled templates); its
+        distance is that of its closest row. ``margin`` is how much further
+        away the closest row of any other id is; None when there is none.
+        """
+        if not self.ids:
+            return None
+        distances = self.distances(query)
+        best = int(np.argmin(distances))
+        best_id = self.ids[best]
+
+        if len(self.index) == len(self.ids):
+            if len(distances) == 1:
+                return best_id, float(distances[best]), None
+            runner_up = np.partition(distances, 1)[1]
+        else:
+            others = [row for row, row_id in enumerate(self.ids) if row_id != best_id]
+            if not others:
+                return best_id, float(distances[best]), None
+            runner_up = distances[others].min()
+        return best_id, float(distances[best]), float(runner_up - distances[best])
+
+
+class EmbeddingStore:
+    """
+    Versioned cache of known-face embeddings.
+
+    Entries are keyed by (student_id, model_name, generation), where generation
+    is the Cloud Storage object generation of the enrolled image. A re-uploaded
+    image gets a new generation, so stale vectors are never served. Vectors are
+    held in a bounded in-memory LRU and mirrored to ``cache_dir`` as .npy files
+    so a restarted worker does not have to re-embed the whole roster.
+    ``pin`` exempts a student's vectors from LRU eviction for a while, e.g.
+    for a roster that was prefetched ahead of a class meeting. ``dtype``
+    keeps the in-memory copies as float16 or int8 (see ``quantize``) to fit
+    campus-wide rosters in memory; the disk copies stay float32.
+    """
+
+    def __init__(self, cache_dir=None, max_entries=2048, clock=time.monotonic,
+                 dtype="float32"):
+        if dtype not in EMBEDDING_DTYPES:
+            raise ValueError(f"Unsupported embedding dtype: {dtype}")
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.dtype = dtype
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._pins = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _prefix(student_id, model_name):
+        # Student IDs come from request payloads, so never use them in paths.
+        raw = f"{student_id}\x00{model_name}".encode("utf-8")
+        return hashlib.sha1(raw).hexdigest()
+
+    def _path_for(self, student_id, model_name, generation):
+        if not self.cache_dir or generation is None:
+            return None
+        return os.path.join(
+            self.cache_dir,
+            f"{self._prefix(student_id, model_name)}_{int(generation)}.npy",
+        )
+
+    def get(self, student_id, model_name, generation):
+        """Return the cached embedding for the key, or None."""
+        key = (student_id, model_name, generation)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if entry is not None:
+            return dequantize(*entry)[0]
+
+        path = self._path_for(student_id, model_name, generation)
+        if path and os.path.exists(path):
+            try:
+                embedding = np.load(path)
+            except (OSError, ValueError):
+                embedding = None
+            if embedding is not None:
+                entry = self._remember(key, embedding)
+                with self._lock:
+                    self.disk_hits += 1
+                return dequantize(*entry)[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, student_id, model_name, generation, embedding):
+        """Store an embedding in memory and, when versioned, on disk."""
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        entry = self._remember((student_id, model_name, generation), embedding)
+
+        path = self._path_for(student_id, model_name, generation)
+        if path:
+            self._write_to_disk(path, embedding)
+        # Return what later hits will return, whatever the storage dtype.
+        return dequantize(*entry)[0]
+
+    def get_or_compute(self, student_id, model_name, generation, compute):
+        """
+        Return the cached embedding, calling ``compute()`` to build it on a miss.
+
+        Embeddings are only cached when the generation is known; an unversioned
+        image cannot be revalidated, so it is embedded on every call.
+        """
+        if generation is not None:
+            embedding = self.get(student_id, model_name, generation)
+            if embedding is not None:
+                return embedding
+
+        embedding = np.asarray(compute(), dtype=np.float32).ravel()
+        if generation is None:
+            return embedding
+        return self.put(student_id, model_name, generation, embedding)
+
+    def pin(self, student_id, model_name, until):
+        """Keep this student's vectors in memory until ``until`` (clock time)."""
+        key = (student_id, model_name)
+        now = self._clock()
+        with self._lock:
+            for expired in [pin for pin, pinned_until in self._pins.items() if pinned_until <= now]:
+                del self._pins[expired]
+            self._pins[key] = max(until, self._pins.get(key, until))
+
+    def stats(self):
+        now = self._clock()
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "dtype": self.dtype,
+                "bytes": sum(
+                    data.nbytes + (scales.nbytes if scales is not None else 0)
+                    for data, scales in self._entries.values()
+                ),
+                "pinned": sum(1 for until in self._pins.values() if until > now),
+                "hits": self.hits,
+                "diskHits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+    def _remember(self, key, embedding):
+        student_id, model_name, generation = key
+        with self._lock:
+            # Drop vectors for superseded generations of the same image.
+            stale = [
+                existing
+                for existing in self._entries
+                if existing[0] == student_id
+                and existing[1] == model_name
+                and existing[2] != generation
+            ]
+            for existing in stale:
+                del self._entries[existing]
+
+            entry = quantize(embedding, self.dtype)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._evict_locked()
+        return entry
+
+    def _evict_locked(self):
+        if len(self._entries) <= self.max_entries:
+            return
+        now = self._clock()
+        for key in list(self._entries):
+            if len(self._entries) <= self.max_entries:
+                break
+            pin_key = key[:2]
+            until = self._pins.get(pin_key)
+            if until is not None:
+                if until > now:
+                    # Pinned entries may push the store past max_entries.
+                    continue
+                del self._pins[pin_key]
+            del self._entries[key]
+
+    def _write_to_disk(self, path, embedding):
+        directory = os.path.dirname(path)
+        prefix = os.path.basename(path).rsplit("_", 1)[0] + "_"
+        tmp_path = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            # A unique temp file per write, so workers sharing the directory
+            # never write to or clean up each other's partial files.
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as handle:
+                np.save(handle, embedding)
+            os.replace(tmp_path, path)
+            tmp_path = None
+
+            # Only older generations of this vector are superseded; a newer
+            # one written concurrently by another worker is left alone.
+            current = int(os.path.basename(path)[len(prefix):-len(".npy")])
+            for name in os.listdir(directory):
+                generation = name[len(prefix):-len(".npy")]
+                if not (
+                    name.startswith(prefix)
+                    and name.endswith(".npy")
+                    and generation.isdigit()
+                    and int(generation) < current
+                ):
+                    continue
+                try:
+                    os.remove(os.path.join(directory, name))
+                except FileNotFoundError:
+                    pass
+        except OSError:
+            # The on-disk copy is only an optimization for restarts.
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
@@ -0,0 +1,260 @@
+"""Process-wide execution of face-model inference."""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class InferenceQueueFull(Exception):
+    """Raised when the inference queue cannot accept more work."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised for work whose deadline passed before it could run."""
+
+
+class _WorkItem:
+    __slots__ = ("future", "fn", "args", "kwargs", "deadline")
+
+    def __init__(self, future, fn, args, kwargs, deadline):
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.deadline = deadline
+
+
+class InferenceExecutor:
+    """
+    A fixed pool of inference threads fed by a bounded queue.
+
+    One executor is shared by every request in the process, so the number of
+    scans being processed concurrently never exceeds ``max_workers`` no matter
+    how many HTTP threads are waiting. ``submit`` fails fast with InferenceQueueFull
+    once ``max_queue`` items are waiting, and queued items whose deadline
+    (a ``time.monotonic()`` value) has passed, or whose future was cancelled,
+    are dropped before they start instead of burning CPU for a caller that
+    already gave up.
+    """
+
+    def __init__(self, max_workers=2, max_queue=8, name="inference"):
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(1, int(max_queue))
+        self.name = name
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._busy = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.expired = 0
+        self.cancelled = 0
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, fn, *args, deadline=None, **kwargs):
+        """Queue ``fn(*args, **kwargs)`` and return a Future for its result."""
+        self._ensure_started()
+        future = Future()
+        item = _WorkItem(future, fn, args, kwargs, deadline)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise InferenceQueueFull(
+                f"{self.name} queue is full ({self.max_queue} waiting)"
+            ) from None
+        with self._lock:
+            self.submitted += 1
+        return future
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "busy": self._busy,
+                "queued": self._queue.qsize(),
+                "maxQueue": self.max_queue,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "expired": self.expired,
+                "cancelled": self.cancelled,
+                "completed": self.completed,
+                "failed": self.failed,
+            }
+
+    def _ensure_started(self):
+        if len(self._threads) >= self.max_workers:
+            return
+        with self._lock:
+            while len(self._threads) < self.max_workers:
+                thread = threading.Thread(
+                    target=self._worker,
+                    name=f"{self.name}-{len(self._threads)}",
+                    daemon=True,
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            try:
+                self._run(item)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, item):
+        if not item.future.set_running_or_notify_cancel():
+            with self._lock:
+                self.cancelled += 1
+            return
+
+        if item.deadline is not None and time.monotonic() >= item.deadline:
+            with self._lock:
+                self.expired += 1
+            item.future.set_exception(
+                DeadlineExceeded("Inference deadline passed before it started")
+            )
+            return
+
+        with self._lock:
+            self._busy += 1
+        try:
+            result = item.fn(*item.args, **item.kwargs)
+        except BaseException as exc:
+            with self._lock:
+                self.failed += 1
+            item.future.set_exception(exc)
+        else:
+            with self._lock:
+                self.completed += 1
+            item.future.set_result(result)
+        finally:
+            with self._lock:
+                self._busy -= 1
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item requests into batched calls.
+
+    A collector thread waits for the first queued item, takes whatever else
+    is already queued, then keeps collecting for up to ``max_wait_seconds`` or
+    until ``max_batch_size`` items are waiting, and hands the whole batch to ``process_batch(items)``, which must
+    return one result per item in order. Each caller gets its own Future.
+    Like InferenceExecutor, the queue is bounded and expired or cancelled
+    items are dropped before the batch runs.
+    """
+
+    def __init__(self, process_batch, max_batch_size=8, max_wait_seconds=0.005,
+                 max_queue=64, name="batcher"):
+        self._process_batch = process_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_seconds = max(0.0, float(max_wait_seconds))
+        self.max_queue = max(1, int(max_queue))
+        self.name = name
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.rejected = 0
+        self.expired = 0
+        self.cancelled = 0
+
+    def submit(self, item, deadline=None):
+        """Queue ``item`` for the next batch and return a Future for its result."""
+        self._ensure_started()
+        future = Future()
+        work = _WorkItem(future, None, (item,), None, deadline)
+        try:
+            self._queue.put_nowait(work)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise InferenceQueueFull(
+                f"{self.name} queue is full ({self.max_queue} waiting)"
+            ) from None
+        return future
+
+    def stats(self):
+        with self._lock:
+            return {
+                "maxBatchSize": self.max_batch_size,
+                "maxWaitMs": self.max_wait_seconds * 1000.0,
+                "queued": self._queue.qsize(),
+                "batches": self.batches,
+                "items": self.items,
+                "averageBatchSize": (self.items / self.batches) if self.batches else 0.0,
+                "largestBatch": self.largest_batch,
+                "rejected": self.rejected,
+                "expired": self.expired,
+                "cancelled": self.cancelled,
+            }
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._collect, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        while True:
+            batch = [self._queue.get()]
+            flush_at = time.monotonic() + self.max_wait_seconds
+            while len(batch) < self.max_batch_size:
+                # Items that queued up during the previous batch join
+                # immediately; only then wait out the rest of the window.
+                remaining = flush_at - time.monotonic()
+                try:
+                    if remaining <= 0:
+                        batch.append(self._queue.get_nowait())
+                    else:
+                        batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._run(batch)
+
+    def _run(self, batch):
+        live = []
+        now = time.monotonic()
+        for work in batch:
+            if not work.future.set_running_or_notify_cancel():
+                with self._lock:
+                    self.cancelled += 1
+                continue
+            if work.deadline is not None and now >= work.deadline:
+                with self._lock:
+                    self.expired += 1
+                work.future.set_exception(
+                    DeadlineExceeded("Inference deadline passed before it started")
+                )
+                continue
+            live.append(work)
+
+        if not live:
+            return
+
+        try:
+            results = self._process_batch([work.args[0] for work in live])
+            if len(results) != len(live):
+                raise ValueError(
+                    f"{self.name} returned {len(results)} results for {len(live)} items"
+                )
+        except BaseException as exc:
+            for work in live:
+                work.future.set_exception(exc)
+        else:
+            for work, result in zip(live, results):
+                work.future.set_result(result)
+
+        with self._lock:
+            self.batches += 1
+            self.items += len(live)
+            self.largest_batch = max(self.largest_batch, len(live))
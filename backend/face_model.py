@@ -0,0 +1,104 @@
+"""DeepFace model glue: preprocessing, single and batched embeddings."""
+
+import numpy as np
+
+
+# Models whose DeepFace client is not a Keras model and must be run one
+# image at a time through client.forward().
+_NON_BATCHABLE_MODELS = {"Dlib", "SFace"}
+
+
+def _deepface():
+    # Imported lazily so processes that delegate inference to the inference
+    # server never load TensorFlow.
+    from deepface import DeepFace
+
+    return DeepFace
+
+
+def build_model(model_name):
+    """Return DeepFace's cached client for ``model_name``."""
+    return _deepface().build_model(model_name)
+
+
+def represent(img, model_name, detector_backend="opencv"):
+    """
+    Return the embedding DeepFace.verify would compute for ``img``.
+
+    With ``detector_backend="skip"``, ``img`` is an already aligned BGR face
+    crop (see face_detection) and no detector runs.
+    """
+    if detector_backend == "skip":
+        # DeepFace's skip path treats its input as RGB and flips it.
+        img = img[:, :, ::-1]
+    representations = _deepface().represent(
+        img_path=img,
+        model_name=model_name,
+        detector_backend=detector_backend,
+        enforce_detection=False,
+    )
+    if not representations:
+        raise ValueError("Face representation returned no embeddings")
+    return representations[0]["embedding"]
+
+
+def prepare_input(img, model_name, detector_backend="opencv"):
+    """
+    Detect, align and preprocess ``img`` into a (1, H, W, 3) model input.
+
+    Mirrors DeepFace.represent up to, but not including, the forward pass so
+    several inputs can be stacked into one batch. With
+    ``detector_backend="skip"``, ``img`` is an aligned BGR face crop.
+    """
+    from deepface.modules import preprocessing
+
+    client = build_model(model_name)
+    if detector_backend == "skip":
+        # resize_image scales 0-255 input into [0, 1] like extract_faces does.
+        face = img
+    else:
+        faces = _deepface().extract_faces(
+            img_path=img,
+            detector_backend=detector_backend,
+            enforce_detection=False,
+            align=True,
+        )
+        if not faces:
+            raise ValueError("Face extraction returned no faces")
+
+        # extract_faces returns RGB in [0, 1]; DeepFace feeds models BGR.
+        face = faces[0]["face"][:, :, ::-1]
+    target_h, target_w = client.input_shape
+    face = preprocessing.resize_image(img=face, target_size=(target_w, target_h))
+    return preprocessing.normalize_input(img=face, normalization="base")
+
+
+def embed_batch(model_inputs, model_name):
+    """
+    Run one forward pass over a list of prepared inputs.
+
+    Returns one embedding (list of floats) per input, in order, matching what
+    DeepFace's client.forward() would return for each input on its own.
+    """
+    client = build_model(model_name)
+    if model_name in _NON_BATCHABLE_MODELS:
+        return [client.forward(model_input) for model_input in model_inputs]
+
+    batch = np.concatenate(model_inputs, axis=0)
+    embeddings = np.asarray(client.model(batch, training=False))
+    if model_name == "VGG-Face":
+        # VggFaceClient.forward l2-normalizes outside the graph.
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        embeddings = embeddings / norms
+    return [row.tolist() for row in embeddings]
+
+
+def warm_up(model_name, batch_size=1, detector_backend="skip"):
+    """Load ``model_name`` and push dummy frames through every inference path."""
+    build_model(model_name)
+    dummy_frame = np.zeros((224, 224, 3), dtype=np.uint8)
+    represent(dummy_frame, model_name, detector_backend=detector_backend)
+    if batch_size > 1:
+        model_input = prepare_input(dummy_frame, model_name, detector_backend=detector_backend)
+        embed_batch([model_input] * batch_size, model_name)
@@ -0,0 +1,110 @@
+"""Cheap capture-quality checks run before a scan reaches the face model."""
+
+import threading
+
+import cv2
+import numpy as np
+
+
+# Messages shown to the student for each rejection reason.
+QUALITY_MESSAGES = {
+    "too_dark": "The image is too dark. Move somewhere brighter and try again.",
+    "too_bright": "The image is overexposed. Avoid facing a bright light and try again.",
+    "face_too_small": "Your face is too small in the frame. Move closer and try again.",
+    "blurry": "The image is blurry. Hold the camera still and try again.",
+}
+
+# Face crops are resized to this side before measuring sharpness so the
+# Laplacian variance does not depend on how large the face is.
+SHARPNESS_SIDE = 128
+# Histogram buckets counted as crushed shadows / blown highlights.
+DARK_LEVEL = 32
+BRIGHT_LEVEL = 224
+
+
+class QualityGate:
+    """
+    Rejects unusable frames before detection and inference run.
+
+    ``frame_issue`` checks exposure of the whole downscaled frame;
+    ``face_issue`` checks size, exposure and sharpness of the detected face.
+    Both return a QUALITY_MESSAGES key, or None when the check passes.
+    The caller records every screened scan with ``record``, including ones
+    rejected for other reasons such as no face being found, so ``stats``
+    shows how many scans never reached the model.
+    """
+
+    def __init__(
+        self,
+        min_brightness=40.0,
+        max_brightness=220.0,
+        max_clipped_fraction=0.75,
+        min_face_px=80,
+        min_sharpness=40.0,
+    ):
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.max_clipped_fraction = max_clipped_fraction
+        self.min_face_px = min_face_px
+        self.min_sharpness = min_sharpness
+        self._lock = threading.Lock()
+        self._passed = 0
+        self._rejected = {}
+        self._seconds = 0.0
+
+    def frame_issue(self, gray):
+        """Exposure check on a grayscale frame from its brightness histogram."""
+        hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+        total = hist.sum()
+        if not total:
+            return None
+        mean = float(np.dot(hist, np.arange(256)) / total)
+        dark_fraction = hist[:DARK_LEVEL].sum() / total
+        bright_fraction = hist[BRIGHT_LEVEL:].sum() / total
+        if mean < self.min_brightness or dark_fraction > self.max_clipped_fraction:
+            return "too_dark"
+        if mean > self.max_brightness or bright_fraction > self.max_clipped_fraction:
+            return "too_bright"
+        return None
+
+    def face_issue(self, face_crop):
+        """Size, exposure and sharpness checks on an aligned BGR face crop."""
+        height, width = face_crop.shape[:2]
+        if min(height, width) < self.min_face_px:
+            return "face_too_small"
+
+        gray = cv2.cvtColor(face_crop, cv2.COLOR_BGR2GRAY)
+        # A face lit from behind can sit in a well exposed frame.
+        mean = float(gray.mean())
+        if mean < self.min_brightness:
+            return "too_dark"
+        if mean > self.max_brightness:
+            return "too_bright"
+
+        if self.min_sharpness > 0:
+            resized = cv2.resize(
+                gray, (SHARPNESS_SIDE, SHARPNESS_SIDE), interpolation=cv2.INTER_AREA
+            )
+            if cv2.Laplacian(resized, cv2.CV_64F).var() < self.min_sharpness:
+                return "blurry"
+        return None
+
+    def record(self, issue, seconds=0.0):
+        """Count one screened scan: passed when ``issue`` is None, else rejected."""
+        with self._lock:
+            self._seconds += seconds
+            if issue is None:
+                self._passed += 1
+            else:
+                self._rejected[issue] = self._rejected.get(issue, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            rejected = dict(self._rejected)
+            checked = self._passed + sum(rejected.values())
+            return {
+                "checked": checked,
+                "passed": self._passed,
+                "rejected": rejected,
+                "averageScreenMs": (self._seconds / checked * 1000.0) if checked else 0.0,
+            }
@@ -0,0 +1,151 @@
+"""Read-through cache for Firestore ``users`` and ``classes`` documents."""
+
+import time
+
+try:
+    from .ttl_cache import TTLCache
+except ImportError:  # pragma: no cover - fallback for script execution
+    from ttl_cache import TTLCache
+
+
+class FirestoreRepository:
+    """
+    Cached lookups of user and class documents, plus an email -> uid index.
+
+    Documents are cached for ``ttl_seconds`` after they are read, and
+    concurrent misses for the same key share one Firestore read. Documents
+    that do not exist and failed reads are not cached, so a newly created
+    user or class is visible on the next call. ``client`` is a callable
+    returning the Firestore client, so tests can swap the client after the
+    repository is built.
+
+    Returned dicts are shallow copies; callers must not mutate nested
+    values. Whoever writes a user or class document through the backend
+    calls ``invalidate_user`` / ``invalidate_class``; writes made elsewhere
+    (e.g. by the web client) are picked up within ``ttl_seconds``.
+    """
+
+    def __init__(self, client, ttl_seconds=60, max_entries=4096, clock=time.monotonic):
+        self._client = client
+        self.users = TTLCache(ttl_seconds, max_entries=max_entries, clock=clock)
+        self.classes = TTLCache(ttl_seconds, max_entries=max_entries, clock=clock)
+        self.emails = TTLCache(ttl_seconds, max_entries=max_entries, clock=clock)
+
+    def get_user(self, user_id):
+        """Return the user document's data, or None if it does not exist."""
+        if not user_id:
+            return None
+        data = self.users.get_or_compute(
+            user_id,
+            lambda: self._read_user(user_id),
+            cache_if=_exists,
+        )
+        return None if data is None else dict(data)
+
+    def get_users(self, user_ids, field_paths=None, chunk_size=100):
+        """
+        Return {user_id: data} for the users in ``user_ids`` that exist.
+
+        Cached documents are used as-is; the rest are read with ``get_all``
+        in chunks of ``chunk_size``, one round trip per chunk. With
+        ``field_paths`` (top-level field names) only those fields are read
+        and returned, and the partial documents are not cached.
+        """
+        profiles = {}
+        missing = []
+        for user_id in dict.fromkeys(user_id for user_id in user_ids if user_id):
+            data = self.users.get(user_id)
+            if data is None:
+                missing.append(user_id)
+            elif field_paths is None:
+                profiles[user_id] = dict(data)
+            else:
+                profiles[user_id] = {field: data[field] for field in field_paths if field in data}
+        if not missing:
+            return profiles
+
+        client = self._client()
+        users = client.collection("users")
+        chunk_size = max(1, int(chunk_size))
+        for start in range(0, len(missing), chunk_size):
+            refs = [users.document(user_id) for user_id in missing[start : start + chunk_size]]
+            for snapshot in client.get_all(refs, field_paths=field_paths):
+                if not getattr(snapshot, "exists", False):
+                    continue
+                data = snapshot.to_dict() or {}
+                if field_paths is None:
+                    self.users.put(snapshot.id, data)
+                    self._index_email(snapshot.id, data)
+                profiles[snapshot.id] = dict(data)
+        return profiles
+
+    def get_class(self, class_id):
+        """Return the class document's data, or None if it does not exist."""
+        if not class_id:
+            return None
+        data = self.classes.get_or_compute(
+            class_id,
+            lambda: self._read("classes", class_id),
+            cache_if=_exists,
+        )
+        return None if data is None else dict(data)
+
+    def uid_for_email(self, email):
+        """Return the id of the user document whose ``email`` equals ``email``, or None."""
+        if not email:
+            return None
+        return self.emails.get_or_compute(
+            email,
+            lambda: self._query_email(email),
+            cache_if=_exists,
+        )
+
+    def invalidate_user(self, user_id=None):
+        """Forget one user (or every user and the email index when None)."""
+        if user_id is None:
+            self.users.invalidate()
+            self.emails.invalidate()
+            return
+        data = self.users.get(user_id)
+        self.users.invalidate(user_id)
+        if data and data.get("email"):
+            self.emails.invalidate(data["email"])
+
+    def invalidate_class(self, class_id=None):
+        """Forget one class document, or all of them when ``class_id`` is None."""
+        self.classes.invalidate(class_id)
+
+    def stats(self):
+        return {
+            "users": self.users.stats(),
+            "classes": self.classes.stats(),
+            "emails": self.emails.stats(),
+        }
+
+    def _read(self, collection, doc_id):
+        snapshot = self._client().collection(collection).document(doc_id).get()
+        if not getattr(snapshot, "exists", False):
+            return None
+        return snapshot.to_dict() or {}
+
+    def _read_user(self, user_id):
+        data = self._read("users", user_id)
+        self._index_email(user_id, data)
+        return data
+
+    def _query_email(self, email):
+        query = self._client().collection("users").where("email", "==", email).limit(1)
+        snapshot = next(iter(query.stream()), None)
+        if snapshot is None or not getattr(snapshot, "exists", False):
+            return None
+        user_id = snapshot.id
+        self.users.put(user_id, snapshot.to_dict() or {})
+        return user_id
+
+    def _index_email(self, user_id, data):
+        if data and data.get("email"):
+            self.emails.put(data["email"], user_id)
+
+
+def _exists(value):
+    return value is not None
@@ -0,0 +1,79 @@
+"""Capture decoding: read JPEG dimensions and decode close to the size we need."""
+
+import cv2
+import numpy as np
+
+
+# Start-of-frame markers, which carry the image size. 0xC4 (DHT), 0xC8 (JPG)
+# and 0xCC (DAC) share the range but are not frame headers.
+_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Scale-downs libjpeg can apply while decoding, largest first.
+_REDUCTION_FACTORS = (8, 4, 2)
+
+
+def jpeg_size(data):
+    """
+    Return (width, height) from a JPEG's frame header, or None.
+
+    Only the marker segments before the first frame header are walked, so
+    this costs a few hundred bytes of reading. None means ``data`` is not a
+    JPEG or its header could not be parsed.
+    """
+    length = len(data)
+    if length < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+
+    offset = 2
+    while offset + 4 <= length:
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker.
+            offset += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            # Markers without a length field.
+            offset += 2
+            continue
+        if marker in (0xD9, 0xDA):
+            # End of image or start of scan before any frame header.
+            return None
+        if marker in _SOF_MARKERS:
+            if offset + 9 > length:
+                return None
+            height = (data[offset + 5] << 8) | data[offset + 6]
+            width = (data[offset + 7] << 8) | data[offset + 8]
+            return (width, height) if width and height else None
+        offset += 2 + ((data[offset + 2] << 8) | data[offset + 3])
+    return None
+
+
+def reduction_factor(size, max_side):
+    """Largest libjpeg scale-down (8, 4, 2 or 1) that keeps the longest side >= ``max_side``."""
+    longest = max(size)
+    for factor in _REDUCTION_FACTORS:
+        # libjpeg rounds scaled dimensions up.
+        if -(-longest // factor) >= max_side:
+            return factor
+    return 1
+
+
+def decode_image(data, max_side=None):
+    """
+    Decode encoded image bytes (JPEG/PNG) into a BGR array, or None.
+
+    With ``max_side``, a JPEG at least twice that size is decoded at 1/2,
+    1/4 or 1/8 scale, whichever is smallest while still covering
+    ``max_side``, so a 12 MP capture is never materialised at full
+    resolution. The caller still resizes to exactly ``max_side``. Other
+    formats are decoded in full.
+    """
+    flags = cv2.IMREAD_COLOR
+    if max_side:
+        size = jpeg_size(data)
+        if size is not None:
+            factor = reduction_factor(size, max_side)
+            if factor > 1:
+                flags = getattr(cv2, f"IMREAD_REDUCED_COLOR_{factor}")
+    return cv2.imdecode(np.frombuffer(data, np.uint8), flags)
@@ -0,0 +1,247 @@
+"""
+Stand-alone face inference server shared by all HTTP workers on a host.
+
+One long-lived process loads DeepFace/TensorFlow and the model weights once
+and serves embedding requests over a Unix socket, micro-batching requests
+from every connected worker together. Flask workers started with
+INFERENCE_SERVER_SOCKET set talk to it through InferenceClient and never
+import TensorFlow themselves.
+
+Messages are pickled, so both ends refuse to run without
+INFERENCE_SERVER_AUTHKEY: the handshake authenticates the client to the
+server and the server to the client before anything is unpickled. The
+socket is created inside a directory only this user can enter.
+
+Usage (from backend/):
+  INFERENCE_SERVER_AUTHKEY=... python inference_server.py --socket /tmp/fras-inference/inference.sock
+"""
+
+import argparse
+import logging
+import os
+import queue
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+try:
+    from .face_inference import DeadlineExceeded, InferenceQueueFull, MicroBatcher
+    from . import face_model
+except ImportError:  # pragma: no cover - fallback for script execution
+    from face_inference import DeadlineExceeded, InferenceQueueFull, MicroBatcher
+    import face_model
+
+
+logger = logging.getLogger("fras.inference_server")
+
+# Exceptions that keep their type when sent back to the client.
+_REMOTE_EXCEPTIONS = {
+    "DeadlineExceeded": DeadlineExceeded,
+    "InferenceQueueFull": InferenceQueueFull,
+    "TimeoutError": TimeoutError,
+    "ValueError": ValueError,
+}
+
+
+class InferenceServerError(RuntimeError):
+    """Raised by InferenceClient when the server is unreachable or fails."""
+
+
+def authkey_from_env():
+    """Shared secret for the socket handshake, from INFERENCE_SERVER_AUTHKEY."""
+    value = os.environ.get("INFERENCE_SERVER_AUTHKEY")
+    return value.encode("utf-8") if value else None
+
+
+def _require_authkey(authkey):
+    if not authkey:
+        raise ValueError(
+            "INFERENCE_SERVER_AUTHKEY must be set: inference messages are pickled, "
+            "so an unauthenticated peer could run code in this process."
+        )
+    return authkey
+
+
+def _private_socket_dir(socket_path):
+    """Create (or check) the socket's directory so only this user can reach it."""
+    socket_dir = os.path.dirname(os.path.abspath(socket_path))
+    os.makedirs(socket_dir, mode=0o700, exist_ok=True)
+    info = os.stat(socket_dir)
+    if info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(
+            f"{socket_dir} must be owned by this user and closed to others (mode 0700)"
+        )
+
+
+class InferenceServer:
+    """Serves ("represent", model_name, image, timeout, detector_backend) requests."""
+
+    def __init__(self, socket_path, model_name, batch_size=8, batch_window_ms=5.0,
+                 max_queue=64, authkey=None):
+        self.socket_path = socket_path
+        self.model_name = model_name
+        self.authkey = _require_authkey(authkey)
+        self.batcher = MicroBatcher(
+            lambda model_inputs: face_model.embed_batch(model_inputs, model_name),
+            max_batch_size=batch_size,
+            max_wait_seconds=batch_window_ms / 1000.0,
+            max_queue=max_queue,
+            name="inference-server-batcher",
+        )
+        self.batch_size = batch_size
+
+    def serve_forever(self):
+        started = time.monotonic()
+        face_model.warm_up(self.model_name, batch_size=self.batch_size)
+        logger.info(
+            "Model %s warmed up in %.1fs", self.model_name, time.monotonic() - started
+        )
+
+        _private_socket_dir(self.socket_path)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        # The socket is bound with mode 0600 rather than chmod-ed afterwards.
+        previous_umask = os.umask(0o177)
+        try:
+            listener = Listener(self.socket_path, family="AF_UNIX", authkey=self.authkey)
+        finally:
+            os.umask(previous_umask)
+        logger.info("Inference server listening on %s", self.socket_path)
+
+        try:
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as exc:
+                    logger.warning("Rejected inference client: %s", exc)
+                    continue
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+        finally:
+            listener.close()
+
+    def _serve_connection(self, conn):
+        with conn:
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    conn.send(self._handle(message))
+                except OSError:
+                    # Client gave up (e.g. timed out) and closed the socket.
+                    return
+
+    def _handle(self, message):
+        try:
+            op = message[0]
+            if op == "ping":
+                return ("ok", {"model": self.model_name, "batching": self.batcher.stats()})
+            if op == "represent":
+                _, model_name, image, timeout_seconds, detector_backend = message
+                if model_name != self.model_name:
+                    raise ValueError(
+                        f"Server runs {self.model_name}, not {model_name}"
+                    )
+                deadline = None
+                if timeout_seconds is not None:
+                    deadline = time.monotonic() + timeout_seconds
+                model_input = face_model.prepare_input(
+                    image, model_name, detector_backend=detector_backend
+                )
+                future = self.batcher.submit(model_input, deadline=deadline)
+                return ("ok", future.result(timeout=timeout_seconds))
+            raise ValueError(f"Unknown inference operation: {op!r}")
+        except Exception as exc:
+            return ("error", type(exc).__name__, str(exc))
+
+
+class InferenceClient:
+    """
+    Thread-safe client for InferenceServer with a small connection pool.
+
+    Each in-flight call holds its own connection, so ``pool_size`` should match
+    the number of threads that may call ``represent`` at once.
+    """
+
+    def __init__(self, socket_path, pool_size=8, authkey=None):
+        self.socket_path = socket_path
+        self.authkey = _require_authkey(authkey)
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max(1, int(pool_size)))
+
+    def represent(self, image, model_name, timeout=None, detector_backend="opencv"):
+        """Return the embedding for ``image`` computed by the server."""
+        return self._call(
+            ("represent", model_name, image, timeout, detector_backend), timeout
+        )
+
+    def ping(self, timeout=5.0):
+        """Return server status; raises InferenceServerError when unreachable."""
+        return self._call(("ping",), timeout)
+
+    def _connect(self):
+        try:
+            return Client(self.socket_path, family="AF_UNIX", authkey=self.authkey)
+        except (OSError, EOFError, AuthenticationError) as exc:
+            raise InferenceServerError(
+                f"Inference server at {self.socket_path} is unavailable: {exc}"
+            ) from exc
+
+    def _call(self, message, timeout):
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+
+            try:
+                conn.send(message)
+                if not conn.poll(timeout):
+                    # The reply may still arrive later; this connection can
+                    # no longer be reused safely.
+                    conn.close()
+                    raise TimeoutError("Inference server did not answer in time")
+                reply = conn.recv()
+            except (OSError, EOFError) as exc:
+                conn.close()
+                raise InferenceServerError(f"Inference server connection failed: {exc}") from exc
+
+            self._idle.put(conn)
+
+        if reply[0] == "ok":
+            return reply[1]
+        _, exc_name, exc_message = reply
+        raise _REMOTE_EXCEPTIONS.get(exc_name, InferenceServerError)(exc_message)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="FRAS face inference server")
+    parser.add_argument(
+        "--socket",
+        default=os.environ.get("INFERENCE_SERVER_SOCKET", "/tmp/fras-inference/inference.sock"),
+    )
+    parser.add_argument("--model", default=os.environ.get("FACE_MODEL_NAME", "VGG-Face"))
+    parser.add_argument(
+        "--batch-size", type=int, default=int(os.environ.get("FACE_BATCH_MAX_SIZE", "8"))
+    )
+    parser.add_argument(
+        "--batch-window-ms",
+        type=float,
+        default=float(os.environ.get("FACE_BATCH_WINDOW_MS", "5")),
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    InferenceServer(
+        args.socket,
+        args.model,
+        batch_size=args.batch_size,
+        batch_window_ms=args.batch_window_ms,
+        authkey=authkey_from_env(),
+    ).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Cache of enrolled (known) face images stored in Cloud Storage."""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class KnownFace:
+    """A resolved known-face blob: its name, Storage generation and handle."""
+
+    __slots__ = ("blob_name", "generation", "blob")
+
+    def __init__(self, blob_name, generation, blob):
+        self.blob_name = blob_name
+        self.generation = generation
+        self.blob = blob
+
+
+class _Entry:
+    __slots__ = ("known_face", "checked_at", "image", "nbytes")
+
+    def __init__(self, known_face, checked_at):
+        self.known_face = known_face
+        self.checked_at = checked_at
+        self.image = None
+        self.nbytes = 0
+
+
+class KnownFaceCache:
+    """
+    Bounded, size-aware LRU of decoded known-face images.
+
+    Entries are keyed by blob name and remember the Storage generation they
+    were decoded from. ``resolve_enrollment`` finds a student's enrolled
+    images with one metadata request for the original image
+    (``bucket.get_blob``) and one listing of their template folder, and
+    trusts the result for ``revalidate_seconds``; only a changed generation
+    causes a re-download. A missing image or empty folder is remembered for
+    the same window, so students without an enrolled image do not cost a
+    Storage round-trip on every scan.
+    """
+
+    def __init__(self, decode, max_bytes=256 * 1024 * 1024, max_entries=4096,
+                 revalidate_seconds=60.0, clock=time.monotonic):
+        self._decode = decode
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.revalidate_seconds = revalidate_seconds
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._listings = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.metadata_hits = 0
+        self.metadata_checks = 0
+        self.image_hits = 0
+        self.image_misses = 0
+        self.evictions = 0
+
+    def resolve(self, bucket, blob_name):
+        """Return the current KnownFace for ``blob_name``, or None if absent."""
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(blob_name)
+            if entry is not None and now - entry.checked_at < self.revalidate_seconds:
+                self._entries.move_to_end(blob_name)
+                self.metadata_hits += 1
+                return entry.known_face
+            self.metadata_checks += 1
+
+        blob = bucket.get_blob(blob_name)
+        known_face = None
+        if blob is not None:
+            known_face = KnownFace(blob_name, getattr(blob, "generation", None), blob)
+
+        with self._lock:
+            self._remember(blob_name, known_face, now)
+            self._evict()
+
+        return known_face
+
+    def resolve_enrollment(self, bucket, primary_name, template_prefix):
+        """
+        Return the KnownFace for ``primary_name`` (if present) followed by
+        every blob under ``template_prefix``, sorted by name.
+
+        The original image is looked up by its exact name and only the
+        template folder is listed, so the cost does not grow with the number
+        of other students whose ids share a prefix. Listed blobs share the
+        per-blob entries (and decoded images) with the original image.
+        """
+        primary = self.resolve(bucket, primary_name)
+        templates = self._resolve_listing(bucket, template_prefix)
+        return ([primary] if primary is not None else []) + templates
+
+    def _resolve_listing(self, bucket, prefix):
+        now = self._clock()
+        with self._lock:
+            listing = self._listings.get(prefix)
+            if listing is not None and now - listing[0] < self.revalidate_seconds:
+                self._listings.move_to_end(prefix)
+                self.metadata_hits += 1
+                known_faces = []
+                for blob_name in listing[1]:
+                    entry = self._entries.get(blob_name)
+                    if entry is None or entry.known_face is None:
+                        break
+                    known_faces.append(entry.known_face)
+                else:
+                    return known_faces
+            self.metadata_checks += 1
+
+        known_faces = [
+            KnownFace(blob.name, getattr(blob, "generation", None), blob)
+            for blob in bucket.list_blobs(prefix=prefix)
+            if not blob.name.endswith("/")
+        ]
+        known_faces.sort(key=lambda known_face: known_face.blob_name)
+
+        with self._lock:
+            for known_face in known_faces:
+                self._remember(known_face.blob_name, known_face, now)
+            self._listings[prefix] = (now, [known_face.blob_name for known_face in known_faces])
+            self._listings.move_to_end(prefix)
+            self._evict()
+
+        return known_faces
+
+    def get_image(self, known_face):
+        """Return the decoded image for a resolved KnownFace, downloading on a miss."""
+        with self._lock:
+            entry = self._entries.get(known_face.blob_name)
+            if (
+                entry is not None
+                and entry.image is not None
+                and entry.known_face is not None
+                and entry.known_face.generation == known_face.generation
+            ):
+                self._entries.move_to_end(known_face.blob_name)
+                self.image_hits += 1
+                return entry.image
+            self.image_misses += 1
+
+        image = self._decode(known_face.blob.download_as_bytes())
+        if image is None:
+            raise ValueError(f"Known face image {known_face.blob_name} could not be decoded")
+
+        nbytes = int(getattr(image, "nbytes", 0) or 0)
+        with self._lock:
+            entry = self._entries.get(known_face.blob_name)
+            if entry is None or entry.known_face is None or (
+                entry.known_face.generation != known_face.generation
+            ):
+                # Resolved concurrently to a different generation; do not cache.
+                return image
+            self._bytes += nbytes - entry.nbytes
+            entry.image = image
+            entry.nbytes = nbytes
+            self._entries.move_to_end(known_face.blob_name)
+            self._evict()
+
+        return image
+
+    def _remember(self, blob_name, known_face, now):
+        entry = self._entries.get(blob_name)
+        if entry is not None and (
+            known_face is None
+            or entry.known_face is None
+            or entry.known_face.generation != known_face.generation
+        ):
+            self._drop(blob_name)
+            entry = None
+
+        if entry is None:
+            entry = _Entry(known_face, now)
+            self._entries[blob_name] = entry
+        else:
+            entry.known_face = known_face
+            entry.checked_at = now
+        self._entries.move_to_end(blob_name)
+
+    def invalidate(self, blob_name=None):
+        """Forget one blob, or everything when ``blob_name`` is None."""
+        with self._lock:
+            if blob_name is None:
+                self._entries.clear()
+                self._listings.clear()
+                self._bytes = 0
+            elif blob_name in self._entries:
+                self._drop(blob_name)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "images": sum(1 for entry in self._entries.values() if entry.image is not None),
+                "bytes": self._bytes,
+                "maxBytes": self.max_bytes,
+                "metadataHits": self.metadata_hits,
+                "metadataChecks": self.metadata_checks,
+                "imageHits": self.image_hits,
+                "imageMisses": self.image_misses,
+                "evictions": self.evictions,
+            }
+
+    def _drop(self, blob_name):
+        entry = self._entries.pop(blob_name)
+        self._bytes -= entry.nbytes
+
+    def _evict(self):
+        while self._entries and (
+            self._bytes > self.max_bytes or len(self._entries) > self.max_entries
+        ):
+            blob_name = next(iter(self._entries))
+            self._drop(blob_name)
+            self.evictions += 1
+        # Listings are bounded like entries; an evicted one is listed again.
+        while len(self._listings) > self.max_entries:
+            self._listings.popitem(last=False)
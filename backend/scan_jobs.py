@@ -0,0 +1,234 @@
+"""Registry of asynchronous face-scan jobs, optionally shared through Firestore."""
+
+import datetime
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+logger = logging.getLogger("fras.scan_jobs")
+
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+
+
+class _Job:
+    __slots__ = ("id", "state", "payload", "status", "finished_at")
+
+    def __init__(self, job_id):
+        self.id = job_id
+        self.state = QUEUED
+        self.payload = None
+        self.status = None
+        self.finished_at = None
+
+    def snapshot(self):
+        return {
+            "jobId": self.id,
+            "state": self.state,
+            "payload": self.payload,
+            "status": self.status,
+        }
+
+
+class ScanJobStore:
+    """
+    Tracks scan jobs from submission to result.
+
+    Jobs move queued -> running -> done; ``wait`` blocks until a job leaves
+    a given state so pollers and event streams need no busy loop. Finished
+    jobs are kept for ``ttl_seconds`` (and at most ``max_finished``) so the
+    client can collect the result, then forgotten. Unfinished jobs are
+    bounded by the executor that runs them, not by this store.
+
+    Jobs run in the worker process that accepted them. With ``client`` (a
+    callable returning the Firestore client) every state change is also
+    written to ``{collection}/{jobId}`` with an ``expiresAt`` timestamp, so
+    a poll or event stream that lands on another worker reads the shared
+    document instead, re-reading it every ``poll_seconds`` while it waits.
+    A failed shared write is logged and the job still finishes locally.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds=300,
+        max_finished=1024,
+        clock=time.monotonic,
+        client=None,
+        collection="scanJobs",
+        poll_seconds=1.0,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_finished = max(1, int(max_finished))
+        self._clock = clock
+        self._client = client
+        self.collection = collection
+        self.poll_seconds = poll_seconds
+        self._cond = threading.Condition()
+        self._jobs = {}
+        self._finished = OrderedDict()
+        self.created = 0
+        self.completed = 0
+        self.expired = 0
+        self.shared_reads = 0
+        self.shared_write_errors = 0
+
+    def create(self):
+        """Register a new queued job and return its id."""
+        job = _Job(uuid.uuid4().hex)
+        with self._cond:
+            self._prune_locked()
+            self._jobs[job.id] = job
+            self.created += 1
+            snapshot = job.snapshot()
+        self._publish(snapshot)
+        return job.id
+
+    def discard(self, job_id):
+        """Forget a job that could not be started."""
+        with self._cond:
+            self._jobs.pop(job_id, None)
+            self._cond.notify_all()
+        if self._client is not None:
+            try:
+                self._document(job_id).delete()
+            except Exception:
+                with self._cond:
+                    self.shared_write_errors += 1
+                logger.warning("Could not delete shared scan job %s", job_id, exc_info=True)
+
+    def mark_running(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.state != QUEUED:
+                return
+            job.state = RUNNING
+            snapshot = job.snapshot()
+            self._cond.notify_all()
+        self._publish(snapshot)
+
+    def finish(self, job_id, payload, status):
+        """Store a job's response payload and HTTP status; later calls are ignored."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.state == DONE:
+                return
+            job.state = DONE
+            job.payload = payload
+            job.status = status
+            job.finished_at = self._clock()
+            self._finished[job_id] = job.finished_at
+            self.completed += 1
+            snapshot = job.snapshot()
+            self._prune_locked()
+            self._cond.notify_all()
+        self._publish(snapshot)
+
+    def get(self, job_id):
+        """Return a snapshot dict of the job, or None if unknown or expired."""
+        with self._cond:
+            self._prune_locked()
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return job.snapshot()
+        return self._read_shared(job_id)
+
+    def wait(self, job_id, seen_state, timeout):
+        """
+        Block until the job is no longer in ``seen_state`` or ``timeout`` passes.
+
+        Returns the job's latest snapshot, or None if it is unknown.
+        """
+        deadline = self._clock() + timeout
+        with self._cond:
+            while job_id in self._jobs:
+                job = self._jobs[job_id]
+                if job.state != seen_state:
+                    return job.snapshot()
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    return job.snapshot()
+                self._cond.wait(remaining)
+
+        # Another worker runs this job; follow its shared document.
+        while True:
+            snapshot = self._read_shared(job_id)
+            remaining = deadline - self._clock()
+            if snapshot is None or snapshot["state"] != seen_state or remaining <= 0:
+                return snapshot
+            time.sleep(min(self.poll_seconds, remaining))
+
+    def stats(self):
+        with self._cond:
+            states = {QUEUED: 0, RUNNING: 0, DONE: 0}
+            for job in self._jobs.values():
+                states[job.state] += 1
+            return {
+                **states,
+                "created": self.created,
+                "completed": self.completed,
+                "expired": self.expired,
+                "sharedReads": self.shared_reads,
+                "sharedWriteErrors": self.shared_write_errors,
+                "ttlSeconds": self.ttl_seconds,
+            }
+
+    def _document(self, job_id):
+        return self._client().collection(self.collection).document(job_id)
+
+    def _publish(self, snapshot):
+        if self._client is None:
+            return
+        expires_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+            seconds=self.ttl_seconds
+        )
+        try:
+            self._document(snapshot["jobId"]).set(
+                {
+                    "state": snapshot["state"],
+                    "payload": snapshot["payload"],
+                    "status": snapshot["status"],
+                    "expiresAt": expires_at,
+                }
+            )
+        except Exception:
+            with self._cond:
+                self.shared_write_errors += 1
+            logger.warning(
+                "Could not share scan job %s; it is only visible to this worker",
+                snapshot["jobId"],
+                exc_info=True,
+            )
+
+    def _read_shared(self, job_id):
+        if self._client is None:
+            return None
+        with self._cond:
+            self.shared_reads += 1
+        document = self._document(job_id).get()
+        if not getattr(document, "exists", False):
+            return None
+        data = document.to_dict() or {}
+        expires_at = data.get("expiresAt")
+        if expires_at is not None and expires_at <= datetime.datetime.now(datetime.timezone.utc):
+            return None
+        return {
+            "jobId": job_id,
+            "state": data.get("state"),
+            "payload": data.get("payload"),
+            "status": data.get("status"),
+        }
+
+    def _prune_locked(self):
+        now = self._clock()
+        while self._finished:
+            job_id, finished_at = next(iter(self._finished.items()))
+            if len(self._finished) <= self.max_finished and finished_at + self.ttl_seconds > now:
+                break
+            del self._finished[job_id]
+            self._jobs.pop(job_id, None)
+            self.expired += 1
@@ -0,0 +1,59 @@
+import importlib.util
+import threading
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+
+
+def _load_module():
+    module_path = Path(__file__).resolve().parents[1] / "face_detection.py"
+    spec = importlib.util.spec_from_file_location("face_detection_under_test", module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def face_detection():
+    return _load_module()
+
+
+def test_blank_frame_has_no_face(face_detection):
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+
+    assert face_detection.detect_face(frame, min_size=80) is None
+
+
+def test_cascades_are_loaded_once_across_request_threads(face_detection):
+    loads = []
+    load_cascade = face_detection._load_cascade
+
+    def counting_load(filename):
+        loads.append(filename)
+        return load_cascade(filename)
+
+    face_detection._load_cascade = counting_load
+    face_detection.warm_up("opencv")
+
+    # Each scan runs on a fresh thread, as with the threaded HTTP server.
+    frame = np.full((240, 320, 3), 128, dtype=np.uint8)
+    for _ in range(2):
+        thread = threading.Thread(target=face_detection.detect_face, args=(frame,))
+        thread.start()
+        thread.join()
+    face_detection._eye_angle(np.full((64, 64), 128, dtype=np.uint8))
+
+    assert sorted(loads) == ["haarcascade_eye.xml", "haarcascade_frontalface_default.xml"]
+
+
+def test_aligned_crop_matches_box(face_detection):
+    frame = np.arange(100 * 120 * 3, dtype=np.uint8).reshape(100, 120, 3)
+
+    unrotated = face_detection._aligned_crop(frame, (10, 20, 40, 30), 0.0)
+    rotated = face_detection._aligned_crop(frame, (10, 20, 40, 30), 15.0)
+
+    assert np.array_equal(unrotated, frame[20:50, 10:50])
+    assert rotated.shape == (30, 40, 3)
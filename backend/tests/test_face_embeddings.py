@@ -0,0 +1,204 @@
+import importlib.util
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+
+def _load_module():
+    module_path = Path(__file__).resolve().parents[1] / "face_embeddings.py"
+    spec = importlib.util.spec_from_file_location("face_embeddings_under_test", module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def face_embeddings():
+    return _load_module()
+
+
+def test_cosine_distance_matches_reference(face_embeddings):
+    query = np.array([1.0, 2.0, 3.0])
+    candidates = np.array([[1.0, 2.0, 3.0], [-1.0, 0.5, 2.0], [3.0, 0.0, -1.0]])
+
+    distances = face_embeddings.find_distance(query, candidates, "cosine")
+
+    expected = [
+        1 - np.dot(query, row) / (np.linalg.norm(query) * np.linalg.norm(row))
+        for row in candidates
+    ]
+    assert distances.shape == (3,)
+    assert np.allclose(distances, expected, atol=1e-6)
+    assert face_embeddings.find_distance(query, candidates[1], "cosine") == pytest.approx(
+        expected[1], abs=1e-6
+    )
+
+
+def test_euclidean_metrics(face_embeddings):
+    query = np.array([3.0, 4.0])
+    candidate = np.array([0.0, 0.0])
+
+    assert face_embeddings.find_distance(query, candidate, "euclidean") == pytest.approx(5.0)
+    assert face_embeddings.find_distance(
+        np.array([1.0, 0.0]), np.array([0.0, 2.0]), "euclidean_l2"
+    ) == pytest.approx(np.sqrt(2.0))
+
+    with pytest.raises(ValueError):
+        face_embeddings.find_distance(query, candidate, "manhattan")
+
+
+def test_store_computes_once_per_generation(face_embeddings, tmp_path):
+    store = face_embeddings.EmbeddingStore(cache_dir=str(tmp_path))
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return [0.1, 0.2, 0.3]
+
+    first = store.get_or_compute("S1000", "VGG-Face", 7, compute)
+    second = store.get_or_compute("S1000", "VGG-Face", 7, compute)
+
+    assert len(calls) == 1
+    assert np.array_equal(first, second)
+    assert store.stats()["hits"] == 1
+
+    store.get_or_compute("S1000", "VGG-Face", 8, compute)
+    assert len(calls) == 2
+    assert store.get("S1000", "VGG-Face", 7) is None
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_store_reloads_from_disk(face_embeddings, tmp_path):
+    face_embeddings.EmbeddingStore(cache_dir=str(tmp_path)).put(
+        "../S1000", "VGG-Face", 3, [1.0, 0.0]
+    )
+
+    restarted = face_embeddings.EmbeddingStore(cache_dir=str(tmp_path))
+    embedding = restarted.get("../S1000", "VGG-Face", 3)
+
+    assert np.array_equal(embedding, np.array([1.0, 0.0], dtype=np.float32))
+    assert restarted.stats()["diskHits"] == 1
+    assert all(path.parent == tmp_path for path in tmp_path.iterdir())
+
+
+def test_store_cleanup_spares_other_workers_files(face_embeddings, tmp_path):
+    store = face_embeddings.EmbeddingStore(cache_dir=str(tmp_path))
+    store.put("S1000", "VGG-Face", 7, [1.0, 0.0])
+    (old,) = [path.name for path in tmp_path.iterdir()]
+    prefix = old.rsplit("_", 1)[0]
+    # Another worker is mid-write, and another has already stored generation 9.
+    (tmp_path / f"{prefix}_8.npy.1234.tmp").write_bytes(b"partial")
+    (tmp_path / "tmpabc123.tmp").write_bytes(b"partial")
+    (tmp_path / f"{prefix}_9.npy").write_bytes(b"newer")
+
+    store.put("S1000", "VGG-Face", 8, [0.0, 1.0])
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(
+        [f"{prefix}_8.npy", f"{prefix}_8.npy.1234.tmp", "tmpabc123.tmp", f"{prefix}_9.npy"]
+    )
+
+
+def test_store_without_generation_is_not_cached(face_embeddings, tmp_path):
+    store = face_embeddings.EmbeddingStore(cache_dir=str(tmp_path), max_entries=1)
+    calls = []
+
+    store.get_or_compute("S1000", "VGG-Face", None, lambda: calls.append(1) or [1.0])
+    store.get_or_compute("S1000", "VGG-Face", None, lambda: calls.append(1) or [1.0])
+
+    assert len(calls) == 2
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize("metric", ["cosine", "euclidean", "euclidean_l2"])
+def test_embedding_matrix_matches_pairwise_distances(face_embeddings, metric):
+    rng = np.random.default_rng(0)
+    roster = rng.normal(size=(300, 64))
+    query = roster[42] + rng.normal(scale=0.01, size=64)
+
+    matrix = face_embeddings.EmbeddingMatrix(
+        [f"S{i}" for i in range(300)], roster, metric=metric
+    )
+
+    expected = face_embeddings.find_distance(query, roster, metric)
+    assert np.allclose(matrix.distances(query), expected, atol=1e-4)
+
+    student_id, distance, margin = matrix.best_match(query)
+    ordered = np.sort(expected)
+    assert student_id == "S42"
+    assert distance == pytest.approx(ordered[0], abs=1e-4)
+    assert margin == pytest.approx(ordered[1] - ordered[0], abs=1e-4)
+
+
+def test_embedding_matrix_edge_cases(face_embeddings):
+    assert face_embeddings.EmbeddingMatrix([], []).best_match([1.0, 0.0]) is None
+
+    single = face_embeddings.EmbeddingMatrix(["S1"], [[1.0, 0.0]])
+    assert single.best_match([1.0, 0.0]) == ("S1", pytest.approx(0.0, abs=1e-6), None)
+
+
+def test_pinned_embeddings_survive_eviction_until_expiry(face_embeddings):
+    now = [0.0]
+    store = face_embeddings.EmbeddingStore(max_entries=2, clock=lambda: now[0])
+
+    store.put("S1", "VGG-Face", 1, [1.0])
+    store.pin("S1", "VGG-Face", until=100.0)
+    store.put("S2", "VGG-Face", 1, [2.0])
+    store.put("S3", "VGG-Face", 1, [3.0])
+
+    assert store.get("S1", "VGG-Face", 1) is not None
+    assert store.get("S2", "VGG-Face", 1) is None
+    assert store.stats()["pinned"] == 1
+
+    now[0] = 200.0
+    store.put("S4", "VGG-Face", 1, [4.0])
+    store.put("S5", "VGG-Face", 1, [5.0])
+
+    assert store.get("S1", "VGG-Face", 1) is None
+    assert store.stats()["pinned"] == 0
+
+
+@pytest.mark.parametrize("dtype,tolerance", [("float16", 1e-3), ("int8", 2e-2)])
+def test_quantized_matrix_tracks_float32_distances(face_embeddings, dtype, tolerance):
+    rng = np.random.default_rng(1)
+    roster = rng.normal(size=(5000, 128))
+    query = roster[4321] + rng.normal(scale=0.05, size=128)
+    ids = [f"S{i}" for i in range(5000)]
+
+    exact = face_embeddings.EmbeddingMatrix(ids, roster)
+    compact = face_embeddings.EmbeddingMatrix(ids, roster, dtype=dtype)
+
+    assert compact.nbytes < exact.nbytes
+    assert np.abs(compact.distances(query) - exact.distances(query)).max() < tolerance
+    assert compact.best_match(query)[0] == "S4321"
+    assert np.linalg.norm(compact.get("S7")) == pytest.approx(1.0, abs=tolerance)
+
+
+def test_store_keeps_quantized_vectors_in_memory(face_embeddings):
+    store = face_embeddings.EmbeddingStore(dtype="int8")
+    vector = np.linspace(-1.0, 1.0, 64)
+
+    returned = store.put("S1", "VGG-Face", 1, vector)
+    cached = store.get("S1", "VGG-Face", 1)
+
+    assert np.array_equal(returned, cached)
+    assert np.allclose(cached, vector, atol=1.0 / 127)
+    assert store.stats()["bytes"] == 64 + 4
+
+
+def test_best_match_scores_each_id_by_its_closest_template(face_embeddings):
+    matrix = face_embeddings.EmbeddingMatrix(
+        ["S1", "S1", "S2"],
+        [[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]],
+    )
+
+    student_id, distance, margin = matrix.best_match([0.1, 1.0])
+    assert student_id == "S1"
+    assert distance == pytest.approx(face_embeddings.cosine_distance([0.1, 1.0], [0.0, 1.0]), abs=1e-6)
+    assert margin == pytest.approx(
+        face_embeddings.cosine_distance([0.1, 1.0], [1.0, 1.0]) - distance, abs=1e-6
+    )
+    assert matrix.index["S1"] == 0
+
+    only_one_student = face_embeddings.EmbeddingMatrix(["S1", "S1"], [[1.0, 0.0], [0.0, 1.0]])
+    assert only_one_student.best_match([1.0, 0.2])[2] is None
@@ -0,0 +1,129 @@
+import importlib.util
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+
+def _load_module():
+    module_path = Path(__file__).resolve().parents[1] / "face_inference.py"
+    spec = importlib.util.spec_from_file_location("face_inference_under_test", module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def face_inference():
+    return _load_module()
+
+
+def _block_worker(executor):
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(5)
+        return "blocker"
+
+    future = executor.submit(blocker)
+    assert started.wait(5)
+    return future, release
+
+
+def test_executor_returns_results(face_inference):
+    executor = face_inference.InferenceExecutor(max_workers=2, max_queue=4)
+
+    futures = [executor.submit(lambda value=value: value * 2) for value in range(4)]
+
+    assert [future.result(timeout=5) for future in futures] == [0, 2, 4, 6]
+    assert executor.stats()["completed"] == 4
+
+
+def test_executor_rejects_when_queue_is_full(face_inference):
+    executor = face_inference.InferenceExecutor(max_workers=1, max_queue=1)
+    blocker, release = _block_worker(executor)
+
+    queued = executor.submit(lambda: "queued")
+    with pytest.raises(face_inference.InferenceQueueFull):
+        executor.submit(lambda: "rejected")
+
+    release.set()
+    assert blocker.result(timeout=5) == "blocker"
+    assert queued.result(timeout=5) == "queued"
+    assert executor.stats()["rejected"] == 1
+
+
+def test_expired_and_cancelled_work_never_runs(face_inference):
+    executor = face_inference.InferenceExecutor(max_workers=1, max_queue=4)
+    blocker, release = _block_worker(executor)
+    ran = []
+
+    expired = executor.submit(lambda: ran.append("expired"), deadline=time.monotonic() + 0.01)
+    cancelled = executor.submit(lambda: ran.append("cancelled"))
+    assert cancelled.cancel()
+
+    time.sleep(0.05)
+    release.set()
+    blocker.result(timeout=5)
+
+    with pytest.raises(face_inference.DeadlineExceeded):
+        expired.result(timeout=5)
+    assert isinstance(expired.exception(), TimeoutError)
+    executor._queue.join()
+
+    assert ran == []
+    stats = executor.stats()
+    assert stats["expired"] == 1
+    assert stats["cancelled"] == 1
+
+
+def test_micro_batcher_coalesces_concurrent_items(face_inference):
+    batch_sizes = []
+
+    def process(items):
+        batch_sizes.append(len(items))
+        return [item * 10 for item in items]
+
+    batcher = face_inference.MicroBatcher(
+        process, max_batch_size=4, max_wait_seconds=0.05, max_queue=16
+    )
+    barrier = threading.Barrier(8)
+    results = {}
+
+    def caller(value):
+        barrier.wait()
+        results[value] = batcher.submit(value).result(timeout=5)
+
+    threads = [threading.Thread(target=caller, args=(value,)) for value in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == {value: value * 10 for value in range(8)}
+    assert sum(batch_sizes) == 8
+    assert max(batch_sizes) <= 4
+    assert len(batch_sizes) < 8
+    assert batcher.stats()["items"] == 8
+
+
+def test_micro_batcher_drops_expired_items_and_propagates_errors(face_inference):
+    def process(items):
+        if "boom" in items:
+            raise RuntimeError("batch failed")
+        return items
+
+    batcher = face_inference.MicroBatcher(process, max_batch_size=2, max_wait_seconds=0.0)
+
+    expired = batcher.submit("late", deadline=time.monotonic() - 1)
+    with pytest.raises(face_inference.DeadlineExceeded):
+        expired.result(timeout=5)
+
+    with pytest.raises(RuntimeError):
+        batcher.submit("boom").result(timeout=5)
+
+    assert batcher.submit("ok").result(timeout=5) == "ok"
+    assert batcher.stats()["expired"] == 1
@@ -0,0 +1,65 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture
+def face_models(monkeypatch):
+    monkeypatch.syspath_prepend(str(BACKEND_DIR))
+    from benchmarks import face_models
+
+    return face_models
+
+
+def test_error_rates_count_accepted_impostors_and_rejected_genuines(face_models):
+    genuine = np.array([0.1, 0.2, 0.5, 0.6])
+    impostor = np.array([0.3, 0.7, 0.8, 0.9])
+
+    assert face_models.error_rates(genuine, impostor, 0.35) == (0.25, 0.5)
+    assert face_models.error_rates(genuine, impostor, 0.05) == (0.0, 1.0)
+    assert face_models.error_rates(np.array([]), impostor, 0.35) == (0.25, None)
+
+
+def test_threshold_for_far_stays_within_target(face_models):
+    impostor = np.array([0.9, 0.3, 0.7, 0.5, 0.8])
+
+    threshold = face_models.threshold_for_far(impostor, 0.2)
+
+    far, _ = face_models.error_rates(np.array([0.1]), impostor, threshold)
+    assert far == pytest.approx(0.2)
+    assert 0.5 > threshold > 0.49
+    assert face_models.threshold_for_far(impostor, 0.0) < 0.3
+    assert face_models.threshold_for_far(np.array([]), 0.1) is None
+
+
+def test_pairs_from_directory_balances_genuine_and_impostor(face_models, tmp_path):
+    for person in ("alice", "bob", "carol"):
+        (tmp_path / person).mkdir()
+        for index in range(3):
+            (tmp_path / person / f"{index}.jpg").write_bytes(b"")
+    (tmp_path / "bob" / "notes.txt").write_text("ignored")
+
+    pairs = face_models.pairs_from_directory(str(tmp_path), max_pairs=5)
+
+    genuine = [pair for pair in pairs if pair[2]]
+    impostor = [pair for pair in pairs if not pair[2]]
+    assert len(genuine) == len(impostor) == 5
+    assert all(Path(a).parent == Path(b).parent for a, b, _ in genuine)
+    assert all(Path(a).parent != Path(b).parent for a, b, _ in impostor)
+    assert not any(path.endswith(".txt") for pair in pairs for path in pair[:2])
+
+
+def test_pairs_from_csv_resolves_paths_relative_to_file(face_models, tmp_path):
+    pairs_file = tmp_path / "pairs.csv"
+    pairs_file.write_text("# image_a,image_b,same\na.jpg,b.jpg,1\na.jpg,c.jpg,0\n")
+
+    pairs = face_models.pairs_from_csv(str(pairs_file))
+
+    assert pairs == [
+        (str(tmp_path / "a.jpg"), str(tmp_path / "b.jpg"), True),
+        (str(tmp_path / "a.jpg"), str(tmp_path / "c.jpg"), False),
+    ]
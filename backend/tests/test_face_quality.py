@@ -0,0 +1,58 @@
+import importlib.util
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+
+def _load_module():
+    module_path = Path(__file__).resolve().parents[1] / "face_quality.py"
+    spec = importlib.util.spec_from_file_location("face_quality_under_test", module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def face_quality():
+    return _load_module()
+
+
+def _textured_face(side=160, brightness=128):
+    rng = np.random.default_rng(0)
+    noise = rng.integers(-60, 60, size=(side, side, 3))
+    return np.clip(brightness + noise, 0, 255).astype(np.uint8)
+
+
+def test_frame_exposure_checks(face_quality):
+    gate = face_quality.QualityGate()
+
+    assert gate.frame_issue(np.full((120, 160), 10, dtype=np.uint8)) == "too_dark"
+    assert gate.frame_issue(np.full((120, 160), 250, dtype=np.uint8)) == "too_bright"
+    assert gate.frame_issue(np.full((120, 160), 128, dtype=np.uint8)) is None
+
+
+def test_face_checks_size_then_sharpness(face_quality):
+    gate = face_quality.QualityGate(min_face_px=80)
+    sharp = _textured_face()
+
+    assert gate.face_issue(sharp) is None
+    assert gate.face_issue(sharp[:60, :60]) == "face_too_small"
+    assert gate.face_issue(cv2.GaussianBlur(sharp, (31, 31), 10)) == "blurry"
+    assert gate.face_issue(_textured_face(brightness=15) // 4) == "too_dark"
+
+
+def test_stats_count_reasons(face_quality):
+    gate = face_quality.QualityGate()
+
+    gate.record(None, 0.002)
+    gate.record("blurry", 0.004)
+    gate.record("blurry", 0.003)
+
+    stats = gate.stats()
+    assert stats["checked"] == 3
+    assert stats["passed"] == 1
+    assert stats["rejected"] == {"blurry": 2}
+    assert stats["averageScreenMs"] == pytest.approx(3.0)
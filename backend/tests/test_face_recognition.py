@@ -1,7 +1,13 @@
 import base64
+import concurrent.futures
+import contextlib
 import datetime
 import importlib.util
+import io
+import json
 import sys
+import threading
+import time
 import types
 from pathlib import Path
 
@@ -13,6 +19,14 @@ from concurrent.futures import TimeoutError as FuturesTimeoutError
 CENTRAL_TZ = datetime.timezone.utc
 
 
+class FakeAlreadyExists(Exception):
+    pass
+
+
+class FakeFailedPrecondition(Exception):
+    pass
+
+
 class FakeDocumentSnapshot:
     def __init__(self, data, doc_id=None):
         self._data = data
@@ -50,6 +64,14 @@ class FakeDocument:
     def set(self, data):
         self._store[self._doc_id] = dict(data)
 
+    def create(self, data):
+        if self._doc_id in self._store:
+            raise FakeAlreadyExists(self._doc_id)
+        self.set(data)
+
+    def delete(self):
+        self._store.pop(self._doc_id, None)
+
     def update(self, updates):
         if self._doc_id not in self._store:
             raise KeyError("Document does not exist")
@@ -65,6 +87,26 @@ class FakeCollection:
     def document(self, doc_id):
         return FakeDocument(self._store, doc_id)
 
+    def stream(self):
+        for doc_id, data in list(self._store.items()):
+            yield FakeDocumentSnapshot(dict(data), doc_id)
+
+
+class FakeBatch:
+    def __init__(self, firestore):
+        self._firestore = firestore
+        self._creates = []
+
+    def create(self, doc_ref, data):
+        self._creates.append((doc_ref, data))
+
+    def commit(self):
+        self._firestore.commits.append(len(self._creates))
+        if any(doc_ref._doc_id in doc_ref._store for doc_ref, _ in self._creates):
+            raise FakeAlreadyExists("batch")
+        for doc_ref, data in self._creates:
+            doc_ref.set(data)
+
 
 class FakeFirestore:
     def __init__(self, classes=None, attendance=None):
@@ -72,6 +114,10 @@ class FakeFirestore:
             "classes": classes or {},
             "attendance": attendance or {},
         }
+        self.commits = []
+
+    def batch(self):
+        return FakeBatch(self)
 
     def collection(self, name):
         store = self._collections.setdefault(name, {})
@@ -82,14 +128,15 @@ class FakeFirestore:
 
 
 class FakeBlob:
-    def __init__(self, image_bytes):
+    def __init__(self, image_bytes, generation=1):
         self.image_bytes = image_bytes
+        self.generation = generation
 
     def exists(self):
         return True
 
-    def download_to_filename(self, path):
-        Path(path).write_bytes(self.image_bytes)
+    def download_as_bytes(self):
+        return self.image_bytes
 
 
 class FakeBucket:
@@ -99,6 +146,12 @@ class FakeBucket:
     def blob(self, _path):
         return FakeBlob(self.image_bytes)
 
+    def get_blob(self, _path):
+        return FakeBlob(self.image_bytes)
+
+    def list_blobs(self, prefix):
+        return []
+
 
 @pytest.fixture
 def load_face_app(monkeypatch):
@@ -116,6 +169,9 @@ def load_face_app(monkeypatch):
             "firebase_admin.firestore",
             "firebase_admin.storage",
             "firebase_admin.auth",
+            "google",
+            "google.api_core",
+            "google.api_core.exceptions",
         ]
 
         for name in module_names:
@@ -125,7 +181,15 @@ def load_face_app(monkeypatch):
         class FakeFlask:
             def __init__(self, _name):
                 self._after_request_handlers = []
-                self.logger = types.SimpleNamespace(exception=lambda *args, **kwargs: None)
+                self.logger = types.SimpleNamespace(
+                    exception=lambda *args, **kwargs: None,
+                    warning=lambda *args, **kwargs: None,
+                    info=lambda *args, **kwargs: None,
+                    error=lambda *args, **kwargs: None,
+                )
+
+            def app_context(self):
+                return contextlib.nullcontext()
 
             def after_request(self, func):
                 self._after_request_handlers.append(func)
@@ -139,6 +203,9 @@ def load_face_app(monkeypatch):
 
         flask_module = types.ModuleType("flask")
         flask_module.Flask = FakeFlask
+        flask_module.Request = type(
+            "Request", (), {"_get_file_stream": lambda self, *args: "spooled to disk"}
+        )
         flask_module.request = types.SimpleNamespace()
         flask_module.jsonify = lambda payload: payload
         flask_module.Response = lambda *args, **kwargs: None
@@ -196,6 +263,17 @@ def load_face_app(monkeypatch):
         sys.modules["firebase_admin.storage"] = storage_module
         sys.modules["firebase_admin.auth"] = auth_module
 
+        google_module = types.ModuleType("google")
+        api_core_module = types.ModuleType("google.api_core")
+        api_exceptions_module = types.ModuleType("google.api_core.exceptions")
+        api_exceptions_module.AlreadyExists = FakeAlreadyExists
+        api_exceptions_module.FailedPrecondition = FakeFailedPrecondition
+        google_module.api_core = api_core_module
+        api_core_module.exceptions = api_exceptions_module
+        sys.modules["google"] = google_module
+        sys.modules["google.api_core"] = api_core_module
+        sys.modules["google.api_core.exceptions"] = api_exceptions_module
+
         preserved_backend_pkg = sys.modules.get("backend")
         preserved_backend_app = sys.modules.get("backend.app")
 
@@ -313,3 +391,1113 @@ def test_face_recognition_verification_failure(monkeypatch, load_face_app):
     assert status == 502
     assert response["status"] == "error"
     assert "failed" in response["message"].lower()
+
+
+def test_readyz_reports_ready_only_after_warmup(monkeypatch, load_face_app):
+    app_module, _, _ = load_face_app()
+
+    started = []
+    monkeypatch.setattr(app_module, "start_model_warmup", lambda: started.append(True))
+
+    response, status = app_module.readyz()
+    assert status == 503
+    assert response["status"] == "warming"
+    assert started
+
+    app_module.MODEL_READY.set()
+    response, status = app_module.readyz()
+    assert status == 200
+    assert response["status"] == "ready"
+
+    assert app_module.healthz() == ({"status": "ok"}, 200)
+
+
+def test_face_recognition_passes_images_in_memory(monkeypatch, load_face_app, tmp_path):
+    app_module, _, _ = load_face_app()
+    monkeypatch.chdir(tmp_path)
+
+    calls = []
+
+    def fake_verify(captured_img, student_id, known_faces, **kwargs):
+        calls.append((captured_img, student_id, known_faces))
+        return {"verified": True, "distance": 0.1, "max_threshold_to_verify": 0.3}
+
+    monkeypatch.setattr(app_module, "_perform_face_verification", fake_verify)
+
+    payload = {"image": _build_image_b64(), "classId": "CPSC101", "studentId": "A123"}
+    app_module.request = types.SimpleNamespace(
+        headers={"X-Forwarded-For": "10.0.0.5"},
+        remote_addr="10.0.0.5",
+        get_json=lambda: payload,
+    )
+
+    _, status = app_module._process_face_recognition_request()
+
+    assert status == 202
+    captured_img, student_id, known_faces = calls[0]
+    assert not isinstance(captured_img, str)
+    assert student_id == "A123"
+    [known_face] = known_faces
+    assert known_face.blob_name == "known_faces/A123.jpg"
+    assert known_face.blob.download_as_bytes() == b"known"
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_face_recognition_sheds_load_when_inference_queue_is_full(monkeypatch, load_face_app):
+    app_module, fake_db, _ = load_face_app()
+
+    def saturated(*args, **kwargs):
+        raise app_module.InferenceQueueFull("full")
+
+    monkeypatch.setattr(app_module, "_perform_face_verification", saturated)
+
+    payload = {"image": _build_image_b64(), "classId": "CPSC101", "studentId": "A123"}
+    app_module.request = types.SimpleNamespace(
+        headers={"X-Forwarded-For": "10.0.0.5"},
+        remote_addr="10.0.0.5",
+        get_json=lambda: payload,
+    )
+
+    response, status, headers = app_module._process_face_recognition_request()
+
+    assert status == 503
+    assert response["status"] == "busy"
+    assert headers["Retry-After"] == str(app_module.INFERENCE_RETRY_AFTER_SECONDS)
+    assert fake_db._collections["attendance"] == {}
+
+
+def test_face_recognition_verifies_only_the_detected_crop(monkeypatch, load_face_app):
+    app_module, _, _ = load_face_app()
+
+    face_crop = object()
+    calls = []
+    monkeypatch.setattr(app_module, "_detect_face", lambda img: face_crop)
+    monkeypatch.setattr(
+        app_module,
+        "_perform_face_verification",
+        lambda captured_face, *args, **kwargs: calls.append(captured_face)
+        or {"verified": True, "distance": 0.1, "max_threshold_to_verify": 0.3},
+    )
+
+    payload = {"image": _build_image_b64(), "classId": "CPSC101", "studentId": "A123"}
+    app_module.request = types.SimpleNamespace(
+        headers={"X-Forwarded-For": "10.0.0.5"},
+        remote_addr="10.0.0.5",
+        get_json=lambda: payload,
+    )
+
+    _, status = app_module._process_face_recognition_request()
+
+    assert status == 202
+    assert calls == [face_crop]
+
+
+def test_face_recognition_rejects_frames_without_a_face(monkeypatch, load_face_app):
+    app_module, fake_db, _ = load_face_app()
+
+    monkeypatch.setattr(app_module, "_detect_face", lambda img: None)
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("verification should not run without a face")
+
+    monkeypatch.setattr(app_module, "_perform_face_verification", unexpected)
+
+    payload = {"image": _build_image_b64(), "classId": "CPSC101", "studentId": "A123"}
+    app_module.request = types.SimpleNamespace(
+        headers={"X-Forwarded-For": "10.0.0.5"},
+        remote_addr="10.0.0.5",
+        get_json=lambda: payload,
+    )
+
+    response, status = app_module._process_face_recognition_request()
+
+    assert status == 400
+    assert response["status"] == "fail"
+    assert fake_db._collections["attendance"] == {}
+
+
+def test_face_recognition_rejects_poor_quality_frames_before_detection(monkeypatch, load_face_app):
+    app_module, fake_db, _ = load_face_app()
+
+    monkeypatch.setattr(app_module, "_scan_quality_issue", lambda img, face=False: "too_dark")
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("a rejected frame should not reach detection or inference")
+
+    monkeypatch.setattr(app_module, "_detect_face", unexpected)
+    monkeypatch.setattr(app_module, "_perform_face_verification", unexpected)
+
+    payload = {"image": _build_image_b64(), "classId": "CPSC101", "studentId": "A123"}
+    app_module.request = types.SimpleNamespace(
+        headers={"X-Forwarded-For": "10.0.0.5"},
+        remote_addr="10.0.0.5",
+        get_json=lambda: payload,
+    )
+
+    response, status = app_module._process_face_recognition_request()
+
+    assert status == 400
+    assert response["reason"] == "too_dark"
+    assert "too dark" in response["message"]
+    assert app_module.FACE_QUALITY_GATE.stats()["rejected"] == {"too_dark": 1}
+    assert fake_db._collections["attendance"] == {}
+
+
+def test_face_recognition_skips_inference_when_already_marked(monkeypatch, load_face_app):
+    app_module, fake_db, fake_bucket = load_face_app()
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("an already-marked scan should not reach Storage or inference")
+
+    monkeypatch.setattr(app_module, "_known_face_templates", unexpected)
+    monkeypatch.setattr(app_module, "_detect_face", unexpected)
+    monkeypatch.setattr(app_module, "_perform_face_verification", unexpected)
+
+    now = datetime.datetime.now(app_module.CENTRAL_TZ)
+    record_id = app_module._attendance_doc_id("CPSC101", "A123", now)
+    fake_db._collections["attendance"][record_id] = {"status": "Present"}
+
+    payload = {"image": _build_image_b64(), "classId": "CPSC101", "studentId": "A123"}
+    app_module.request = types.SimpleNamespace(
+        headers={"X-Forwarded-For": "10.0.0.5"},
+        remote_addr="10.0.0.5",
+        get_json=lambda: payload,
+    )
+
+    response, status = app_module._process_face_recognition_request()
+
+    assert status == 200
+    assert response["status"] == "already_marked"
+    assert fake_db._collections["attendance"] == {record_id: {"status": "Present"}}
+
+
+def test_face_scans_outside_class_window_skip_inference(monkeypatch, load_face_app):
+    app_module, fake_db, _ = load_face_app(
+        classes={"CPSC101": {"schedule": "MTWRF 12:00AM - 11:59PM", "students": ["A123"]}}
+    )
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("a scan outside the class window should not reach inference")
+
+    monkeypatch.setattr(
+        app_module, "get_attendance_status", lambda *args: (None, "Class is not in session.")
+    )
+    monkeypatch.setattr(app_module, "_known_face_templates", unexpected)
+    monkeypatch.setattr(app_module, "_detect_face", unexpected)
+    monkeypatch.setattr(app_module, "_perform_face_verification", unexpected)
+    monkeypatch.setattr(app_module, "_perform_face_identification", unexpected)
+
+    payload = {"image": _build_image_b64(), "classId": "CPSC101", "studentId": "A123"}
+    app_module.request = types.SimpleNamespace(
+        headers={"X-Forwarded-For": "10.0.0.5"},
+        remote_addr="10.0.0.5",
+        get_json=lambda: payload,
+    )
+
+    for process in (
+        app_module._process_face_recognition_request,
+        app_module._process_face_identification_request,
+    ):
+        response, status = process()
+        assert status == 400
+        assert response == {"status": "fail", "message": "Class is not in session."}
+    assert fake_db._collections["attendance"] == {}
+
+
+def test_face_recognition_stops_at_expired_request_deadline(monkeypatch, load_face_app):
+    app_module, fake_db, _ = load_face_app()
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("no stage should start after the deadline")
+
+    monkeypatch.setattr(app_module, "_known_face_templates", unexpected)
+    monkeypatch.setattr(app_module, "_perform_face_verification", unexpected)
+
+    payload = {"image": _build_image_b64(), "classId": "CPSC101", "studentId": "A123"}
+    app_module.request = types.SimpleNamespace(
+        headers={"X-Forwarded-For": "10.0.0.5", "X-Request-Timeout-Ms": "0"},
+        remote_addr="10.0.0.5",
+        get_json=lambda: payload,
+    )
+
+    response, status = app_module._process_face_recognition_request()
+
+    assert status == 504
+    assert "firestore" in response["message"]
+    assert app_module._deadline_expirations == {"firestore": 1}
+    assert fake_db._collections["attendance"] == {}
+
+
+def test_face_recognition_stops_waiting_for_a_slow_firestore_read(monkeypatch, load_face_app):
+    app_module, fake_db, _ = load_face_app()
+
+    gate = threading.Event()
+
+    def slow_class_document(class_id):
+        gate.wait(timeout=5)
+        return {"students": ["A123"]}
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("no stage should start after the deadline")
+
+    monkeypatch.setattr(app_module, "_get_class_document", slow_class_document)
+    monkeypatch.setattr(app_module, "_known_face_templates", unexpected)
+
+    payload = {"image": _build_image_b64(), "classId": "CPSC101", "studentId": "A123"}
+    app_module.request = types.SimpleNamespace(
+        headers={"X-Forwarded-For": "10.0.0.5", "X-Request-Timeout-Ms": "50"},
+        remote_addr="10.0.0.5",
+        get_json=lambda: payload,
+    )
+
+    try:
+        response, status = app_module._process_face_recognition_request()
+    finally:
+        gate.set()
+
+    assert status == 504
+    assert "firestore" in response["message"]
+    assert app_module._deadline_expirations == {"firestore": 1}
+    assert fake_db._collections["attendance"] == {}
+
+
+def test_face_recognition_passes_capped_request_deadline(monkeypatch, load_face_app):
+    app_module, fake_db, _ = load_face_app()
+
+    budgets = []
+
+    def fake_verification(*args, deadline=None, **kwargs):
+        budgets.append(deadline - app_module.time.monotonic())
+        return {"verified": True, "distance": 0.1, "max_threshold_to_verify": 0.3}
+
+    monkeypatch.setattr(app_module, "_perform_face_verification", fake_verification)
+
+    payload = {"image": _build_image_b64(), "classId": "CPSC101", "studentId": "A123"}
+    for timeout_ms in ("2000", "600000"):
+        fake_db._collections["attendance"].clear()
+        app_module.request = types.SimpleNamespace(
+            headers={
+                "X-Forwarded-For": "10.0.0.5",
+                "X-Request-Timeout-Ms": timeout_ms,
+                "Idempotency-Key": timeout_ms,
+            },
+            remote_addr="10.0.0.5",
+            get_json=lambda: payload,
+        )
+        _, status = app_module._process_face_recognition_request()
+        assert status == 202
+
+    assert 1.0 < budgets[0] <= 2.0
+    assert app_module.SCAN_DEADLINE_SECONDS - 1.0 < budgets[1] <= app_module.SCAN_DEADLINE_SECONDS
+
+
+def test_face_recognition_replays_resubmitted_frames(monkeypatch, load_face_app):
+    app_module, fake_db, _ = load_face_app()
+
+    calls = []
+    monkeypatch.setattr(
+        app_module,
+        "_perform_face_verification",
+        lambda *args, **kwargs: calls.append(args)
+        or {"verified": True, "distance": 0.1, "max_threshold_to_verify": 0.3},
+    )
+
+    payload = {"image": _build_image_b64(), "classId": "CPSC101", "studentId": "A123"}
+    app_module.request = types.SimpleNamespace(
+        headers={"X-Forwarded-For": "10.0.0.5"},
+        remote_addr="10.0.0.5",
+        get_json=lambda: payload,
+    )
+
+    first, first_status = app_module._process_face_recognition_request()
+    replay, replay_status, headers = app_module._process_face_recognition_request()
+
+    assert first_status == replay_status == 202
+    assert replay == first
+    assert headers["Idempotent-Replayed"] == "true"
+    assert len(calls) == 1
+    assert len(fake_db._collections["attendance"]) == 1
+
+    # Another student's submission of the same bytes is not a replay.
+    payload = dict(payload, studentId="B456")
+    _, status = app_module._process_face_recognition_request()
+    assert status == 202
+    assert len(calls) == 2
+
+
+def test_duplicate_scan_waiter_times_out_with_504(monkeypatch, load_face_app):
+    app_module, _, _ = load_face_app()
+
+    entered = threading.Event()
+    gate = threading.Event()
+
+    def slow_verification(*args, **kwargs):
+        entered.set()
+        gate.wait(timeout=5)
+        return {"verified": True, "distance": 0.1, "max_threshold_to_verify": 0.3}
+
+    monkeypatch.setattr(app_module, "_perform_face_verification", slow_verification)
+
+    payload = {"image": _build_image_b64(), "classId": "CPSC101", "studentId": "A123"}
+    app_module.request = types.SimpleNamespace(
+        headers={"X-Forwarded-For": "10.0.0.5"},
+        remote_addr="10.0.0.5",
+        get_json=lambda: payload,
+    )
+    first = []
+    leader = threading.Thread(
+        target=lambda: first.append(app_module._process_face_recognition_request())
+    )
+    leader.start()
+    assert entered.wait(timeout=5)
+
+    app_module.request = types.SimpleNamespace(
+        headers={"X-Forwarded-For": "10.0.0.5", "X-Request-Timeout-Ms": "50"},
+        remote_addr="10.0.0.5",
+        get_json=lambda: payload,
+    )
+    try:
+        response, status = app_module._process_face_recognition_request()
+    finally:
+        gate.set()
+        leader.join()
+
+    assert status == 504
+    assert "duplicate scan" in response["message"]
+    assert app_module._deadline_expirations == {"duplicate scan": 1}
+    assert first[0][1] == 202
+
+
+def test_face_recognition_does_not_replay_busy_responses(monkeypatch, load_face_app):
+    app_module, _, _ = load_face_app()
+
+    results = [
+        app_module.InferenceQueueFull("full"),
+        {"verified": True, "distance": 0.1, "max_threshold_to_verify": 0.3},
+    ]
+
+    def flaky(*args, **kwargs):
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(app_module, "_perform_face_verification", flaky)
+
+    payload = {"image": _build_image_b64(), "classId": "CPSC101", "studentId": "A123"}
+    app_module.request = types.SimpleNamespace(
+        headers={"X-Forwarded-For": "10.0.0.5", "Idempotency-Key": "scan-1"},
+        remote_addr="10.0.0.5",
+        get_json=lambda: payload,
+    )
+
+    _, busy_status, _ = app_module._process_face_recognition_request()
+    _, retry_status = app_module._process_face_recognition_request()
+
+    assert busy_status == 503
+    assert retry_status == 202
+    assert results == []
+
+
+def _submit_job(app_module, payload, args=None):
+    app_module.request = types.SimpleNamespace(
+        headers={"X-Forwarded-For": "10.0.0.5", "User-Agent": "kiosk"},
+        remote_addr="10.0.0.5",
+        args=args or {},
+        get_json=lambda: payload,
+    )
+    return app_module._submit_scan_job()
+
+
+def _poll_job(app_module, job_id):
+    app_module.request = types.SimpleNamespace(
+        method="GET", headers={"X-Forwarded-For": "10.0.0.5"}, remote_addr="10.0.0.5"
+    )
+    return app_module.face_recognition_job(job_id)
+
+
+def _wait_for_job(app_module, job_id):
+    job = app_module.SCAN_JOBS.get(job_id)
+    while job["state"] != "done":
+        job = app_module.SCAN_JOBS.wait(job_id, job["state"], 5)
+    return job
+
+
+def test_scan_job_runs_after_submission_returns(monkeypatch, load_face_app):
+    app_module, fake_db, _ = load_face_app()
+
+    release = threading.Event()
+
+    def slow_verification(*args, **kwargs):
+        release.wait(5)
+        return {"verified": True, "distance": 0.1, "max_threshold_to_verify": 0.3}
+
+    monkeypatch.setattr(app_module, "_perform_face_verification", slow_verification)
+
+    payload = {"image": _build_image_b64(), "classId": "CPSC101", "studentId": "A123"}
+    response, status, headers = _submit_job(app_module, payload)
+
+    assert status == 202
+    job_id = response["jobId"]
+    assert headers["Location"] == response["statusUrl"] == f"/api/face-recognition/jobs/{job_id}"
+
+    pending, pending_status, _ = _poll_job(app_module, job_id)
+    assert pending_status == 202
+    assert pending["status"] in ("queued", "running")
+
+    release.set()
+    job = _wait_for_job(app_module, job_id)
+    assert job["status"] == 202
+
+    body, body_status = _poll_job(app_module, job_id)
+    assert body_status == 202
+    assert body["status"] == "pending"
+    assert body["jobId"] == job_id
+
+    # The job ran after the submitting request, but kept its network details.
+    record = fake_db._collections["attendance"][body["recordId"]]
+    assert record["networkEvidence"]["remoteAddr"] == "10.0.0.5"
+    assert record["networkEvidence"]["userAgent"] == "kiosk"
+
+
+def test_scan_job_events_end_with_result(monkeypatch, load_face_app):
+    app_module, _, _ = load_face_app()
+
+    monkeypatch.setattr(app_module, "_detect_face", lambda img: None)
+
+    payload = {"image": _build_image_b64(), "classId": "CPSC101", "studentId": "A123"}
+    response, _, _ = _submit_job(app_module, payload)
+    job_id = response["jobId"]
+
+    events = list(app_module._scan_job_events(job_id, app_module.SCAN_JOBS.get(job_id)))
+
+    assert events[-1].startswith("event: result\n")
+    result = json.loads(events[-1].split("data: ", 1)[1])
+    assert result["status"] == 400
+    assert result["body"]["jobId"] == job_id
+    assert all(event.startswith(("event: state", ":")) for event in events[:-1])
+
+
+def test_cancelled_scan_job_is_finished_as_failed(load_face_app):
+    app_module, _, _ = load_face_app()
+
+    job_id = app_module.SCAN_JOBS.create()
+    future = concurrent.futures.Future()
+    future.add_done_callback(lambda done: app_module._finish_dropped_scan_job(job_id, done))
+    assert future.cancel()
+
+    body, status = _poll_job(app_module, job_id)
+
+    assert status == 503
+    assert body["status"] == "error"
+    assert body["jobId"] == job_id
+
+
+def test_dropped_scan_jobs_report_timeouts_and_failures_apart(load_face_app):
+    app_module, _, _ = load_face_app()
+
+    statuses = []
+    for exc in (app_module.DeadlineExceeded("late"), RuntimeError("boom")):
+        job_id = app_module.SCAN_JOBS.create()
+        future = concurrent.futures.Future()
+        future.set_exception(exc)
+        app_module._finish_dropped_scan_job(job_id, future)
+        statuses.append(_poll_job(app_module, job_id)[1])
+
+    assert statuses == [504, 500]
+
+
+def test_scan_job_is_readable_from_another_worker(monkeypatch, load_face_app):
+    app_module, fake_db, _ = load_face_app()
+
+    monkeypatch.setattr(
+        app_module,
+        "_perform_face_verification",
+        lambda *args, **kwargs: {"verified": True, "distance": 0.1, "max_threshold_to_verify": 0.3},
+    )
+    payload = {"image": _build_image_b64(), "classId": "CPSC101", "studentId": "A123"}
+    response, _, _ = _submit_job(app_module, payload)
+    job_id = response["jobId"]
+    _wait_for_job(app_module, job_id)
+
+    # A worker that did not accept the job only has the shared document.
+    app_module.SCAN_JOBS._jobs.clear()
+    body, status = _poll_job(app_module, job_id)
+
+    assert status == 202
+    assert body["status"] == "pending"
+    assert body["jobId"] == job_id
+    assert fake_db._collections["scanJobs"][job_id]["state"] == "done"
+
+
+def test_unknown_scan_job_is_not_found(load_face_app):
+    app_module, _, _ = load_face_app()
+
+    body, status = _poll_job(app_module, "missing")
+
+    assert status == 404
+    assert body["status"] == "error"
+
+
+def _capture_decoded_bytes(monkeypatch, app_module):
+    decoded = []
+
+    def fake_decode(image_bytes):
+        decoded.append(bytes(image_bytes))
+        return [0]
+
+    monkeypatch.setattr(app_module, "_decode_image_bytes", fake_decode)
+    monkeypatch.setattr(
+        app_module,
+        "_perform_face_verification",
+        lambda *args, **kwargs: {"verified": True, "distance": 0.1, "max_threshold_to_verify": 0.3},
+    )
+    return decoded
+
+
+def test_face_recognition_accepts_raw_image_body(monkeypatch, load_face_app):
+    app_module, _, _ = load_face_app()
+    decoded = _capture_decoded_bytes(monkeypatch, app_module)
+
+    def unexpected_json():
+        raise AssertionError("binary scans should not be parsed as JSON")
+
+    app_module.request = types.SimpleNamespace(
+        headers={
+            "X-Forwarded-For": "10.0.0.5",
+            "X-Class-Id": "CPSC101",
+            "X-Student-Id": "A123",
+        },
+        remote_addr="10.0.0.5",
+        mimetype="application/octet-stream",
+        args={},
+        get_data=lambda cache=True: b"\xff\xd8jpeg-bytes",
+        get_json=unexpected_json,
+    )
+
+    response, status = app_module._process_face_recognition_request()
+
+    assert status == 202
+    assert response["recognized_student"] == "A123"
+    assert decoded == [b"\xff\xd8jpeg-bytes"]
+
+
+def test_face_recognition_accepts_multipart_upload(monkeypatch, load_face_app):
+    app_module, _, _ = load_face_app()
+    decoded = _capture_decoded_bytes(monkeypatch, app_module)
+
+    upload = io.BytesIO(b"\xff\xd8jpeg-bytes")
+    app_module.request = types.SimpleNamespace(
+        headers={"X-Forwarded-For": "10.0.0.5"},
+        remote_addr="10.0.0.5",
+        mimetype="multipart/form-data",
+        form={"classId": "CPSC101", "studentId": "A123"},
+        files={"image": upload},
+    )
+
+    response, status = app_module._process_face_recognition_request()
+
+    assert status == 202
+    assert decoded == [b"\xff\xd8jpeg-bytes"]
+
+    app_module.request.files = {}
+    response, status = app_module._process_face_recognition_request()
+
+    assert status == 400
+    assert response["message"] == "Missing image, classId, or studentId"
+
+
+def _identify_request(app_module, payload):
+    app_module.request = types.SimpleNamespace(
+        headers={"X-Forwarded-For": "10.0.0.5"},
+        remote_addr="10.0.0.5",
+        get_json=lambda: payload,
+    )
+
+
+def test_face_identification_records_best_roster_match(monkeypatch, load_face_app):
+    app_module, fake_db, _ = load_face_app(
+        classes={
+            "CPSC101": {
+                "schedule": "MTWRF 12:00AM - 11:59PM",
+                "students": ["A123", "B456", "C789"],
+            }
+        }
+    )
+
+    calls = []
+
+    def fake_identify(captured_face, class_id, student_ids, **kwargs):
+        calls.append((class_id, list(student_ids)))
+        return {
+            "studentId": "B456",
+            "distance": 0.12,
+            "margin": 0.2,
+            "candidates": 3,
+            "max_threshold_to_verify": 0.35,
+        }
+
+    monkeypatch.setattr(app_module, "_perform_face_identification", fake_identify)
+    _identify_request(app_module, {"image": _build_image_b64(), "classId": "CPSC101"})
+
+    response, status = app_module._process_face_identification_request()
+
+    assert status == 202
+    assert response["recognized_student"] == "B456"
+    assert response["margin"] == 0.2
+    assert calls == [("CPSC101", ["A123", "B456", "C789"])]
+
+    record = fake_db.get_attendance(response["recordId"])
+    assert record["studentID"] == "B456"
+    assert record["verification"]["mode"] == "identify"
+    assert record["verification"]["candidates"] == 3
+
+
+def test_face_identification_rejects_ambiguous_matches(monkeypatch, load_face_app):
+    app_module, fake_db, _ = load_face_app(
+        classes={
+            "CPSC101": {
+                "schedule": "MTWRF 12:00AM - 11:59PM",
+                "students": ["A123", "B456"],
+            }
+        }
+    )
+    monkeypatch.setattr(app_module, "FACE_IDENTIFY_MIN_MARGIN", 0.05)
+    monkeypatch.setattr(
+        app_module,
+        "_perform_face_identification",
+        lambda *args, **kwargs: {
+            "studentId": "A123",
+            "distance": 0.2,
+            "margin": 0.01,
+            "candidates": 2,
+            "max_threshold_to_verify": 0.35,
+        },
+    )
+    _identify_request(app_module, {"image": _build_image_b64(), "classId": "CPSC101"})
+
+    response, status = app_module._process_face_identification_request()
+
+    assert status == 404
+    assert response["message"] == "Face not recognized"
+    assert fake_db._collections["attendance"] == {}
+
+
+def test_prefetch_embeds_and_pins_the_roster(monkeypatch, load_face_app):
+    app_module, _, fake_bucket = load_face_app()
+
+    logged = []
+    monkeypatch.setattr(
+        app_module.app,
+        "logger",
+        types.SimpleNamespace(
+            info=lambda *args, **kwargs: logged.append(args),
+            exception=lambda *args, **kwargs: None,
+        ),
+    )
+    monkeypatch.setattr(
+        fake_bucket,
+        "get_blob",
+        lambda path: None if "C789" in path else FakeBlob(b"known"),
+        raising=False,
+    )
+    embedded = []
+    monkeypatch.setattr(
+        app_module,
+        "_get_known_face_embedding",
+        lambda student_id, known_face, **kwargs: embedded.append(student_id) or [1.0],
+    )
+    rosters = []
+    monkeypatch.setattr(
+        app_module,
+        "_build_roster_matrix",
+        lambda class_id, student_ids, **kwargs: rosters.append((class_id, list(student_ids))),
+    )
+
+    start_dt = datetime.datetime.now(CENTRAL_TZ) + datetime.timedelta(minutes=10)
+    summary = app_module._prefetch_class_embeddings(
+        "CPSC101", {"students": ["A123", "B456", "C789"]}, start_dt
+    )
+
+    assert sorted(embedded) == ["A123", "B456"]
+    assert summary["embedded"] == 2
+    assert summary["missing"] == 1
+    assert rosters == [("CPSC101", ["A123", "B456", "C789"])]
+    assert app_module.EMBEDDING_STORE.stats()["pinned"] == 2
+    assert logged
+
+
+def test_prefetch_runs_once_per_upcoming_meeting(monkeypatch, load_face_app):
+    app_module, _, _ = load_face_app()
+
+    now = datetime.datetime.now(CENTRAL_TZ)
+    meetings = [
+        ("SOON", {"students": ["A123"]}, now + datetime.timedelta(minutes=5)),
+        ("LATER", {"students": ["A123"]}, now + datetime.timedelta(minutes=90)),
+    ]
+    monkeypatch.setattr(app_module, "_today_class_meetings", lambda: meetings)
+    prefetched = []
+    monkeypatch.setattr(
+        app_module,
+        "_prefetch_class_embeddings",
+        lambda class_id, class_data, start_dt: prefetched.append(class_id),
+    )
+
+    app_module._prefetch_upcoming_class_embeddings()
+    app_module._prefetch_upcoming_class_embeddings()
+
+    assert prefetched == ["SOON"]
+
+
+def test_face_recognition_scores_every_enrolled_template(monkeypatch, load_face_app):
+    app_module, fake_db, fake_bucket = load_face_app()
+
+    monkeypatch.setattr(
+        fake_bucket,
+        "list_blobs",
+        lambda prefix: [
+            types.SimpleNamespace(name=f"{prefix}glasses.jpg", generation=4),
+            types.SimpleNamespace(name=f"{prefix}", generation=1),
+        ],
+        raising=False,
+    )
+    seen = []
+
+    def fake_verify(captured_face, student_id, known_faces, **kwargs):
+        seen.extend(known_face.blob_name for known_face in known_faces)
+        return {
+            "verified": True,
+            "distance": 0.1,
+            "template": "known_faces/A123/glasses.jpg",
+            "templates": len(known_faces),
+            "max_threshold_to_verify": 0.35,
+        }
+
+    monkeypatch.setattr(app_module, "_perform_face_verification", fake_verify)
+
+    payload = {"image": _build_image_b64(), "classId": "CPSC101", "studentId": "A123"}
+    app_module.request = types.SimpleNamespace(
+        headers={"X-Forwarded-For": "10.0.0.5"},
+        remote_addr="10.0.0.5",
+        get_json=lambda: payload,
+    )
+
+    response, status = app_module._process_face_recognition_request()
+
+    assert status == 202
+    assert seen == ["known_faces/A123.jpg", "known_faces/A123/glasses.jpg"]
+    record = fake_db.get_attendance(response["recordId"])
+    assert record["verification"]["template"] == "known_faces/A123/glasses.jpg"
+    assert record["verification"]["templates"] == 2
+
+
+def test_create_documents_commits_in_chunks_and_skips_existing(load_face_app):
+    app_module, fake_db, _ = load_face_app()
+    attendance = fake_db._collections["attendance"]
+    attendance["CPSC101_S3_2024-01-01"] = {"status": "pending"}
+
+    documents = {
+        f"CPSC101_S{i}_2024-01-01": {"studentID": f"S{i}", "status": "Absent"}
+        for i in range(5)
+    }
+    created = app_module._create_documents(
+        fake_db.collection("attendance"), documents, chunk_size=3
+    )
+
+    assert fake_db.commits == [3, 2]
+    assert created == [f"CPSC101_S{i}_2024-01-01" for i in (0, 1, 2, 4)]
+    assert attendance["CPSC101_S3_2024-01-01"] == {"status": "pending"}
+    assert attendance["CPSC101_S4_2024-01-01"]["status"] == "Absent"
+
+
+def test_attendance_range_query_falls_back_without_index(monkeypatch, load_face_app):
+    app_module, _, _ = load_face_app()
+    day = datetime.datetime(2024, 1, 2, tzinfo=CENTRAL_TZ)
+    records = {
+        "old": {"classID": "CPSC101", "date": day - datetime.timedelta(days=1)},
+        "today": {"classID": "CPSC101", "date": day + datetime.timedelta(hours=9)},
+        "other": {"classID": "MATH200", "date": day + datetime.timedelta(hours=9)},
+    }
+    queries = []
+
+    class FakeQuery:
+        def __init__(self, filters=()):
+            self.filters = filters
+
+        def where(self, field, op, value):
+            return FakeQuery(self.filters + ((field, op, value),))
+
+        def stream(self):
+            queries.append([field for field, _, _ in self.filters])
+            if any(field == "date" for field, _, _ in self.filters):
+                raise FakeFailedPrecondition("The query requires an index.")
+            class_id = self.filters[0][2]
+            for doc_id, data in records.items():
+                if data["classID"] == class_id:
+                    yield FakeDocumentSnapshot(data, doc_id)
+
+    monkeypatch.setattr(app_module, "_get_attendance_collection", lambda: FakeQuery())
+
+    for _ in range(2):
+        snapshots = app_module._attendance_for_class_between(
+            "CPSC101", day, day + datetime.timedelta(days=1)
+        )
+        assert [snapshot.id for snapshot in snapshots] == ["today"]
+
+    # The indexed query is not retried until ATTENDANCE_INDEX_RETRY_SECONDS pass.
+    assert queries == [
+        ["classID", "date", "date"],
+        ["classID"],
+        ["classID"],
+    ]
+
+
+def test_auto_absence_skips_meetings_in_the_ledger(monkeypatch, load_face_app):
+    app_module, fake_db, _ = load_face_app(
+        classes={"CPSC101": {"schedule": "MTWRF 12:00AM - 12:00AM", "students": ["A1", "A2"]}}
+    )
+
+    monkeypatch.setattr(
+        app_module,
+        "_parse_schedule_days_and_times",
+        lambda _schedule: {
+            "weekdays": set(range(7)),
+            "start_time": datetime.time(0, 0),
+            "end_time": datetime.time(0, 0),
+        },
+    )
+    attendance_reads = []
+
+    def fake_attendance_between(class_id, start, end):
+        attendance_reads.append(class_id)
+        return []
+
+    monkeypatch.setattr(app_module, "_attendance_for_class_between", fake_attendance_between)
+    monkeypatch.setattr(app_module, "_get_user_profiles", lambda student_ids: {})
+    monkeypatch.setattr(app_module, "_maybe_notify_absence_threshold", lambda *args: None)
+
+    app_module._auto_create_absences_for_ended_classes()
+    app_module._auto_create_absences_for_ended_classes()
+
+    today = datetime.datetime.now(app_module.CENTRAL_TZ).date().isoformat()
+    assert attendance_reads == ["CPSC101"]
+    assert fake_db.commits == [2]
+    assert fake_db._collections["meetings"][f"CPSC101_{today}"]["absencesCreated"] == 2
+
+    # A restarted worker finds the meeting in the Firestore ledger.
+    app_module._finalized_meetings.clear()
+    app_module._auto_create_absences_for_ended_classes()
+    assert attendance_reads == ["CPSC101"]
+
+
+def test_warm_roster_is_revalidated_off_the_request_path(monkeypatch, load_face_app):
+    app_module, _, _ = load_face_app()
+
+    class FakeMatrix(list):
+        def __init__(self, labels, embeddings, **kwargs):
+            super().__init__(labels)
+
+    monkeypatch.setattr(app_module, "EmbeddingMatrix", FakeMatrix)
+    monkeypatch.setattr(
+        app_module, "_get_known_face_embedding", lambda student_id, known_face, **kwargs: [1.0]
+    )
+    gate = threading.Event()
+    gate.set()
+    lookups = []
+
+    def fake_templates(student_id):
+        gate.wait(timeout=5)
+        lookups.append(student_id)
+        return [types.SimpleNamespace(blob_name=f"known_faces/{student_id}.jpg", generation=1)]
+
+    monkeypatch.setattr(app_module, "_known_face_templates", fake_templates)
+
+    matrix = app_module._get_roster_matrix("CPSC101", ["A123", "B456"])
+    assert list(matrix) == ["A123", "B456"]
+    assert app_module._get_roster_matrix("CPSC101", ["A123", "B456"]) is matrix
+    assert sorted(lookups) == ["A123", "B456"]
+
+    # Once stale, the cached matrix is still served while Storage is slow.
+    monkeypatch.setattr(app_module.KNOWN_FACE_CACHE, "revalidate_seconds", 0.0)
+    gate.clear()
+    assert app_module._get_roster_matrix("CPSC101", ["A123", "B456"]) is matrix
+    gate.set()
+    app_module._ROSTER_REFRESH.submit(lambda: None).result(timeout=5)
+    assert len(lookups) == 4
+    assert app_module._roster_matrices["CPSC101"].matrix is matrix
+
+
+def test_cold_roster_build_stops_at_the_deadline(monkeypatch, load_face_app):
+    app_module, _, _ = load_face_app()
+
+    def slow_templates(student_id):
+        time.sleep(0.2)
+        return []
+
+    monkeypatch.setattr(app_module, "_known_face_templates", slow_templates)
+
+    with pytest.raises(app_module.DeadlineExceeded):
+        app_module._get_roster_matrix(
+            "CPSC101", ["A123", "B456"], deadline=time.monotonic() + 0.05
+        )
+    assert app_module._deadline_expirations == {"storage": 1}
+    assert "CPSC101" not in app_module._roster_matrices
+
+
+def test_cold_roster_embeddings_run_on_the_inference_pool(monkeypatch, load_face_app):
+    app_module, _, _ = load_face_app()
+
+    downloads = []
+    embeddings = []
+    monkeypatch.setattr(
+        app_module.KNOWN_FACE_CACHE,
+        "get_image",
+        lambda known_face: downloads.append(threading.current_thread().name) or [0],
+    )
+    monkeypatch.setattr(
+        app_module,
+        "_embed_known_image",
+        lambda known_img, model_name, deadline: embeddings.append(
+            threading.current_thread().name
+        )
+        or [1.0],
+    )
+
+    monkeypatch.setattr(
+        app_module.EMBEDDING_STORE,
+        "get_or_compute",
+        lambda key, model_key, generation, compute: compute(),
+    )
+    monkeypatch.setattr(
+        app_module, "EmbeddingMatrix", lambda labels, vectors, **kwargs: list(zip(labels, vectors))
+    )
+
+    roster = app_module._get_roster_matrix("CPSC101", ["A123", "B456"])
+
+    assert roster == [("A123", [1.0]), ("B456", [1.0])]
+    assert all(name.startswith("roster-prepare") for name in downloads)
+    assert all(name.startswith("inference-") for name in embeddings)
+    assert len(embeddings) == 2
+
+
+def test_verification_downloads_templates_outside_the_inference_pool(monkeypatch, load_face_app):
+    app_module, _, _ = load_face_app()
+
+    threads = []
+    monkeypatch.setattr(
+        app_module.KNOWN_FACE_CACHE,
+        "get_image",
+        lambda known_face: threads.append(("download", threading.current_thread().name)) or [0],
+    )
+    monkeypatch.setattr(
+        app_module,
+        "_embed_known_image",
+        lambda known_img, model_name, deadline: [1.0],
+    )
+    monkeypatch.setattr(
+        app_module.EMBEDDING_STORE,
+        "get_or_compute",
+        lambda key, model_key, generation, compute: compute(),
+    )
+    monkeypatch.setattr(
+        app_module,
+        "_represent_face",
+        lambda face, **kwargs: threads.append(("captured", threading.current_thread().name))
+        or [1.0],
+    )
+
+    class FakeTemplates:
+        def __init__(self, labels, vectors, **kwargs):
+            self.labels = labels
+
+        def best_match(self, embedding):
+            return self.labels[0], 0.1, None
+
+    monkeypatch.setattr(app_module, "EmbeddingMatrix", FakeTemplates)
+    known_face = types.SimpleNamespace(blob_name="known_faces/A123.jpg", generation=1)
+
+    result = app_module._perform_face_verification([0], "A123", [known_face])
+
+    assert result["verified"] is True
+    assert threads[0] == ("download", threading.current_thread().name)
+    assert threads[1][0] == "captured"
+    assert threads[1][1].startswith("inference-")
+
+
+def test_prefetch_stops_a_meeting_at_its_deadline(monkeypatch, load_face_app):
+    app_module, _, _ = load_face_app()
+
+    gate = threading.Event()
+
+    def templates(student_id):
+        if student_id == "SLOW":
+            gate.wait(timeout=5)
+        return []
+
+    monkeypatch.setattr(app_module, "_known_face_templates", templates)
+    monkeypatch.setattr(app_module, "FACE_PREFETCH_TIMEOUT_SECONDS", 0.05)
+
+    start_dt = datetime.datetime.now(CENTRAL_TZ) + datetime.timedelta(minutes=10)
+    try:
+        summary = app_module._prefetch_class_embeddings(
+            "CPSC101", {"students": ["A123", "SLOW"]}, start_dt
+        )
+    finally:
+        gate.set()
+
+    assert summary["missing"] == 1
+    assert summary["timedOut"] == 1
+    assert summary["seconds"] < 1
+
+
+def test_model_warm_up_starts_the_prefetch_loop(monkeypatch, load_face_app):
+    app_module, _, _ = load_face_app()
+
+    started = []
+    monkeypatch.setattr(app_module.face_detection, "warm_up", lambda backend: None)
+    monkeypatch.setattr(app_module.face_model, "warm_up", lambda *args, **kwargs: None)
+    monkeypatch.setattr(app_module, "start_face_prefetch", lambda: started.append(True))
+
+    app_module._warm_up_face_model()
+
+    assert app_module.MODEL_READY.is_set()
+    assert started == [True]
+
+
+def test_class_time_notifications_read_rosters_only_when_due(monkeypatch, load_face_app):
+    app_module, fake_db, _ = load_face_app()
+
+    now = datetime.datetime.now(CENTRAL_TZ)
+    meetings = [
+        ("LATER", {"students": ["A1"]}, now + datetime.timedelta(minutes=45)),
+        ("SOON", {"students": ["A2"], "name": "Intro"}, now + datetime.timedelta(minutes=10)),
+    ]
+    monkeypatch.setattr(app_module, "_iter_today_class_meetings", lambda: iter(meetings))
+    looked_up = []
+    monkeypatch.setattr(
+        app_module,
+        "_get_user_profiles",
+        lambda student_ids: looked_up.extend(student_ids)
+        or {student_id: {"email": f"{student_id}@unt.edu"} for student_id in student_ids},
+    )
+
+    app_module._check_and_send_class_time_notifications()
+
+    assert looked_up == ["A2"]
+    date_key = meetings[1][2].strftime("%Y%m%d")
+    notification = fake_db._collections["notifications"][f"class_SOON_{date_key}_pre"]
+    assert notification["targets"] == ["a2@unt.edu"]
+
+
+def test_multipart_uploads_are_buffered_in_memory(load_face_app):
+    app_module, _, _ = load_face_app()
+
+    assert app_module.app.request_class is app_module._InMemoryUploadRequest
+    upload_request = app_module._InMemoryUploadRequest()
+
+    stream = upload_request._get_file_stream(2 * 1024 * 1024, "image/jpeg", "scan.jpg")
+    assert isinstance(stream, io.BytesIO)
+
+    oversized = app_module.SCAN_UPLOAD_MEMORY_MAX_BYTES + 1
+    assert upload_request._get_file_stream(oversized, "image/jpeg", "scan.jpg") == "spooled to disk"
+    assert upload_request._get_file_stream(None, "image/jpeg", "scan.jpg") == "spooled to disk"
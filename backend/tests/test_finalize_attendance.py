@@ -187,6 +187,7 @@ def load_app(monkeypatch):
                 return FakeClient()
 
         flask_module.Flask = FakeFlask
+        flask_module.Request = type("Request", (), {})
         flask_module.request = types.SimpleNamespace()
         flask_module.jsonify = lambda payload: payload
         flask_module.Response = FakeResponse
@@ -249,6 +250,18 @@ def load_app(monkeypatch):
             deepface_module.DeepFace = _FakeDeepFace
             sys.modules["deepface"] = deepface_module
 
+        if "google.api_core.exceptions" not in sys.modules:
+            google_module = types.ModuleType("google")
+            api_core_module = types.ModuleType("google.api_core")
+            api_exceptions_module = types.ModuleType("google.api_core.exceptions")
+            api_exceptions_module.AlreadyExists = type("AlreadyExists", (Exception,), {})
+            api_exceptions_module.FailedPrecondition = type("FailedPrecondition", (Exception,), {})
+            google_module.api_core = api_core_module
+            api_core_module.exceptions = api_exceptions_module
+            sys.modules["google"] = google_module
+            sys.modules["google.api_core"] = api_core_module
+            sys.modules["google.api_core.exceptions"] = api_exceptions_module
+
         if "numpy" not in sys.modules:
             numpy_module = types.ModuleType("numpy")
             numpy_module.frombuffer = lambda *args, **kwargs: b""
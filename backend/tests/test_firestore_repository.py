@@ -0,0 +1,218 @@
+import importlib.util
+import sys
+import threading
+import types
+from pathlib import Path
+
+import pytest
+
+
+def _load_module():
+    backend_dir = Path(__file__).resolve().parents[1]
+    sys.path.insert(0, str(backend_dir))
+    try:
+        spec = importlib.util.spec_from_file_location(
+            "firestore_repository_under_test", backend_dir / "firestore_repository.py"
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(str(backend_dir))
+    return module
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeClient:
+    """Counts document reads and email queries; ``gate`` holds reads open."""
+
+    def __init__(self, collections):
+        self.collections = collections
+        self.reads = []
+        self.gate = None
+
+    def collection(self, name):
+        client = self
+
+        class _Query:
+            def __init__(self, field, value):
+                self._match = [
+                    (doc_id, data)
+                    for doc_id, data in client.collections[name].items()
+                    if data.get(field) == value
+                ]
+
+            def limit(self, count):
+                self._match = self._match[:count]
+                return self
+
+            def stream(self):
+                client.reads.append((name, "query"))
+                for doc_id, data in self._match:
+                    yield types.SimpleNamespace(id=doc_id, exists=True, to_dict=lambda d=data: dict(d))
+
+        class _Document:
+            def __init__(self, doc_id):
+                self._doc_id = doc_id
+
+            def get(self):
+                if client.gate is not None:
+                    client.gate.wait(timeout=5)
+                client.reads.append((name, self._doc_id))
+                data = client.collections[name].get(self._doc_id)
+                return types.SimpleNamespace(
+                    id=self._doc_id,
+                    exists=data is not None,
+                    to_dict=lambda: None if data is None else dict(data),
+                )
+
+        return types.SimpleNamespace(
+            document=_Document,
+            where=lambda field, op, value: _Query(field, value),
+        )
+
+    def get_all(self, refs, field_paths=None):
+        refs = list(refs)
+        self.reads.append(("get_all", len(refs), field_paths))
+        for ref in refs:
+            data = self.collections["users"].get(ref._doc_id)
+            if data is not None and field_paths is not None:
+                data = {field: data[field] for field in field_paths if field in data}
+            yield types.SimpleNamespace(
+                id=ref._doc_id,
+                exists=data is not None,
+                to_dict=lambda d=data: None if d is None else dict(d),
+            )
+
+
+@pytest.fixture
+def repository_module():
+    return _load_module()
+
+
+def _repository(module, client, clock=None):
+    return module.FirestoreRepository(lambda: client, ttl_seconds=60, clock=clock or FakeClock())
+
+
+def test_concurrent_misses_share_one_read(repository_module):
+    client = FakeClient({"classes": {"CPSC101": {"students": ["A123"]}}, "users": {}})
+    client.gate = threading.Event()
+    repository = _repository(repository_module, client)
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(repository.get_class("CPSC101")))
+        for _ in range(300)
+    ]
+    for thread in threads:
+        thread.start()
+    client.gate.set()
+    for thread in threads:
+        thread.join()
+
+    assert client.reads == [("classes", "CPSC101")]
+    assert results == [{"students": ["A123"]}] * 300
+    stats = repository.stats()["classes"]
+    assert stats["misses"] == 1
+    assert stats["hits"] + stats["joined"] == 299
+
+
+def test_documents_expire_and_can_be_invalidated(repository_module):
+    clock = FakeClock()
+    client = FakeClient({"classes": {}, "users": {"T1": {"fname": "Ada"}}})
+    repository = _repository(repository_module, client, clock)
+
+    repository.get_user("T1")["fname"] = "mutated"
+    assert repository.get_user("T1") == {"fname": "Ada"}
+    assert len(client.reads) == 1
+
+    client.collections["users"]["T1"] = {"fname": "Grace"}
+    repository.invalidate_user("T1")
+    assert repository.get_user("T1") == {"fname": "Grace"}
+
+    client.collections["users"]["T1"] = {"fname": "Edsger"}
+    clock.now = 61
+    assert repository.get_user("T1") == {"fname": "Edsger"}
+    assert len(client.reads) == 3
+
+
+def test_missing_documents_are_not_cached(repository_module):
+    client = FakeClient({"classes": {}, "users": {}})
+    repository = _repository(repository_module, client)
+
+    assert repository.get_class("NEW1") is None
+    client.collections["classes"]["NEW1"] = {"schedule": "MW 9:00AM - 9:50AM"}
+    assert repository.get_class("NEW1") == {"schedule": "MW 9:00AM - 9:50AM"}
+
+
+def test_email_index_is_filled_by_queries_and_reads(repository_module):
+    client = FakeClient(
+        {
+            "classes": {},
+            "users": {
+                "T1": {"email": "teacher@unt.edu"},
+                "S1": {"email": "student@unt.edu"},
+            },
+        }
+    )
+    repository = _repository(repository_module, client)
+
+    assert repository.uid_for_email("teacher@unt.edu") == "T1"
+    assert repository.get_user("T1") == {"email": "teacher@unt.edu"}
+    assert repository.get_user("S1") == {"email": "student@unt.edu"}
+    assert repository.uid_for_email("student@unt.edu") == "S1"
+    assert repository.uid_for_email("teacher@unt.edu") == "T1"
+    assert client.reads == [("users", "query"), ("users", "S1")]
+
+    repository.invalidate_user("T1")
+    assert repository.uid_for_email("teacher@unt.edu") == "T1"
+    assert client.reads[-1] == ("users", "query")
+
+
+def test_get_users_reads_misses_in_masked_chunks(repository_module):
+    users = {f"S{i}": {"email": f"s{i}@unt.edu", "fname": "F", "photo": "x"} for i in range(7)}
+    client = FakeClient({"classes": {}, "users": users})
+    repository = _repository(repository_module, client)
+    repository.get_user("S0")
+
+    profiles = repository.get_users(
+        ["S0", "S1", "S2", "S1", "S3", "S4", "S5", "S6", "GONE"],
+        field_paths=("email", "fname"),
+        chunk_size=4,
+    )
+
+    assert set(profiles) == {f"S{i}" for i in range(7)}
+    assert profiles["S0"] == {"email": "s0@unt.edu", "fname": "F"}
+    assert profiles["S6"] == {"email": "s6@unt.edu", "fname": "F"}
+    assert client.reads[1:] == [
+        ("get_all", 4, ("email", "fname")),
+        ("get_all", 3, ("email", "fname")),
+    ]
+    # Partial documents are not cached as full ones.
+    assert repository.get_user("S1") == users["S1"]
+
+
+def test_invalidation_beats_a_read_already_in_flight(repository_module):
+    client = FakeClient({"classes": {}, "users": {"T1": {"fname": "Ada"}}})
+    client.gate = threading.Event()
+    repository = _repository(repository_module, client)
+
+    reader = threading.Thread(target=repository.get_user, args=("T1",))
+    reader.start()
+    while repository.stats()["users"]["misses"] < 1:
+        threading.Event().wait(0.01)
+
+    # A write lands and is invalidated while the old document is being read.
+    repository.invalidate_user("T1")
+    client.gate.set()
+    reader.join(5)
+    client.gate = None
+    client.collections["users"]["T1"] = {"fname": "Grace"}
+
+    assert repository.get_user("T1") == {"fname": "Grace"}
@@ -0,0 +1,60 @@
+import importlib.util
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+
+def _load_module():
+    module_path = Path(__file__).resolve().parents[1] / "image_decode.py"
+    spec = importlib.util.spec_from_file_location("image_decode_under_test", module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def image_decode():
+    return _load_module()
+
+
+def _encode(width, height, ext=".jpg", params=()):
+    img = np.zeros((height, width, 3), dtype=np.uint8)
+    img[:, :, 1] = np.linspace(0, 255, width, dtype=np.uint8)
+    ok, encoded = cv2.imencode(ext, img, list(params))
+    assert ok
+    return encoded.tobytes()
+
+
+def test_jpeg_size_reads_frame_header(image_decode):
+    assert image_decode.jpeg_size(_encode(1000, 750)) == (1000, 750)
+    progressive = _encode(640, 480, params=(cv2.IMWRITE_JPEG_PROGRESSIVE, 1))
+    assert image_decode.jpeg_size(progressive) == (640, 480)
+
+
+def test_jpeg_size_rejects_other_data(image_decode):
+    assert image_decode.jpeg_size(_encode(100, 80, ext=".png")) is None
+    assert image_decode.jpeg_size(b"captured-image") is None
+    assert image_decode.jpeg_size(_encode(1000, 750)[:6]) is None
+
+
+def test_reduction_factor_keeps_target_covered(image_decode):
+    assert image_decode.reduction_factor((4032, 3024), 640) == 4
+    assert image_decode.reduction_factor((5120, 3840), 640) == 8
+    assert image_decode.reduction_factor((1280, 720), 640) == 2
+    assert image_decode.reduction_factor((1278, 720), 640) == 1
+    assert image_decode.reduction_factor((640, 480), 640) == 1
+
+
+def test_decode_image_reduces_large_jpegs_only(image_decode):
+    large = _encode(2600, 1400)
+
+    assert image_decode.decode_image(large, max_side=640).shape == (350, 650, 3)
+    assert image_decode.decode_image(large).shape == (1400, 2600, 3)
+    assert image_decode.decode_image(_encode(2600, 1400, ext=".png"), max_side=640).shape == (
+        1400,
+        2600,
+        3,
+    )
@@ -0,0 +1,106 @@
+import importlib.util
+import stat
+import threading
+import time
+import types
+from pathlib import Path
+
+import pytest
+
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+AUTHKEY = b"test-secret"
+
+
+@pytest.fixture
+def inference_server(monkeypatch):
+    monkeypatch.syspath_prepend(str(BACKEND_DIR))
+    spec = importlib.util.spec_from_file_location(
+        "inference_server_under_test", BACKEND_DIR / "inference_server.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    batches = []
+
+    def embed_batch(model_inputs, model_name):
+        batches.append(list(model_inputs))
+        return [[float(len(model_input)), 1.0] for model_input in model_inputs]
+
+    module.face_model = types.SimpleNamespace(
+        warm_up=lambda model_name, batch_size=1: None,
+        prepare_input=lambda image, model_name, detector_backend="opencv": image,
+        embed_batch=embed_batch,
+    )
+    module.batches = batches
+    return module
+
+
+def _start_server(module, socket_path):
+    server = module.InferenceServer(str(socket_path), "VGG-Face", batch_size=4, authkey=AUTHKEY)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = module.InferenceClient(str(socket_path), pool_size=4, authkey=AUTHKEY)
+
+    for _ in range(100):
+        try:
+            client.ping()
+            return client
+        except module.InferenceServerError:
+            time.sleep(0.02)
+    raise AssertionError("inference server did not start")
+
+
+def test_client_receives_embeddings_from_server(inference_server, tmp_path):
+    client = _start_server(inference_server, tmp_path / "inference.sock")
+
+    assert client.represent("abc", "VGG-Face", timeout=5) == [3.0, 1.0]
+    assert client.represent("abcd", "VGG-Face", timeout=5) == [4.0, 1.0]
+    assert client.ping()["model"] == "VGG-Face"
+    assert inference_server.batches
+
+
+def test_server_errors_keep_their_type(inference_server, tmp_path):
+    client = _start_server(inference_server, tmp_path / "inference.sock")
+
+    with pytest.raises(ValueError):
+        client.represent("abc", "Facenet", timeout=5)
+
+    assert client.represent("ok", "VGG-Face", timeout=5) == [2.0, 1.0]
+
+
+def test_client_reports_unavailable_server(inference_server, tmp_path):
+    client = inference_server.InferenceClient(str(tmp_path / "missing.sock"), authkey=AUTHKEY)
+
+    with pytest.raises(inference_server.InferenceServerError):
+        client.ping(timeout=1)
+
+
+def test_server_and_client_require_an_authkey(inference_server, tmp_path):
+    with pytest.raises(ValueError):
+        inference_server.InferenceServer(str(tmp_path / "inference.sock"), "VGG-Face")
+    with pytest.raises(ValueError):
+        inference_server.InferenceClient(str(tmp_path / "inference.sock"))
+
+
+def test_socket_is_private_and_rejects_other_keys(inference_server, tmp_path):
+    socket_path = tmp_path / "private" / "inference.sock"
+    _start_server(inference_server, socket_path)
+
+    assert stat.S_IMODE(socket_path.parent.stat().st_mode) == 0o700
+    assert stat.S_IMODE(socket_path.stat().st_mode) & 0o077 == 0
+
+    intruder = inference_server.InferenceClient(str(socket_path), authkey=b"wrong")
+    with pytest.raises(inference_server.InferenceServerError):
+        intruder.ping(timeout=1)
+
+
+def test_server_refuses_a_shared_socket_directory(inference_server, tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+    server = inference_server.InferenceServer(
+        str(shared / "inference.sock"), "VGG-Face", authkey=AUTHKEY
+    )
+
+    with pytest.raises(PermissionError):
+        server.serve_forever()
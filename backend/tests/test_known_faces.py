@@ -0,0 +1,185 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+
+def _load_module():
+    module_path = Path(__file__).resolve().parents[1] / "known_faces.py"
+    spec = importlib.util.spec_from_file_location("known_faces_under_test", module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeImage:
+    def __init__(self, payload, nbytes):
+        self.payload = payload
+        self.nbytes = nbytes
+
+
+class FakeBlob:
+    def __init__(self, bucket, name, generation):
+        self.bucket = bucket
+        self.name = name
+        self.generation = generation
+
+    def download_as_bytes(self):
+        self.bucket.downloads.append(self.name)
+        return self.bucket.contents[self.name][1]
+
+
+class FakeBucket:
+    def __init__(self):
+        self.contents = {}
+        self.metadata_requests = 0
+        self.downloads = []
+        self.listed_prefixes = []
+
+    def upload(self, name, payload, generation):
+        self.contents[name] = (generation, payload)
+
+    def get_blob(self, name):
+        self.metadata_requests += 1
+        if name not in self.contents:
+            return None
+        return FakeBlob(self, name, self.contents[name][0])
+
+    def list_blobs(self, prefix):
+        self.metadata_requests += 1
+        self.listed_prefixes.append(prefix)
+        return [
+            FakeBlob(self, name, generation)
+            for name, (generation, _) in self.contents.items()
+            if name.startswith(prefix)
+        ]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def cache_parts():
+    module = _load_module()
+    clock = FakeClock()
+    cache = module.KnownFaceCache(
+        decode=lambda payload: FakeImage(payload, len(payload)),
+        max_bytes=10,
+        revalidate_seconds=30,
+        clock=clock,
+    )
+    return cache, FakeBucket(), clock
+
+
+def test_resolve_skips_metadata_within_window(cache_parts):
+    cache, bucket, clock = cache_parts
+    bucket.upload("known_faces/S1.jpg", b"abc", generation=1)
+
+    first = cache.resolve(bucket, "known_faces/S1.jpg")
+    clock.now = 10
+    second = cache.resolve(bucket, "known_faces/S1.jpg")
+
+    assert first is second
+    assert bucket.metadata_requests == 1
+    assert cache.stats()["metadataHits"] == 1
+
+
+def test_image_is_refetched_only_when_generation_changes(cache_parts):
+    cache, bucket, clock = cache_parts
+    bucket.upload("known_faces/S1.jpg", b"abc", generation=1)
+
+    known = cache.resolve(bucket, "known_faces/S1.jpg")
+    assert cache.get_image(known).payload == b"abc"
+    assert cache.get_image(known).payload == b"abc"
+    assert bucket.downloads == ["known_faces/S1.jpg"]
+
+    clock.now = 60
+    known = cache.resolve(bucket, "known_faces/S1.jpg")
+    cache.get_image(known)
+    assert bucket.metadata_requests == 2
+    assert len(bucket.downloads) == 1
+
+    bucket.upload("known_faces/S1.jpg", b"xyz", generation=2)
+    clock.now = 120
+    known = cache.resolve(bucket, "known_faces/S1.jpg")
+    assert known.generation == 2
+    assert cache.get_image(known).payload == b"xyz"
+    assert len(bucket.downloads) == 2
+
+    stats = cache.stats()
+    assert stats["imageHits"] == 2
+    assert stats["imageMisses"] == 2
+
+
+def test_missing_blob_is_remembered_until_revalidation(cache_parts):
+    cache, bucket, clock = cache_parts
+
+    assert cache.resolve(bucket, "known_faces/S2.jpg") is None
+    assert cache.resolve(bucket, "known_faces/S2.jpg") is None
+    assert bucket.metadata_requests == 1
+
+    bucket.upload("known_faces/S2.jpg", b"new", generation=5)
+    clock.now = 31
+    assert cache.resolve(bucket, "known_faces/S2.jpg").generation == 5
+
+
+def test_cache_evicts_least_recently_used_by_size(cache_parts):
+    cache, bucket, _ = cache_parts
+    for name in ("a", "b", "c"):
+        bucket.upload(name, b"1234", generation=1)
+        cache.get_image(cache.resolve(bucket, name))
+
+    stats = cache.stats()
+    assert stats["bytes"] <= 10
+    assert stats["images"] == 2
+    assert stats["evictions"] == 1
+
+
+def test_resolve_enrollment_checks_primary_and_templates_once_per_window(cache_parts):
+    cache, bucket, clock = cache_parts
+    bucket.upload("known_faces/S1.jpg", b"p", generation=1)
+    bucket.upload("known_faces/S1/b.jpg", b"b", generation=2)
+    bucket.upload("known_faces/S1/a.jpg", b"a", generation=1)
+    bucket.upload("known_faces/S12.jpg", b"x", generation=1)
+    bucket.upload("known_faces/S10/a.jpg", b"x", generation=1)
+
+    enrolled = cache.resolve_enrollment(bucket, "known_faces/S1.jpg", "known_faces/S1/")
+    clock.now = 10
+    again = cache.resolve_enrollment(bucket, "known_faces/S1.jpg", "known_faces/S1/")
+
+    assert [face.blob_name for face in enrolled] == [
+        "known_faces/S1.jpg",
+        "known_faces/S1/a.jpg",
+        "known_faces/S1/b.jpg",
+    ]
+    assert again == enrolled
+    # One metadata request for the original image and one folder listing.
+    assert bucket.metadata_requests == 2
+    assert bucket.listed_prefixes == ["known_faces/S1/"]
+    assert cache.get_image(enrolled[2]).payload == b"b"
+
+    bucket.upload("known_faces/S1/b.jpg", b"B", generation=3)
+    del bucket.contents["known_faces/S1.jpg"]
+    clock.now = 45
+    refreshed = cache.resolve_enrollment(bucket, "known_faces/S1.jpg", "known_faces/S1/")
+
+    assert bucket.metadata_requests == 4
+    assert [face.blob_name for face in refreshed] == ["known_faces/S1/a.jpg", "known_faces/S1/b.jpg"]
+    assert refreshed[1].generation == 3
+    assert cache.get_image(refreshed[1]).payload == b"B"
+
+
+def test_template_listings_are_evicted_with_entries(cache_parts):
+    cache, bucket, _ = cache_parts
+    cache.max_entries = 3
+
+    for student in range(10):
+        cache.resolve_enrollment(bucket, f"known_faces/S{student}.jpg", f"known_faces/S{student}/")
+
+    assert len(cache._listings) == 3
+    assert cache.stats()["entries"] == 3
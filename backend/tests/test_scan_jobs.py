@@ -0,0 +1,119 @@
+import datetime
+import importlib.util
+import threading
+import types
+from pathlib import Path
+
+import pytest
+
+
+def _load_module():
+    module_path = Path(__file__).resolve().parents[1] / "scan_jobs.py"
+    spec = importlib.util.spec_from_file_location("scan_jobs_under_test", module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def scan_jobs():
+    return _load_module()
+
+
+def test_finished_jobs_expire_after_ttl(scan_jobs):
+    now = [0.0]
+    store = scan_jobs.ScanJobStore(ttl_seconds=60, clock=lambda: now[0])
+
+    job_id = store.create()
+    store.mark_running(job_id)
+    store.finish(job_id, {"status": "pending"}, 202)
+    store.finish(job_id, {"status": "ignored"}, 500)
+
+    assert store.get(job_id) == {
+        "jobId": job_id,
+        "state": "done",
+        "payload": {"status": "pending"},
+        "status": 202,
+    }
+    now[0] = 61.0
+    assert store.get(job_id) is None
+    assert store.stats()["expired"] == 1
+
+
+def test_wait_returns_when_state_changes(scan_jobs):
+    store = scan_jobs.ScanJobStore()
+    job_id = store.create()
+
+    timer = threading.Timer(0.05, store.finish, args=(job_id, {"status": "fail"}, 404))
+    timer.start()
+    job = store.wait(job_id, "queued", timeout=5)
+    timer.join()
+
+    assert job["state"] == "done"
+    assert job["status"] == 404
+    assert store.wait("missing", "queued", timeout=0.01) is None
+
+
+class FakeFirestore:
+    """Just enough of a Firestore client for shared scan-job documents."""
+
+    def __init__(self):
+        self.documents = {}
+
+    def collection(self, name):
+        documents = self.documents
+
+        class _Document:
+            def __init__(self, doc_id):
+                self._key = (name, doc_id)
+
+            def set(self, data):
+                documents[self._key] = dict(data)
+
+            def delete(self):
+                documents.pop(self._key, None)
+
+            def get(self):
+                data = documents.get(self._key)
+                return types.SimpleNamespace(
+                    exists=data is not None,
+                    to_dict=lambda: None if data is None else dict(data),
+                )
+
+        return types.SimpleNamespace(document=_Document)
+
+
+def test_other_workers_follow_jobs_through_the_shared_document(scan_jobs):
+    firestore = FakeFirestore()
+    accepting = scan_jobs.ScanJobStore(client=lambda: firestore)
+    other = scan_jobs.ScanJobStore(client=lambda: firestore, poll_seconds=0.01)
+
+    job_id = accepting.create()
+    assert other.get(job_id)["state"] == "queued"
+
+    accepting.mark_running(job_id)
+    timer = threading.Timer(0.05, accepting.finish, args=(job_id, {"status": "pending"}, 202))
+    timer.start()
+    job = other.wait(job_id, "running", timeout=5)
+    timer.join()
+
+    assert job == {"jobId": job_id, "state": "done", "payload": {"status": "pending"}, "status": 202}
+    assert other.stats()["sharedReads"] >= 2
+    assert other.get("missing") is None
+
+    firestore.documents[("scanJobs", job_id)]["expiresAt"] = datetime.datetime.now(
+        datetime.timezone.utc
+    ) - datetime.timedelta(seconds=1)
+    assert other.get(job_id) is None
+
+
+def test_failed_shared_writes_keep_the_job_local(scan_jobs):
+    def broken_client():
+        raise RuntimeError("firestore unavailable")
+
+    store = scan_jobs.ScanJobStore(client=broken_client)
+    job_id = store.create()
+    store.finish(job_id, {"status": "pending"}, 202)
+
+    assert store.get(job_id)["status"] == 202
+    assert store.stats()["sharedWriteErrors"] == 2
@@ -0,0 +1,124 @@
+import importlib.util
+import threading
+from pathlib import Path
+
+import pytest
+
+
+def _load_module():
+    module_path = Path(__file__).resolve().parents[1] / "ttl_cache.py"
+    spec = importlib.util.spec_from_file_location("ttl_cache_under_test", module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def ttl_cache():
+    return _load_module()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl(ttl_cache):
+    clock = FakeClock()
+    cache = ttl_cache.TTLCache(10, clock=clock)
+
+    assert cache.get_or_compute("a", lambda: 1) == 1
+    assert cache.get_or_compute("a", lambda: 2) == 1
+    clock.now += 10
+    assert cache.get("a") is None
+    assert cache.get_or_compute("a", lambda: 3) == 3
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_lru_eviction_and_cache_if(ttl_cache):
+    cache = ttl_cache.TTLCache(60, max_entries=2)
+
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+    assert cache.get_or_compute("d", lambda: 500, cache_if=lambda value: value < 500) == 500
+    assert cache.get("d") is None
+
+
+def test_concurrent_callers_share_one_computation(ttl_cache):
+    cache = ttl_cache.TTLCache(60)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+    leader.start()
+    started.wait(5)
+    followers = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+        for _ in range(3)
+    ]
+    for thread in followers:
+        thread.start()
+    while cache.stats()["joined"] < 3:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert results == ["result"] * 4
+    assert calls == [1]
+
+
+def test_exceptions_reach_waiters_but_are_not_cached(ttl_cache):
+    cache = ttl_cache.TTLCache(60)
+
+    def failing():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("k", failing)
+    assert cache.get_or_compute("k", lambda: "ok") == "ok"
+
+
+@pytest.mark.parametrize("invalidate", [lambda cache: cache.invalidate("k"), lambda cache: cache.invalidate()])
+def test_invalidation_during_compute_is_not_overwritten(ttl_cache, invalidate):
+    cache = ttl_cache.TTLCache(60)
+    started = threading.Event()
+    release = threading.Event()
+
+    def read_before_write():
+        started.set()
+        release.wait(5)
+        return "stale"
+
+    results = []
+    reader = threading.Thread(
+        target=lambda: results.append(cache.get_or_compute("k", read_before_write))
+    )
+    reader.start()
+    started.wait(5)
+    invalidate(cache)
+    release.set()
+    reader.join(5)
+
+    assert results == ["stale"]
+    assert cache.get("k") is None
+    assert cache.get_or_compute("k", lambda: "fresh") == "fresh"
+    assert cache.get("k") == "fresh"
@@ -0,0 +1,137 @@
+"""Short-lived in-process cache with single-flight computation."""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class TTLCache:
+    """
+    Thread-safe LRU of values that expire ``ttl_seconds`` after being stored.
+
+    ``get_or_compute`` is single-flight: while one caller computes a key,
+    concurrent callers for the same key wait for that result instead of
+    computing it again. Exceptions are passed to the waiters but never
+    cached, and ``cache_if`` can keep other results (e.g. transient errors)
+    out of the cache as well. A key that is invalidated or ``put`` while its
+    value is being computed is not overwritten by that (older) result.
+    """
+
+    def __init__(self, ttl_seconds, max_entries=1024, clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, int(max_entries))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._inflight = {}
+        # key -> invalidations and puts seen while the key was being computed
+        self._generations = {}
+        self.hits = 0
+        self.misses = 0
+        self.joined = 0
+        self.evictions = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key, default=None):
+        """Return the unexpired value for ``key``, or ``default``."""
+        with self._lock:
+            found, value = self._lookup_locked(key)
+        return value if found else default
+
+    def put(self, key, value):
+        with self._lock:
+            self._bump_locked(key)
+            self._store_locked(key, value)
+
+    def invalidate(self, key=None):
+        """Drop ``key``, or every entry when ``key`` is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                for inflight_key in self._generations:
+                    self._generations[inflight_key] += 1
+            else:
+                self._entries.pop(key, None)
+                self._bump_locked(key)
+
+    def get_or_compute(self, key, compute, cache_if=None, timeout=None):
+        """
+        Return the cached value for ``key``, computing it at most once at a time.
+
+        ``timeout`` bounds how long a caller waits for someone else's
+        in-flight computation (concurrent.futures.TimeoutError).
+        """
+        with self._lock:
+            found, value = self._lookup_locked(key)
+            if found:
+                self.hits += 1
+                return value
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+                self._generations[key] = 0
+                self.misses += 1
+            else:
+                self.joined += 1
+
+        if not leader:
+            return future.result(timeout=timeout)
+
+        try:
+            value = compute()
+        except BaseException as exc:
+            with self._lock:
+                self._inflight.pop(key, None)
+                self._generations.pop(key, None)
+            future.set_exception(exc)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            superseded = self._generations.pop(key, 0) != 0
+            if not superseded and (cache_if is None or cache_if(value)):
+                self._store_locked(key, value)
+        future.set_result(value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "ttlSeconds": self.ttl_seconds,
+                "inflight": len(self._inflight),
+                "hits": self.hits,
+                "misses": self.misses,
+                "joined": self.joined,
+                "evictions": self.evictions,
+            }
+
+    def _lookup_locked(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _bump_locked(self, key):
+        if key in self._generations:
+            self._generations[key] += 1
+
+    def _store_locked(self, key, value):
+        if self.ttl_seconds <= 0:
+            return
+        self._entries[key] = (self._clock() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1